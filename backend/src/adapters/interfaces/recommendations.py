@@ -20,6 +20,19 @@ class RecommendationsAdapterProtocol(Protocol):
         """Get recommendations from recommendations service."""
         ...
 
+    async def get_recommendations_batch(
+        self,
+        user_ids: list[int],
+        limit: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        fail_after: float = 10,
+        *,
+        exclude_viewed: bool = True,
+    ) -> dict[int, list[RecommendationItem]]:
+        """Get recommendations for several users with a single request."""
+        ...
+
     async def add_recipe(self, author_id: int, recipe_id: int, title: str, tags: str) -> None:
         """Add recipe to recommendations service."""
         ...
@@ -1,7 +1,7 @@
 import logging
-from typing import cast
+from typing import Any, cast
 
-from faststream.nats import NatsBroker
+from faststream.nats import NatsBroker, NatsMessage
 from nats.errors import TimeoutError as NatsTimeoutError
 
 from src.adapters.interfaces.recommendations import RecommendationsAdapterProtocol
@@ -10,13 +10,22 @@ from src.schemas.recsys_messages import (
     AddFeedbackMessage,
     AddImpressionMessage,
     AddRecipeMessage,
+    GetRecommendationsBatchRequest,
     GetRecommendationsRequest,
     RecommendationItem,
     UpdateRecipeMessage,
+    UserRecommendationsItem,
 )
 
 logger = logging.getLogger(__name__)
 
+# A request rejected by a saturated replica is sent again, the queue group may deliver it to a less loaded one
+BUSY_RETRIES = 1
+
+
+class RecommendationsBusyError(Exception):
+    """All attempts of an RPC request were rejected by saturated replicas of the recommendations service."""
+
 
 class RecommendationsAdapter(RecommendationsAdapterProtocol):
     """Adapter for recommendations service interaction via NATS."""
@@ -24,6 +33,14 @@ class RecommendationsAdapter(RecommendationsAdapterProtocol):
     def __init__(self, broker: NatsBroker) -> None:
         self.broker = broker
 
+    async def _request(self, message: Any, subject: str, fail_after: float) -> NatsMessage:
+        for _ in range(BUSY_RETRIES + 1):
+            response_msg = await self.broker.request(message=message, subject=subject, timeout=fail_after)
+            if response_msg.headers.get("Nats-Service-Error-Code") != "503":
+                return response_msg
+        msg = f"Recommendations service is busy, {subject} is rejected"
+        raise RecommendationsBusyError(msg)
+
     async def get_recommendations(
         self,
         user_id: int,
@@ -49,6 +66,7 @@ class RecommendationsAdapter(RecommendationsAdapterProtocol):
 
         Raises:
             NatsTimeoutError: When timeout is exceeded
+            RecommendationsBusyError: When the service rejects the request as saturated
             Exception: For other service interaction errors
 
         """
@@ -61,10 +79,10 @@ class RecommendationsAdapter(RecommendationsAdapterProtocol):
         )
 
         try:
-            response_msg = await self.broker.request(
+            response_msg = await self._request(
                 message=request.model_dump(),
                 subject="recsys_rpc.get_recommendations",
-                timeout=fail_after,
+                fail_after=fail_after,
             )
 
             response_data = cast("list", await response_msg.decode())
@@ -73,11 +91,73 @@ class RecommendationsAdapter(RecommendationsAdapterProtocol):
             msg = f"Timeout getting recommendations for user {user_id}"
             logger.exception(msg)
             raise
+        except RecommendationsBusyError:
+            logger.warning("Recommendations service is busy, no recommendations for user %s", user_id)
+            raise
         except Exception:
             msg = f"Error getting recommendations for user {user_id}"
             logger.exception(msg)
             raise
 
+    async def get_recommendations_batch(
+        self,
+        user_ids: list[int],
+        limit: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        fail_after: float = 10,
+        *,
+        exclude_viewed: bool = True,
+    ) -> dict[int, list[RecommendationItem]]:
+        """Get recommendations for several users with a single request.
+
+        Args:
+            user_ids: User IDs to get recommendations for
+            limit: Limit of recommendations to return for each user
+            fetch_k: Number of candidates to fetch from vector database for each user
+            lambda_mult: Lambda multiplier for balancing relevance and diversity
+            fail_after: Request timeout in seconds
+            exclude_viewed: Exclude viewed recipes from recommendations
+
+        Returns:
+            Recommendations by user ID
+
+        Raises:
+            NatsTimeoutError: When timeout is exceeded
+            RecommendationsBusyError: When the service rejects the request as saturated
+            Exception: For other service interaction errors
+
+        """
+        request = GetRecommendationsBatchRequest(
+            user_ids=user_ids,
+            limit=limit,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            exclude_viewed=exclude_viewed,
+        )
+
+        try:
+            response_msg = await self._request(
+                message=request.model_dump(),
+                subject="recsys_rpc.get_recommendations_batch",
+                fail_after=fail_after,
+            )
+
+            response_data = cast("list", await response_msg.decode())
+            items = [UserRecommendationsItem.model_validate(item) for item in response_data]
+            return {item.user_id: item.recommendations for item in items}
+        except NatsTimeoutError:
+            msg = f"Timeout getting recommendations for {len(user_ids)} users"
+            logger.exception(msg)
+            raise
+        except RecommendationsBusyError:
+            logger.warning("Recommendations service is busy, no recommendations for %s users", len(user_ids))
+            raise
+        except Exception:
+            msg = f"Error getting recommendations for {len(user_ids)} users"
+            logger.exception(msg)
+            raise
+
     async def add_recipe(self, author_id: int, recipe_id: int, title: str, tags: str) -> None:
         """Add recipe to recommendations service.
 
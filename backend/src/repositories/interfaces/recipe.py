@@ -11,6 +11,10 @@ class RecipeRepositoryProtocol(Protocol):
 
     async def get_by_ids(self, recipe_ids: Sequence[int]) -> Sequence[Recipe]: ...
 
+    async def get_by_ids_with_extra(
+        self, recipe_ids: Sequence[int], user_id: int | None = None
+    ) -> list[RecipeWithExtra]: ...
+
     async def get_all(
         self,
         user_id: int | None = None,
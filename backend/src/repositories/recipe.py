@@ -127,6 +127,26 @@ class RecipeRepository(RecipeRepositoryProtocol):
         result = await self.session.scalars(stmt)
         return result.all()
 
+    async def get_by_ids_with_extra(
+        self, recipe_ids: Sequence[int], user_id: int | None = None
+    ) -> list[RecipeWithExtra]:
+        """Get recipes without relations in the order of ``recipe_ids`` with one query, missing ones are skipped."""
+        if not recipe_ids:
+            return []
+
+        stmt = select(Recipe).where(Recipe.id.in_(recipe_ids))
+        stmt = self._add_impressions_subquery(stmt)
+        if user_id is not None:
+            stmt = self._add_is_favorite_subquery(stmt, user_id)
+
+        recipes_by_id = {}
+        for row in await self.session.execute(stmt):
+            recipe = row[0]
+            recipe.impressions_count = row.impressions_count
+            recipe.is_on_favorites = bool(row.is_on_favorites) if user_id is not None else False
+            recipes_by_id[recipe.id] = recipe
+        return [recipes_by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes_by_id]
+
     async def _get_recipes_with_filters(
         self,
         user_id: int | None = None,
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PositiveInt
 
 from src.enums.feedback_type import FeedbackTypeEnum
 from src.enums.recipe_get_source import RecipeGetSourceEnum
@@ -17,6 +17,19 @@ class RecommendationItem(BaseModel):
     score: float = Field(ge=0.0, le=2)
 
 
+class GetRecommendationsBatchRequest(BaseModel):
+    user_ids: list[PositiveInt] = Field(min_length=1, max_length=1000)
+    limit: int = Field(default=10, ge=1, le=100)
+    fetch_k: int = Field(default=20, ge=1, le=200)
+    lambda_mult: float = Field(default=0.5, ge=0.0, le=1.0)
+    exclude_viewed: bool = Field(default=True)
+
+
+class UserRecommendationsItem(BaseModel):
+    user_id: int
+    recommendations: list[RecommendationItem] = Field(default_factory=list)
+
+
 class GetVectorRecommendationsRequest(BaseModel):
     user_id: int = Field(gt=0)
     limit: int = Field(default=10, ge=1, le=100)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from src.repositories.interfaces import (
@@ -6,6 +7,7 @@ from src.repositories.interfaces import (
     RecsysRepositoryProtocol,
 )
 from src.schemas.recipe import RecipeReadShort
+from src.typings.recipe_with_favorite import RecipeWithExtra
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,12 @@ class RecommendationService:
         self.recipe_repository = recipe_repository
         self.recipe_image_repository = recipe_image_repository
 
+    async def _to_recipe_short_schema(self, recipe: RecipeWithExtra) -> RecipeReadShort:
+        schema = RecipeReadShort.model_validate(recipe)
+        if recipe.image_path:
+            schema.image_url = await self.recipe_image_repository.get_image_url(recipe.image_path)
+        return schema
+
     async def get_user_recommendations(
         self,
         user_id: int,
@@ -34,28 +42,22 @@ class RecommendationService:
             if not recommendations:
                 return []
 
-            recipe_ids = [rec.recipe_id for rec in recommendations]
-
-            recipes = []
-            for recipe_id in recipe_ids:
-                try:
-                    recipe = await self.recipe_repository.get_by_id(recipe_id)
-                    if recipe:
-                        recipe_schema = RecipeReadShort.model_validate(recipe)
-
-                        if recipe.image_path:
-                            recipe_schema.image_url = await self.recipe_image_repository.get_image_url(
-                                recipe.image_path
-                            )
-
-                        recipes.append(recipe_schema)
+            recipe_ids = [rec.recipe_id for rec in recommendations][:limit]
+            recipes = await self.recipe_repository.get_by_ids_with_extra(recipe_ids, user_id=user_id)
+            # Image URLs are presigned concurrently, a failed one drops only its recipe
+            schemas = await asyncio.gather(
+                *(self._to_recipe_short_schema(recipe) for recipe in recipes), return_exceptions=True
+            )
 
-                except Exception:
-                    logger.exception("Failed to load recipe %s for user %s", recipe_id, user_id)
+            result = []
+            for recipe, schema in zip(recipes, schemas, strict=True):
+                if isinstance(schema, BaseException):
+                    logger.error("Failed to load recipe %s for user %s", recipe.id, user_id, exc_info=schema)
                     continue
-
-            return recipes[:limit]
+                result.append(schema)
 
         except Exception:
             logger.exception("Failed to get recommendations for user %s", user_id)
             return []
+        else:
+            return result
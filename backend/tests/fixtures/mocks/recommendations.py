@@ -4,6 +4,10 @@ from src.schemas.recsys_messages import AddImpressionMessage, RecommendationItem
 
 
 class MockRecommendationsAdapter(RecommendationsAdapterProtocol):
+    def __init__(self) -> None:
+        # Recipe ids returned to a user in this order instead of the generated ones
+        self.recommended_recipe_ids: dict[int, list[int]] = {}
+
     async def get_recommendations(
         self,
         user_id: int,
@@ -14,6 +18,13 @@ class MockRecommendationsAdapter(RecommendationsAdapterProtocol):
         *,
         exclude_viewed: bool = True,  # noqa: ARG002
     ) -> list[RecommendationItem]:
+        if user_id in self.recommended_recipe_ids:
+            recipe_ids = self.recommended_recipe_ids[user_id][:limit]
+            return [
+                RecommendationItem(recipe_id=recipe_id, score=1.0 - i / len(recipe_ids))
+                for i, recipe_id in enumerate(recipe_ids)
+            ]
+
         base_recipe_id = user_id * 100
         recommendations = []
 
@@ -24,6 +35,23 @@ class MockRecommendationsAdapter(RecommendationsAdapterProtocol):
 
         return recommendations
 
+    async def get_recommendations_batch(
+        self,
+        user_ids: list[int],
+        limit: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        fail_after: float = 10,
+        *,
+        exclude_viewed: bool = True,
+    ) -> dict[int, list[RecommendationItem]]:
+        return {
+            user_id: await self.get_recommendations(
+                user_id, limit, fetch_k, lambda_mult, fail_after, exclude_viewed=exclude_viewed
+            )
+            for user_id in user_ids
+        }
+
     async def add_recipe(self, author_id: int, recipe_id: int, title: str, tags: str) -> None:
         pass
 
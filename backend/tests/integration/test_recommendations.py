@@ -0,0 +1,93 @@
+from collections.abc import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+from httpx import AsyncClient
+
+from src.adapters.interfaces.recommendations import RecommendationsAdapterProtocol
+from src.repositories.recipe_image import RecipeImageRepository
+from tests.fixtures.mocks.recommendations import MockRecommendationsAdapter
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest_asyncio.fixture
+async def recommendations_adapter(test_dishka_container) -> AsyncGenerator[MockRecommendationsAdapter, None]:
+    adapter = await test_dishka_container.get(RecommendationsAdapterProtocol)
+    if not isinstance(adapter, MockRecommendationsAdapter):
+        pytest.skip("Recommendations are served by the real microservice")
+
+    yield adapter
+    adapter.recommended_recipe_ids.clear()
+
+
+class TestRecommendationsIntegration:
+    async def test_get_recommendations_keeps_ranking_order(
+        self,
+        api_client: AsyncClient,
+        auth_headers: dict[str, str],
+        registered_user: dict,
+        test_recipes: list[dict],
+        recommendations_adapter: MockRecommendationsAdapter,
+    ):
+        recipe_ids = [test_recipes[i]["id"] for i in (3, 0, 4, 1, 2)]
+        recommendations_adapter.recommended_recipe_ids[registered_user["id"]] = recipe_ids
+
+        response = await api_client.get("/v1/recommendations", params={"limit": 10}, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [recipe["id"] for recipe in response.json()] == recipe_ids
+
+    async def test_get_recommendations_marks_favorites_of_user(
+        self,
+        api_client: AsyncClient,
+        auth_headers: dict[str, str],
+        registered_user: dict,
+        test_recipes: list[dict],
+        recommendations_adapter: MockRecommendationsAdapter,
+    ):
+        favorite_id = test_recipes[1]["id"]
+        response = await api_client.post("/v1/favorite-recipes", json={"recipe_id": favorite_id}, headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        recommendations_adapter.recommended_recipe_ids[registered_user["id"]] = [
+            recipe["id"] for recipe in test_recipes
+        ]
+
+        response = await api_client.get("/v1/recommendations", params={"limit": 10}, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {recipe["id"]: recipe["is_on_favorites"] for recipe in response.json()} == {
+            recipe["id"]: recipe["id"] == favorite_id for recipe in test_recipes
+        }
+
+    async def test_get_recommendations_drops_recipe_with_failed_image(
+        self,
+        api_client: AsyncClient,
+        auth_headers: dict[str, str],
+        registered_user: dict,
+        test_recipes: list[dict],
+        recommendations_adapter: MockRecommendationsAdapter,
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        failing_id = test_recipes[2]["id"]
+        get_image_url = RecipeImageRepository.get_image_url
+
+        async def get_image_url_failing_for_one_recipe(
+            self: RecipeImageRepository, image_path: str, expires_in: int = 3600
+        ) -> str:
+            if image_path.startswith(f"recipes/{failing_id}/"):
+                msg = "Storage is unavailable"
+                raise ConnectionError(msg)
+            return await get_image_url(self, image_path, expires_in)
+
+        monkeypatch.setattr(RecipeImageRepository, "get_image_url", get_image_url_failing_for_one_recipe)
+        recipe_ids = [recipe["id"] for recipe in test_recipes]
+        recommendations_adapter.recommended_recipe_ids[registered_user["id"]] = recipe_ids
+
+        response = await api_client.get("/v1/recommendations", params={"limit": 10}, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [recipe["id"] for recipe in response.json()] == [
+            recipe_id for recipe_id in recipe_ids if recipe_id != failing_id
+        ]
@@ -0,0 +1,42 @@
+"""Add user preference state model
+
+Revision ID: 3b9d2c7e5a41
+Revises: 7053f8256f38
+Create Date: 2025-06-14 12:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d2c7e5a41"
+down_revision: str | None = "7053f8256f38"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_preference_state",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("liked_sum", sa.LargeBinary(), nullable=True),
+        sa.Column("liked_count", sa.Integer(), nullable=False),
+        sa.Column("disliked_sum", sa.LargeBinary(), nullable=True),
+        sa.Column("disliked_count", sa.Integer(), nullable=False),
+        sa.Column("viewed_sum", sa.LargeBinary(), nullable=True),
+        sa.Column("viewed_count", sa.Integer(), nullable=False),
+        sa.Column("recs_detail_sum", sa.LargeBinary(), nullable=True),
+        sa.Column("recs_detail_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_user_preference_state")),
+        sa.UniqueConstraint("user_id", name=op.f("uq_user_preference_state_user_id")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_preference_state")
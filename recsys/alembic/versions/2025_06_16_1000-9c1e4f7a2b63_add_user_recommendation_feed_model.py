@@ -0,0 +1,49 @@
+"""Add user recommendation feed model
+
+Revision ID: 9c1e4f7a2b63
+Revises: 3b9d2c7e5a41
+Create Date: 2025-06-16 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c1e4f7a2b63"
+down_revision: str | None = "3b9d2c7e5a41"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_recommendation_feed",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("recipe_ids", postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column("scores", postgresql.ARRAY(sa.Float()), nullable=False),
+        sa.Column("fetch_k", sa.Integer(), nullable=False),
+        sa.Column("lambda_mult", sa.Float(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_user_recommendation_feed")),
+        sa.UniqueConstraint("user_id", name=op.f("uq_user_recommendation_feed_user_id")),
+    )
+    op.create_index(
+        op.f("ix_user_recommendation_feed_recipe_ids"),
+        "user_recommendation_feed",
+        ["recipe_ids"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_user_recommendation_feed_recipe_ids"), table_name="user_recommendation_feed", postgresql_using="gin"
+    )
+    op.drop_table("user_recommendation_feed")
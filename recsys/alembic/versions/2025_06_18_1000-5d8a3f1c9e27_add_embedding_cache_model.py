@@ -0,0 +1,39 @@
+"""Add embedding cache model
+
+Revision ID: 5d8a3f1c9e27
+Revises: 9c1e4f7a2b63
+Create Date: 2025-06-18 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d8a3f1c9e27"
+down_revision: str | None = "9c1e4f7a2b63"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "embedding_cache",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_embedding_cache")),
+        sa.UniqueConstraint("key", name=op.f("uq_embedding_cache_key")),
+    )
+    op.create_index(op.f("ix_embedding_cache_last_used_at"), "embedding_cache", ["last_used_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_embedding_cache_last_used_at"), table_name="embedding_cache")
+    op.drop_table("embedding_cache")
@@ -0,0 +1,46 @@
+"""Add recipe text and embedding collection rebuild model
+
+Revision ID: b4e7c2d9a158
+Revises: 5d8a3f1c9e27
+Create Date: 2025-06-20 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b4e7c2d9a158"
+down_revision: str | None = "5d8a3f1c9e27"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("recipes", sa.Column("title", sa.String(), nullable=True))
+    op.add_column("recipes", sa.Column("tags", sa.String(), nullable=True))
+    op.add_column(
+        "recipes",
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    )
+    op.create_table(
+        "embedding_collection_rebuild",
+        sa.Column("collection_name", sa.String(), nullable=False),
+        sa.Column("last_recipe_id", sa.Integer(), nullable=False),
+        sa.Column("is_completed", sa.Boolean(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_embedding_collection_rebuild")),
+        sa.UniqueConstraint("collection_name", name=op.f("uq_embedding_collection_rebuild_collection_name")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("embedding_collection_rebuild")
+    op.drop_column("recipes", "updated_at")
+    op.drop_column("recipes", "tags")
+    op.drop_column("recipes", "title")
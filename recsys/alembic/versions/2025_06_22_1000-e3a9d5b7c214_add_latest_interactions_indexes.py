@@ -0,0 +1,66 @@
+"""Add latest interactions indexes
+
+Revision ID: e3a9d5b7c214
+Revises: b4e7c2d9a158
+Create Date: 2025-06-22 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3a9d5b7c214"
+down_revision: str | None = "b4e7c2d9a158"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Built without blocking writes to the interaction tables, CONCURRENTLY can not run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_user_feedback_user_id_feedback_type_created_at"),
+            "user_feedback",
+            ["user_id", "feedback_type", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            postgresql_include=["recipe_id"],
+        )
+        op.create_index(
+            op.f("ix_user_impression_user_id_created_at"),
+            "user_impression",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            postgresql_include=["recipe_id", "source"],
+        )
+        op.create_index(
+            op.f("ix_user_impression_recs_detail_user_id_created_at"),
+            "user_impression",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            postgresql_include=["recipe_id"],
+            postgresql_where=sa.text("source = 'recs_detail'"),
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_user_impression_recs_detail_user_id_created_at"),
+            table_name="user_impression",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            op.f("ix_user_impression_user_id_created_at"), table_name="user_impression", postgresql_concurrently=True
+        )
+        op.drop_index(
+            op.f("ix_user_feedback_user_id_feedback_type_created_at"),
+            table_name="user_feedback",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,52 @@
+"""Add user feedback unique key
+
+Revision ID: 7f2b9e4c1d36
+Revises: e3a9d5b7c214
+Create Date: 2025-06-24 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7f2b9e4c1d36"
+down_revision: str | None = "e3a9d5b7c214"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Keep the first copy of every feedback. Preference states and feeds of the affected users were built from the
+    # duplicates, they are dropped and rebuilt from the compacted history on the next request
+    op.execute(
+        sa.text(
+            """
+            WITH duplicates AS (
+                DELETE FROM user_feedback AS duplicate
+                USING user_feedback AS original
+                WHERE duplicate.user_id = original.user_id
+                    AND duplicate.recipe_id = original.recipe_id
+                    AND duplicate.feedback_type = original.feedback_type
+                    AND duplicate.id > original.id
+                RETURNING duplicate.user_id
+            ),
+            states AS (
+                DELETE FROM user_preference_state WHERE user_id IN (SELECT user_id FROM duplicates)
+            )
+            DELETE FROM user_recommendation_feed WHERE user_id IN (SELECT user_id FROM duplicates)
+            """
+        )
+    )
+    op.create_unique_constraint(
+        op.f("uq_user_feedback_user_id_recipe_id_feedback_type"),
+        "user_feedback",
+        ["user_id", "recipe_id", "feedback_type"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(op.f("uq_user_feedback_user_id_recipe_id_feedback_type"), "user_feedback", type_="unique")
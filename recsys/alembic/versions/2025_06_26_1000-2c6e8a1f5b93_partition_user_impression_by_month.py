@@ -0,0 +1,134 @@
+"""Partition user impression by month
+
+Revision ID: 2c6e8a1f5b93
+Revises: 7f2b9e4c1d36
+Create Date: 2025-06-26 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2c6e8a1f5b93"
+down_revision: str | None = "7f2b9e4c1d36"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _create_impression_indexes() -> None:
+    op.create_index(
+        op.f("ix_user_impression_user_id_created_at"),
+        "user_impression",
+        ["user_id", "created_at", "id"],
+        unique=False,
+        postgresql_include=["recipe_id", "source"],
+    )
+    op.create_index(
+        op.f("ix_user_impression_recs_detail_user_id_created_at"),
+        "user_impression",
+        ["user_id", "created_at", "id"],
+        unique=False,
+        postgresql_include=["recipe_id"],
+        postgresql_where=sa.text("source = 'recs_detail'"),
+    )
+
+
+def _drop_impression_indexes(table_name: str) -> None:
+    op.drop_index(op.f("ix_user_impression_recs_detail_user_id_created_at"), table_name=table_name)
+    op.drop_index(op.f("ix_user_impression_user_id_created_at"), table_name=table_name)
+
+
+def upgrade() -> None:
+    # The impressions are copied into a partitioned table, the id sequence is moved over to keep the ids growing.
+    # The primary key and the indexes are built after the copy and the drop of the old table, which frees the names
+    _drop_impression_indexes("user_impression")
+    op.rename_table("user_impression", "user_impression_unpartitioned")
+    op.execute(
+        """
+        CREATE TABLE user_impression (
+            id INTEGER NOT NULL DEFAULT nextval('user_impression_id_seq'),
+            user_id INTEGER NOT NULL,
+            recipe_id INTEGER NOT NULL,
+            source impression_source_enum,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT fk_user_impression_recipe_id_recipes FOREIGN KEY (recipe_id)
+                REFERENCES recipes (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE user_impression_id_seq OWNED BY user_impression.id")
+    op.execute(
+        # Partitions up to 3 months after the current one, as RECSYS__IMPRESSION_PARTITIONS__MONTHS_AHEAD by default
+        """
+        DO $$
+        DECLARE
+            month date;
+            last_month date;
+        BEGIN
+            SELECT
+                date_trunc('month', coalesce(min(created_at), now()) AT TIME ZONE 'UTC')::date,
+                (date_trunc('month', greatest(max(created_at), now()) AT TIME ZONE 'UTC')
+                    + interval '3 months')::date
+            INTO month, last_month
+            FROM user_impression_unpartitioned;
+
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF user_impression FOR VALUES FROM (%L) TO (%L)',
+                    'user_impression_p' || to_char(month, 'YYYY_MM'),
+                    month || ' 00:00:00+00',
+                    (month + interval '1 month')::date || ' 00:00:00+00'
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$
+        """
+    )
+    # Impressions outside the monthly partitions, e.g. when the maintenance is late, land here instead of failing
+    op.execute("CREATE TABLE user_impression_default PARTITION OF user_impression DEFAULT")
+    op.execute(
+        """
+        INSERT INTO user_impression (id, user_id, recipe_id, source, created_at)
+        SELECT id, user_id, recipe_id, source, created_at FROM user_impression_unpartitioned
+        """
+    )
+    op.drop_table("user_impression_unpartitioned")
+    op.create_primary_key(op.f("pk_user_impression"), "user_impression", ["id", "created_at"])
+    _create_impression_indexes()
+
+    op.create_index(op.f("ix_recipes_author_id"), "recipes", ["author_id"], unique=False, postgresql_include=["id"])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_recipes_author_id"), table_name="recipes")
+
+    _drop_impression_indexes("user_impression")
+    op.rename_table("user_impression", "user_impression_partitioned")
+    op.execute(
+        """
+        CREATE TABLE user_impression (
+            id INTEGER NOT NULL DEFAULT nextval('user_impression_id_seq'),
+            user_id INTEGER NOT NULL,
+            recipe_id INTEGER NOT NULL,
+            source impression_source_enum,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT fk_user_impression_recipe_id_recipes FOREIGN KEY (recipe_id)
+                REFERENCES recipes (id) ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE user_impression_id_seq OWNED BY user_impression.id")
+    op.execute(
+        """
+        INSERT INTO user_impression (id, user_id, recipe_id, source, created_at)
+        SELECT id, user_id, recipe_id, source, created_at FROM user_impression_partitioned
+        """
+    )
+    # Partitions are dropped with the partitioned table
+    op.drop_table("user_impression_partitioned")
+    op.create_primary_key(op.f("pk_user_impression"), "user_impression", ["id"])
+    _create_impression_indexes()
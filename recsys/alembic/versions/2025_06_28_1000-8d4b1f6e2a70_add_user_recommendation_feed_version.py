@@ -0,0 +1,53 @@
+"""Add user recommendation feed version and refresh claim
+
+Revision ID: 8d4b1f6e2a70
+Revises: 2c6e8a1f5b93
+Create Date: 2025-06-28 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4b1f6e2a70"
+down_revision: str | None = "2c6e8a1f5b93"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_recommendation_feed", sa.Column("version", sa.Integer(), server_default=sa.text("0"), nullable=False)
+    )
+    op.add_column(
+        "user_recommendation_feed", sa.Column("refresh_claimed_until", sa.DateTime(timezone=True), nullable=True)
+    )
+    # An invalidated feed keeps its row with the bumped version and without a computation time
+    op.alter_column("user_recommendation_feed", "fetch_k", existing_type=sa.Integer(), nullable=True)
+    op.alter_column("user_recommendation_feed", "lambda_mult", existing_type=sa.Float(), nullable=True)
+    op.alter_column(
+        "user_recommendation_feed",
+        "computed_at",
+        existing_type=sa.DateTime(timezone=True),
+        server_default=None,
+        nullable=True,
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM user_recommendation_feed WHERE computed_at IS NULL")
+    op.alter_column(
+        "user_recommendation_feed",
+        "computed_at",
+        existing_type=sa.DateTime(timezone=True),
+        server_default=sa.text("now()"),
+        nullable=False,
+    )
+    op.alter_column("user_recommendation_feed", "lambda_mult", existing_type=sa.Float(), nullable=False)
+    op.alter_column("user_recommendation_feed", "fetch_k", existing_type=sa.Integer(), nullable=False)
+    op.drop_column("user_recommendation_feed", "refresh_claimed_until")
+    op.drop_column("user_recommendation_feed", "version")
@@ -0,0 +1,116 @@
+"""
+Recall@k, latency and estimated RAM of the recipes collection profiles.
+
+Creates a collection per profile from ``COLLECTION_PROFILES`` with the same clustered synthetic vectors, waits until
+Qdrant has built the HNSW index and quantized the vectors, then queries every collection through ``QdrantRepository``
+with the profile's search parameters. Recall@k is measured against exact brute-force top-k computed with numpy.
+Needs a real Qdrant server: the local in-memory mode of qdrant-client always searches exhaustively and ignores
+quantization. Collections are named ``bench_<profile>`` and dropped afterwards.
+
+Usage: python -m benchmarks.collection_profiles [--url http://localhost:6333] [--recipes 50000] [--dim 1024]
+       [--queries 200] [--k 20] [--profile int8 --profile on_disk]
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.repositories.qdrant import COLLECTION_PROFILES, CollectionProfile, QdrantRepository
+from src.utils.vectors import normalize_rows
+
+
+def _clustered_vectors(rng: np.random.Generator, count: int, dim: int, clusters: int = 200) -> np.ndarray:
+    """Embeddings of recipes form topical clusters, uniform random vectors would understate the ANN recall."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+async def _wait_indexed(client: AsyncQdrantClient, collection_name: str) -> None:
+    while True:
+        if (await client.get_collection(collection_name)).status == models.CollectionStatus.GREEN:
+            return
+        await asyncio.sleep(1)
+
+
+async def _load_collection(
+    client: AsyncQdrantClient, collection_name: str, profile: CollectionProfile, vectors: np.ndarray
+) -> QdrantRepository:
+    repo = QdrantRepository(client, profile)
+    repo.recipe_collection_name = collection_name
+    if await client.collection_exists(collection_name):
+        await client.delete_collection(collection_name)
+    await repo.create_collection(collection_name, vectors.shape[1])
+    for start in range(0, len(vectors), 1000):
+        batch = vectors[start : start + 1000]
+        await repo.add_recipes(
+            list(range(start + 1, start + len(batch) + 1)), batch.tolist(), collection_name=collection_name
+        )
+    async with asyncio.timeout(600):
+        await _wait_indexed(client, collection_name)
+    return repo
+
+
+async def _evaluate(repo: QdrantRepository, queries: np.ndarray, exact_ids: np.ndarray, k: int) -> tuple:
+    # Warm up, the first queries of an on-disk collection read the page cache in
+    for query in queries[:10]:
+        await repo.get_recommendations(query.tolist(), limit=k)
+
+    latencies_ms = []
+    recalls = []
+    for query, query_exact_ids in zip(queries, exact_ids, strict=True):
+        start = time.perf_counter()
+        response = await repo.get_recommendations(query.tolist(), limit=k)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        found_ids = {point.id for point in response.points}
+        recalls.append(len(found_ids.intersection(query_exact_ids.tolist())) / k)
+    return float(np.mean(recalls)), float(np.percentile(latencies_ms, 50)), float(np.percentile(latencies_ms, 95))
+
+
+async def main(url: str, recipes: int, dim: int, queries: int, k: int, profile_names: list[str]) -> None:
+    client = AsyncQdrantClient(location=url, timeout=600)
+    rng = np.random.default_rng(42)
+    vectors = _clustered_vectors(rng, recipes, dim)
+    # Queries look like user vectors: means of a few recipes of the catalog
+    query_vectors = normalize_rows(vectors[rng.integers(recipes, size=(queries, 5))].mean(axis=1))
+    # Exact top-k of cosine similarity, ids are row numbers + 1
+    exact_ids = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :k] + 1
+
+    print(f"recipes={recipes} dim={dim} queries={queries} k={k}")  # noqa: T201
+    print(  # noqa: T201
+        f"{'profile':>14} {'recall@k':>9} {'p50, ms':>8} {'p95, ms':>8} {'est. RAM, MiB':>14} {'load, s':>8}"
+    )
+    for profile_name in profile_names:
+        profile = COLLECTION_PROFILES[profile_name]
+        collection_name = f"bench_{profile_name}"
+
+        start = time.perf_counter()
+        repo = await _load_collection(client, collection_name, profile, vectors)
+        load_seconds = time.perf_counter() - start
+        try:
+            recall, p50_ms, p95_ms = await _evaluate(repo, query_vectors, exact_ids, k)
+        finally:
+            await client.delete_collection(collection_name)
+
+        ram_mib = profile.estimate_ram_bytes(recipes, dim) / 1024 / 1024
+        print(  # noqa: T201
+            f"{profile_name:>14} {recall:>9.4f} {p50_ms:>8.2f} {p95_ms:>8.2f} {ram_mib:>14.1f} {load_seconds:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--recipes", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--profile", action="append", dest="profiles", choices=sorted(COLLECTION_PROFILES))
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.url, args.recipes, args.dim, args.queries, args.k, args.profiles or list(COLLECTION_PROFILES))
+    )
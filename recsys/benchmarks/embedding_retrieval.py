@@ -0,0 +1,101 @@
+"""
+Latency and memory of candidate embedding retrieval.
+
+Compares the ``dict[int, list[float]]`` path (``get_recipe_embeddings`` plus the list -> array conversions done by the
+algorithm) with the contiguous ``EmbeddingMatrix`` path (``get_recipe_embedding_matrix``). Runs against qdrant-client's
+local in-memory mode, so the numbers exclude network time.
+
+Usage: python -m benchmarks.embedding_retrieval [--candidates 200] [--dim 1024] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.repositories.qdrant import QdrantRepository
+from src.utils.vectors import normalize_rows
+
+
+async def legacy_path(repo: QdrantRepository, recipe_ids: list[int]) -> np.ndarray:
+    embeddings = await repo.get_recipe_embeddings(recipe_ids)
+    matrix = np.zeros((len(recipe_ids), len(next(iter(embeddings.values())))), dtype=np.float32)
+    for i, recipe_id in enumerate(recipe_ids):
+        if recipe_id in embeddings:
+            matrix[i] = embeddings[recipe_id]
+    return normalize_rows(matrix)
+
+
+async def matrix_path(repo: QdrantRepository, recipe_ids: list[int]) -> np.ndarray:
+    embeddings = await repo.get_recipe_embedding_matrix(recipe_ids)
+    vectors, _ = embeddings.aligned(recipe_ids)
+    return vectors
+
+
+async def _measure(func: Callable[[], Awaitable[Any]], repeat: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    latency_ms = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    result = await func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return latency_ms, peak / 1024 / 1024
+
+
+async def _measure_payload(repo: QdrantRepository, recipe_ids: list[int]) -> tuple[float, float]:
+    tracemalloc.start()
+    legacy = await repo.get_recipe_embeddings(recipe_ids)
+    legacy_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del legacy
+
+    matrix = await repo.get_recipe_embedding_matrix(recipe_ids)
+    return legacy_mb, (matrix.ids.nbytes + matrix.vectors.nbytes) / 1024 / 1024
+
+
+async def main(candidates: int, dim: int, repeat: int) -> None:
+    client = AsyncQdrantClient(location=":memory:")
+    repo = QdrantRepository(client)
+    await client.create_collection(
+        collection_name=repo.recipe_collection_name,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+    )
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((candidates, dim)).astype(np.float32)
+    await client.upsert(
+        collection_name=repo.recipe_collection_name,
+        points=[models.PointStruct(id=i + 1, vector=vector.tolist()) for i, vector in enumerate(vectors)],
+    )
+    recipe_ids = list(range(1, candidates + 1))
+
+    if not np.allclose(await legacy_path(repo, recipe_ids), await matrix_path(repo, recipe_ids), atol=1e-6):
+        msg = "Embedding matrices differ"
+        raise RuntimeError(msg)
+
+    legacy_ms, legacy_peak_mb = await _measure(lambda: legacy_path(repo, recipe_ids), repeat)
+    matrix_ms, matrix_peak_mb = await _measure(lambda: matrix_path(repo, recipe_ids), repeat)
+    legacy_payload_mb, matrix_payload_mb = await _measure_payload(repo, recipe_ids)
+
+    print(f"candidates={candidates} dim={dim} repeat={repeat}")  # noqa: T201
+    print(f"{'path':>8} {'latency, ms':>12} {'peak, MiB':>10} {'result, MiB':>12}")  # noqa: T201
+    print(f"{'dict':>8} {legacy_ms:>12.3f} {legacy_peak_mb:>10.2f} {legacy_payload_mb:>12.2f}")  # noqa: T201
+    print(f"{'matrix':>8} {matrix_ms:>12.3f} {matrix_peak_mb:>10.2f} {matrix_payload_mb:>12.2f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.candidates, args.dim, args.repeat))
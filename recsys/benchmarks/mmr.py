@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of the MMR selection step.
+
+Compares the vectorized selection from ``src.algorithms.mmr`` with the previous pairwise implementation and checks
+that both return the same ordering.
+
+Usage: python -m benchmarks.mmr [--dim 1024] [--limit 10] [--repeat 50]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+from src.algorithms.mmr import mmr_select
+from src.utils.vectors import normalize_rows
+
+FETCH_K_VALUES = (20, 100, 200)
+
+
+def _cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
+    norm1 = np.linalg.norm(vec1)
+    norm2 = np.linalg.norm(vec2)
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return np.dot(vec1, vec2) / (norm1 * norm2)
+
+
+def legacy_mmr_selection(
+    candidates: list[dict], candidate_embeddings: dict[int, list[float]], limit: int, lambda_mult: float
+) -> list[dict]:
+    if len(candidates) <= limit:
+        return candidates
+
+    selected = [candidates[0]]
+    remaining = candidates[1:]
+
+    while len(selected) < limit and remaining:
+        best_score = -np.inf
+        best_idx = -1
+
+        for i, candidate in enumerate(remaining):
+            candidate_id = candidate["recipe_id"]
+            if candidate_id not in candidate_embeddings:
+                continue
+
+            relevance = 1 - candidate["score"]
+            max_similarity = 0.0
+            current_emb = np.array(candidate_embeddings[candidate_id], dtype=np.float32)
+
+            for selected_candidate in selected:
+                selected_id = selected_candidate["recipe_id"]
+                if selected_id in candidate_embeddings:
+                    selected_emb = np.array(candidate_embeddings[selected_id], dtype=np.float32)
+                    max_similarity = max(max_similarity, _cosine_similarity(current_emb, selected_emb))
+
+            mmr_score = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+            if mmr_score > best_score:
+                best_score = mmr_score
+                best_idx = i
+
+        if best_idx == -1:
+            break
+        selected.append(remaining.pop(best_idx))
+    return selected
+
+
+def vectorized_mmr_selection(
+    candidates: list[dict], candidate_embeddings: dict[int, list[float]], limit: int, lambda_mult: float
+) -> list[dict]:
+    if len(candidates) <= limit:
+        return candidates
+
+    embeddings = normalize_rows(np.array([candidate_embeddings[c["recipe_id"]] for c in candidates], dtype=np.float32))
+    relevance = np.array([1 - c["score"] for c in candidates], dtype=np.float32)
+    return [candidates[i] for i in mmr_select(relevance, embeddings, limit, lambda_mult)]
+
+
+def make_candidates(fetch_k: int, dim: int, rng: np.random.Generator) -> tuple[list[dict], dict[int, list[float]]]:
+    vectors = rng.standard_normal((fetch_k, dim)).astype(np.float32)
+    scores = np.sort(rng.uniform(0.2, 0.9, fetch_k))[::-1]
+    candidates = [{"recipe_id": i + 1, "score": float(score), "payload": {}} for i, score in enumerate(scores)]
+    embeddings = {i + 1: vector.tolist() for i, vector in enumerate(vectors)}
+    return candidates, embeddings
+
+
+def _time_per_call(selection: Callable[..., list[dict]], args: tuple, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        selection(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(dim: int, limit: int, lambda_mult: float, repeat: int) -> None:
+    rng = np.random.default_rng(42)
+    print(f"dim={dim} limit={limit} lambda_mult={lambda_mult} repeat={repeat}")  # noqa: T201
+    print(f"{'fetch_k':>8} {'legacy, ms':>12} {'vectorized, ms':>15} {'speedup':>8}")  # noqa: T201
+    for fetch_k in FETCH_K_VALUES:
+        candidates, embeddings = make_candidates(fetch_k, dim, rng)
+
+        legacy_ids = [c["recipe_id"] for c in legacy_mmr_selection(candidates, embeddings, limit, lambda_mult)]
+        vectorized_ids = [c["recipe_id"] for c in vectorized_mmr_selection(candidates, embeddings, limit, lambda_mult)]
+        if legacy_ids != vectorized_ids:
+            msg = f"Ordering mismatch for fetch_k={fetch_k}: {legacy_ids} != {vectorized_ids}"
+            raise RuntimeError(msg)
+
+        args = (candidates, embeddings, limit, lambda_mult)
+        legacy_ms = _time_per_call(legacy_mmr_selection, args, repeat)
+        vectorized_ms = _time_per_call(vectorized_mmr_selection, args, repeat)
+        print(f"{fetch_k:>8} {legacy_ms:>12.3f} {vectorized_ms:>15.3f} {legacy_ms / vectorized_ms:>7.1f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.dim, args.limit, args.lambda_mult, args.repeat)
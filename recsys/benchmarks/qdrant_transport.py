@@ -0,0 +1,138 @@
+"""
+Latency and throughput of the Qdrant REST and gRPC transports on the calls of the recommendation algorithm.
+
+Loads ``--recipes`` random vectors into a ``bench_transport`` collection, then runs two workloads through
+``QdrantRepository`` with a client per transport, built like ``QdrantProvider.get_qdrant_client``:
+
+- ``retrieve``: ``get_recipe_embedding_matrix`` of ``--retrieve-ids`` random ids, like the candidate embeddings of MMR;
+- ``query``: ``get_recommendations_batch`` of ``--batch-queries`` vectors with ``--k`` results each, like the
+  candidate search of a batch of users.
+
+Every workload sends ``--requests`` requests from ``--concurrency`` concurrent tasks after a warm-up. Vectors dominate
+the payload of both workloads, REST encodes every float as JSON text while gRPC sends them as packed floats. Needs a
+real Qdrant server with both ports reachable, the collection is dropped afterwards.
+
+Usage: python -m benchmarks.qdrant_transport [--host localhost] [--port 6333] [--grpc-port 6334] [--recipes 20000]
+       [--dim 1024] [--requests 300] [--concurrency 1 8] [--retrieve-ids 100] [--batch-queries 20] [--k 100]
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+
+from src.repositories.qdrant import QdrantRepository
+from src.utils.vectors import normalize_rows
+
+COLLECTION_NAME = "bench_transport"
+TRANSPORTS = ("rest", "grpc")
+WARMUP_REQUESTS = 10
+
+
+def _make_client(args: argparse.Namespace, transport: str) -> AsyncQdrantClient:
+    return AsyncQdrantClient(
+        host=args.host,
+        port=args.port,
+        grpc_port=args.grpc_port,
+        prefer_grpc=transport == "grpc",
+        timeout=60,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+
+
+def _make_repo(client: AsyncQdrantClient) -> QdrantRepository:
+    repo = QdrantRepository(client)
+    repo.recipe_collection_name = COLLECTION_NAME
+    return repo
+
+
+async def _load_collection(repo: QdrantRepository, vectors: np.ndarray) -> None:
+    await repo.create_collection(COLLECTION_NAME, vectors.shape[1])
+    for start in range(0, len(vectors), 1000):
+        batch = vectors[start : start + 1000]
+        await repo.add_recipes(
+            list(range(start + 1, start + len(batch) + 1)), batch.tolist(), collection_name=COLLECTION_NAME
+        )
+
+
+async def _measure(request: Callable[[], Awaitable[object]], requests: int, concurrency: int) -> dict[str, float]:
+    for _ in range(WARMUP_REQUESTS):
+        await request()
+
+    latencies: list[float] = []
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(len(part)) for part in np.array_split(np.arange(requests), concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(42)
+    vectors = normalize_rows(rng.standard_normal((args.recipes, args.dim)).astype(np.float32))
+    query_vectors = normalize_rows(rng.standard_normal((args.batch_queries, args.dim)).astype(np.float32)).tolist()
+
+    loader = _make_client(args, "rest")
+    await _load_collection(_make_repo(loader), vectors)
+
+    print(  # noqa: T201
+        f"recipes={args.recipes} dim={args.dim} requests={args.requests} retrieve_ids={args.retrieve_ids} "
+        f"batch_queries={args.batch_queries} k={args.k}"
+    )
+    print(f"{'workload':>9} {'transport':>9} {'tasks':>6} {'req/s':>8} {'p50, ms':>8} {'p95, ms':>8}")  # noqa: T201
+    try:
+        for transport in TRANSPORTS:
+            client = _make_client(args, transport)
+            repo = _make_repo(client)
+
+            async def retrieve(repo: QdrantRepository = repo) -> object:
+                recipe_ids = rng.choice(args.recipes, size=args.retrieve_ids, replace=False) + 1
+                return await repo.get_recipe_embedding_matrix(recipe_ids.tolist())
+
+            async def query(repo: QdrantRepository = repo) -> object:
+                return await repo.get_recommendations_batch(query_vectors, limit=args.k)
+
+            try:
+                for workload, request in (("retrieve", retrieve), ("query", query)):
+                    for concurrency in args.concurrency:
+                        result = await _measure(request, args.requests, concurrency)
+                        print(  # noqa: T201
+                            f"{workload:>9} {transport:>9} {concurrency:>6} {result['throughput']:>8.0f} "
+                            f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+                        )
+            finally:
+                await client.close()
+    finally:
+        await loader.delete_collection(COLLECTION_NAME)
+        await loader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--grpc-port", type=int, default=6334)
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--retrieve-ids", type=int, default=100)
+    parser.add_argument("--batch-queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
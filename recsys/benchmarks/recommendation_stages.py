@@ -0,0 +1,270 @@
+"""
+Per-stage latency of ``RecommendationAlgorithm.get_recommendations`` across catalog sizes and history lengths.
+
+Builds a clustered synthetic catalog in qdrant-client's local in-memory mode (optionally served through the
+``LocalVectorRepository`` index) and synthetic users whose histories come mostly from one topic. Postgres is replaced
+by in-memory stand-ins of the interaction and preference state repositories that sleep ``--db-latency-ms`` per query
+to model the round trip. Every user is requested once with an empty preference state (``cold``, the state is rebuilt
+from the history) and then ``--repeat`` times (``warm``). Stage names are the ``RecommendationAlgorithm.timings``
+keys, ``total`` is the whole call.
+
+Results are written as JSON (stdout or ``--output``). Pass an earlier result as ``--baseline`` to print p50 changes.
+
+Usage: python -m benchmarks.recommendation_stages [--catalog-sizes 1000 10000 50000] [--history-lengths 10 100 1000]
+       [--users 20] [--repeat 5] [--dim 256] [--vector-engine qdrant] [--db-latency-ms 0.5] [--output result.json]
+       [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterable, Sequence
+from importlib import metadata
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+
+from src.algorithms.preference_state import PreferenceStateManager
+from src.algorithms.recommendation_algorithm import RecommendationAlgorithm
+from src.core.config import settings
+from src.models.user_preference_state import PreferenceComponent, UserPreferenceState
+from src.repositories.local_vectors import LocalVectorIndex, LocalVectorRepository
+from src.repositories.postgres import UserInteractionRepository, UserPreferenceStateRepository
+from src.repositories.qdrant import QdrantRepository
+from src.schemas.recommendations import UserPreferences
+from src.utils.vectors import normalize_rows
+
+CLUSTERS = 100
+STAGES = ["interactions", "preference_vector", "interests", "candidate_query", "embedding_retrieve", "mmr", "total"]
+
+
+class _InMemoryInteractionRepository(UserInteractionRepository):
+    """Serves synthetic histories, the per-request memoization is inherited from the real repository."""
+
+    def __init__(self, preferences: dict[int, UserPreferences], latency: float) -> None:
+        super().__init__(session=None)  # type: ignore[arg-type]
+        self._stored_preferences = preferences
+        self._latency = latency
+
+    async def _load_users_preferences(self, user_ids: list[int]) -> dict[int, UserPreferences]:
+        await asyncio.sleep(self._latency)
+        return {user_id: self._stored_preferences[user_id] for user_id in user_ids}
+
+    async def get_recent_recipe_ids(
+        self, user_ids: Sequence[int], limit: int | None, offset: int = 0
+    ) -> dict[int, dict[PreferenceComponent, list[int]]]:
+        await asyncio.sleep(self._latency)
+        end = None if limit is None else offset + limit
+        recipe_ids = {}
+        for user_id in user_ids:
+            preferences = self._stored_preferences[user_id]
+            # Synthetic histories are stored newest first
+            recipe_ids[user_id] = {
+                PreferenceComponent.liked: list(preferences.favorite_recipes_ids or [])[offset:end],
+                PreferenceComponent.disliked: list(preferences.disliked_recipes_ids or [])[offset:end],
+                PreferenceComponent.viewed: list(preferences.viewed_recipes_ids or [])[offset:end],
+                PreferenceComponent.recs_detail: list(preferences.recs_detail_recipes_ids or [])[offset:end],
+            }
+        return recipe_ids
+
+
+class _InMemoryPreferenceStateRepository(UserPreferenceStateRepository):
+    def __init__(self, states: dict[int, UserPreferenceState], latency: float) -> None:
+        super().__init__(session=None)  # type: ignore[arg-type]
+        self._states = states
+        self._latency = latency
+
+    async def get_states(self, user_ids: Sequence[int]) -> Sequence[UserPreferenceState]:
+        await asyncio.sleep(self._latency)
+        return [self._states[user_id] for user_id in user_ids if user_id in self._states]
+
+    async def get_states_for_update(self, user_ids: Sequence[int]) -> Sequence[UserPreferenceState]:
+        return await self.get_states(user_ids)
+
+    async def lock_users(self, user_ids: Iterable[int]) -> None:
+        pass
+
+    async def upsert_states(self, values_by_user: dict[int, dict[str, Any]]) -> None:
+        await asyncio.sleep(self._latency)
+        for user_id, values in values_by_user.items():
+            self._states[user_id] = UserPreferenceState(user_id=user_id, **values)
+
+    async def delete_states(self, user_ids: Sequence[int]) -> None:
+        await asyncio.sleep(self._latency)
+        for user_id in user_ids:
+            self._states.pop(user_id, None)
+
+    async def commit(self) -> None:
+        await asyncio.sleep(self._latency)
+
+
+async def _build_catalog(
+    rng: np.random.Generator, catalog_size: int, dim: int, vector_engine: str, index_path: Path
+) -> tuple[QdrantRepository, np.ndarray]:
+    """Return the repository to query and the topic of every recipe, recipe ids are row numbers + 1."""
+    topics = rng.integers(CLUSTERS, size=catalog_size)
+    centers = rng.standard_normal((CLUSTERS, dim)).astype(np.float32)
+    vectors = normalize_rows(centers[topics] + rng.standard_normal((catalog_size, dim)).astype(np.float32))
+
+    client = AsyncQdrantClient(location=":memory:")
+    qdrant_repo = QdrantRepository(client)
+    await qdrant_repo.create_collection(qdrant_repo.recipe_collection_name, dim)
+    for start in range(0, catalog_size, 1000):
+        batch = vectors[start : start + 1000]
+        await qdrant_repo.add_recipes(list(range(start + 1, start + len(batch) + 1)), batch.tolist())
+
+    if vector_engine == "local":
+        index = LocalVectorIndex(index_path)
+        qdrant_repo = LocalVectorRepository(client, index)
+        await index.bootstrap(qdrant_repo)
+    return qdrant_repo, topics
+
+
+def _build_histories(
+    rng: np.random.Generator, topics: np.ndarray, users: int, history_length: int
+) -> dict[int, UserPreferences]:
+    """Four fifths of every history come from the user's topic, every liked or disliked recipe is also viewed."""
+    history_length = min(history_length, len(topics) // 2)
+    preferences = {}
+    for user_id in range(1, users + 1):
+        topic_ids = np.flatnonzero(topics == rng.integers(CLUSTERS)) + 1
+        topical = rng.choice(topic_ids, size=min(len(topic_ids), history_length * 4 // 5), replace=False)
+        random = rng.choice(len(topics), size=history_length, replace=False) + 1
+        history = list(dict.fromkeys([*topical.tolist(), *random.tolist()]))[:history_length]
+        preferences[user_id] = UserPreferences(
+            favorite_recipes_ids=history[: max(1, history_length // 10)],
+            disliked_recipes_ids=history[len(history) - history_length // 20 :],
+            viewed_recipes_ids=history,
+            recs_detail_recipes_ids=history[: history_length // 20],
+            author_recipes_ids=[],
+        )
+    return preferences
+
+
+def _summarize(samples: list[dict[str, float]]) -> dict[str, dict[str, float]]:
+    summary = {}
+    for stage in STAGES:
+        values_ms = np.array([sample.get(stage, 0.0) * 1000 for sample in samples])
+        summary[stage] = {
+            "mean_ms": round(float(values_ms.mean()), 4),
+            "p50_ms": round(float(np.percentile(values_ms, 50)), 4),
+            "p95_ms": round(float(np.percentile(values_ms, 95)), 4),
+        }
+    return summary
+
+
+async def _run_scenario(
+    qdrant_repo: QdrantRepository, preferences: dict[int, UserPreferences], repeat: int, latency: float
+) -> dict[str, dict[str, dict[str, float]]]:
+    states: dict[int, UserPreferenceState] = {}
+
+    async def request(user_id: int) -> dict[str, float]:
+        # Repositories and the algorithm live for one request, like in the REQUEST DI scope
+        interaction_repo = _InMemoryInteractionRepository(preferences, latency)
+        preference_state = PreferenceStateManager(
+            state_repo=_InMemoryPreferenceStateRepository(states, latency),
+            interaction_repo=interaction_repo,
+            qdrant_repo=qdrant_repo,
+            max_interactions=settings.preference_window.max_interactions,
+            recency_half_life=settings.preference_window.recency_half_life,
+        )
+        algorithm = RecommendationAlgorithm(
+            interaction_repo=interaction_repo,
+            preference_state=preference_state,
+            qdrant_repo=qdrant_repo,
+            embeddings_repo=None,  # type: ignore[arg-type]
+        )
+        start = time.perf_counter()
+        await algorithm.get_recommendations(user_id, limit=10, fetch_k=20, lambda_mult=0.5)
+        return {**algorithm.timings.seconds, "total": time.perf_counter() - start}
+
+    cold = [await request(user_id) for user_id in preferences]
+    warm = [await request(user_id) for _ in range(repeat) for user_id in preferences]
+    return {"cold": _summarize(cold), "warm": _summarize(warm)}
+
+
+def _git_revision() -> str | None:
+    result = subprocess.run(  # noqa: S603
+        ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() or None
+
+
+def _print_comparison(baseline: dict[str, Any], current: dict[str, Any]) -> None:
+    def key(result: dict[str, Any]) -> tuple:
+        return result["catalog_size"], result["history_length"], result["phase"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    print(f"p50 change against {baseline['meta'].get('commit')}, ms", file=sys.stderr)  # noqa: T201
+    for result in current["results"]:
+        baseline_result = baseline_results.get(key(result))
+        if baseline_result is None:
+            continue
+        changes = []
+        for stage in STAGES:
+            before, after = baseline_result["stages"][stage]["p50_ms"], result["stages"][stage]["p50_ms"]
+            change = f"{(after - before) / before:+.0%}" if before else "n/a"
+            changes.append(f"{stage}={before:.2f}->{after:.2f} ({change})")
+        print(" ".join(map(str, key(result))), *changes, file=sys.stderr)  # noqa: T201
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    rng = np.random.default_rng(42)
+    latency = args.db_latency_ms / 1000
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as index_path:
+        for catalog_size in args.catalog_sizes:
+            qdrant_repo, topics = await _build_catalog(
+                rng, catalog_size, args.dim, args.vector_engine, Path(index_path)
+            )
+            for history_length in args.history_lengths:
+                preferences = _build_histories(rng, topics, args.users, history_length)
+                phases = await _run_scenario(qdrant_repo, preferences, args.repeat, latency)
+                results.extend(
+                    {"catalog_size": catalog_size, "history_length": history_length, "phase": phase, "stages": stages}
+                    for phase, stages in phases.items()
+                )
+                print(f"catalog={catalog_size} history={history_length} done", file=sys.stderr)  # noqa: T201
+
+    return {
+        "meta": {
+            "commit": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "qdrant_client": metadata.version("qdrant-client"),
+            "args": {key: value for key, value in vars(args).items() if key not in {"output", "baseline"}},
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--history-lengths", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--vector-engine", choices=["qdrant", "local"], default="qdrant")
+    parser.add_argument("--db-latency-ms", type=float, default=0.5)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+    else:
+        print(json.dumps(result, indent=2))  # noqa: T201
+    if args.baseline:
+        _print_comparison(json.loads(args.baseline.read_text()), result)
@@ -0,0 +1,133 @@
+"""
+Latency and request size of excluding already seen recipes from the candidate search.
+
+Compares sending the whole seen list to Qdrant as a ``HasIdCondition`` with ``search_unseen_candidates`` (local
+post-filtering of over-fetched pages with a sorted seen set) for a user with 10k impressions. Three histories are
+generated: uniformly random recipes, recipes mostly taken from the neighbourhood of the user vector (the realistic
+case, the user vector is built from the same recipes) and exactly the nearest recipes (the worst case). Runs against
+qdrant-client's local in-memory mode, so the numbers exclude network time and the id filter is evaluated in Python;
+the filter column shows what is serialized for every query.
+
+Usage: python -m benchmarks.seen_exclusion [--recipes 20000] [--seen 10000] [--dim 256] [--fetch-k 20] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.algorithms.candidates import search_unseen_candidates
+from src.core.config import SeenFilterConfig
+from src.repositories.qdrant import QdrantRepository
+from src.utils.seen_set import SeenSet
+
+
+class _CountingQdrantRepository(QdrantRepository):
+    """Counts round trips and serialized filter bytes of batch queries."""
+
+    def __init__(self, client: AsyncQdrantClient) -> None:
+        super().__init__(client)
+        self.round_trips = 0
+        self.filter_bytes = 0
+
+    async def get_recommendations_batch(
+        self,
+        query_vectors: list[list[float]],
+        limit: int = 10,
+        exclude_ids: list[list[int]] | None = None,
+        offsets: list[int] | None = None,
+    ) -> list[Any]:
+        self.round_trips += 1
+        for query_exclude_ids in exclude_ids or []:
+            exclude_filter = self._build_exclude_filter(query_exclude_ids)
+            if exclude_filter is not None:
+                self.filter_bytes += len(exclude_filter.model_dump_json())
+        return await super().get_recommendations_batch(query_vectors, limit, exclude_ids, offsets)
+
+
+async def _measure(func: Callable[[], Awaitable[Any]], repo: _CountingQdrantRepository, repeat: int) -> tuple:
+    repo.round_trips = repo.filter_bytes = 0
+    result = await func()
+    round_trips, filter_bytes = repo.round_trips, repo.filter_bytes
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    latency_ms = (time.perf_counter() - start) / repeat * 1000
+    return result, latency_ms, round_trips, filter_bytes / 1024
+
+
+async def main(recipes: int, seen: int, dim: int, fetch_k: int, repeat: int) -> None:
+    client = AsyncQdrantClient(location=":memory:")
+    repo = _CountingQdrantRepository(client)
+    await client.create_collection(
+        collection_name=repo.recipe_collection_name,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+    )
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((recipes, dim)).astype(np.float32)
+    for start in range(0, recipes, 1000):
+        await client.upsert(
+            collection_name=repo.recipe_collection_name,
+            points=[
+                models.PointStruct(id=start + i + 1, vector=vector.tolist())
+                for i, vector in enumerate(vectors[start : start + 1000])
+            ],
+        )
+
+    query_vector = rng.standard_normal(dim).astype(np.float32)
+    ranked_ids = np.argsort(-(vectors @ query_vector)) + 1
+    histories = {
+        "random": rng.choice(recipes, size=seen, replace=False) + 1,
+        # Two thirds of the nearest 1.5 * seen recipes
+        "nearest": rng.choice(ranked_ids[: seen * 3 // 2], size=seen, replace=False),
+        # Worst case: every nearest recipe is seen, post-filtering gives up and falls back to the id filter
+        "topical": ranked_ids[:seen],
+    }
+
+    config = SeenFilterConfig()
+    print(f"recipes={recipes} seen={seen} dim={dim} fetch_k={fetch_k} repeat={repeat}")  # noqa: T201
+    print(  # noqa: T201
+        f"{'history':>8} {'strategy':>12} {'latency, ms':>12} {'round trips':>12} {'filter, KiB':>12}"
+    )
+    for history, seen_ids in histories.items():
+        seen_set = SeenSet.from_ids(seen_ids.tolist())
+
+        async def exact(seen_set: SeenSet = seen_set) -> list[list[Any]]:
+            responses = await repo.get_recommendations_batch(
+                [query_vector.tolist()], limit=fetch_k, exclude_ids=[seen_set.tolist()]
+            )
+            return [response.points for response in responses]
+
+        async def post_filtered(seen_set: SeenSet = seen_set) -> list[list[Any]]:
+            return await search_unseen_candidates(repo, [query_vector.tolist()], [seen_set], fetch_k, config)
+
+        exact_result, *exact_stats = await _measure(exact, repo, repeat)
+        post_filtered_result, *post_filtered_stats = await _measure(post_filtered, repo, repeat)
+        if [point.id for point in exact_result[0]] != [point.id for point in post_filtered_result[0]]:
+            msg = f"Candidates differ for {history} history"
+            raise RuntimeError(msg)
+
+        for strategy, (latency_ms, round_trips, filter_kib) in (
+            ("id filter", exact_stats),
+            ("seen set", post_filtered_stats),
+        ):
+            print(  # noqa: T201
+                f"{history:>8} {strategy:>12} {latency_ms:>12.3f} {round_trips:>12} {filter_kib:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--seen", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.recipes, args.seen, args.dim, args.fetch_k, args.repeat))
@@ -0,0 +1,139 @@
+import asyncio
+import itertools
+import math
+from typing import Any
+
+from src.core.config import SeenFilterConfig
+from src.repositories.qdrant import QdrantRepository
+from src.utils.seen_set import SeenSet
+
+
+async def _search_excluding_ids(
+    qdrant_repo: QdrantRepository, query_vectors: list[list[float]], seen_sets: list[SeenSet], fetch_k: int
+) -> list[list[Any]]:
+    if not query_vectors:
+        return []
+    responses = await qdrant_repo.get_recommendations_batch(
+        query_vectors=query_vectors, limit=fetch_k, exclude_ids=[seen_set.tolist() for seen_set in seen_sets]
+    )
+    return [response.points for response in responses]
+
+
+async def _search_post_filtered(
+    qdrant_repo: QdrantRepository,
+    query_vectors: list[list[float]],
+    seen_sets: list[SeenSet],
+    fetch_k: int,
+    config: SeenFilterConfig,
+) -> tuple[list[list[Any]], list[int]]:
+    """Return the collected candidates and the indices of queries that are still short after ``max_rounds``."""
+    candidates: list[list[Any]] = [[] for _ in query_vectors]
+    offsets = [0] * len(query_vectors)
+    unseen_shares = [1 / config.overfetch_factor] * len(query_vectors)
+
+    pending = list(range(len(query_vectors)))
+    for _ in range(config.max_rounds):
+        if not pending:
+            break
+
+        page_size = min(
+            config.max_page_size,
+            max(math.ceil((fetch_k - len(candidates[i])) / unseen_shares[i]) for i in pending),
+        )
+        responses = await qdrant_repo.get_recommendations_batch(
+            query_vectors=[query_vectors[i] for i in pending],
+            limit=page_size,
+            offsets=[offsets[i] for i in pending],
+        )
+
+        still_pending = []
+        for i, response in zip(pending, responses, strict=True):
+            points = response.points
+            seen = seen_sets[i].contains([point.id for point in points])
+            unseen_points = [point for point, is_seen in zip(points, seen.tolist(), strict=True) if not is_seen]
+            candidates[i].extend(unseen_points[: fetch_k - len(candidates[i])])
+            offsets[i] += len(points)
+            unseen_shares[i] = max(len(unseen_points), 1) / max(len(points), 1)
+
+            # A short page means the collection is exhausted
+            if len(candidates[i]) < fetch_k and len(points) == page_size:
+                still_pending.append(i)
+        pending = still_pending
+
+    return candidates, pending
+
+
+async def search_unseen_candidates(
+    qdrant_repo: QdrantRepository,
+    query_vectors: list[list[float]],
+    seen_sets: list[SeenSet],
+    fetch_k: int,
+    config: SeenFilterConfig,
+) -> list[list[Any]]:
+    """
+    Return the ``fetch_k`` nearest points that are not in the seen set for every query vector.
+
+    Seen sets up to ``exact_threshold`` ids are sent to Qdrant as a ``HasIdCondition``. Larger ones are never
+    serialized: pages of the nearest points are over-fetched with offsets and filtered locally, the next page size is
+    derived from the share of unseen points on the previous page. Queries that are still short after ``max_rounds``
+    fall back to the id filter, so the result is always the same as with the exact filter.
+
+    Args:
+        qdrant_repo: Repository to search in
+        query_vectors: Query vectors
+        seen_sets: Seen set of every query vector
+        fetch_k: Number of candidates to return for every query vector
+        config: Thresholds of the post-filtering
+
+    """
+    exact = [i for i, seen_set in enumerate(seen_sets) if len(seen_set) <= config.exact_threshold]
+    post_filtered = [i for i, seen_set in enumerate(seen_sets) if len(seen_set) > config.exact_threshold]
+
+    exact_candidates, (post_filtered_candidates, short) = await asyncio.gather(
+        _search_excluding_ids(qdrant_repo, [query_vectors[i] for i in exact], [seen_sets[i] for i in exact], fetch_k),
+        _search_post_filtered(
+            qdrant_repo,
+            [query_vectors[i] for i in post_filtered],
+            [seen_sets[i] for i in post_filtered],
+            fetch_k,
+            config,
+        ),
+    )
+
+    candidates: list[list[Any]] = [[] for _ in query_vectors]
+    for i, points in zip(exact, exact_candidates, strict=True):
+        candidates[i] = points
+    for i, points in zip(post_filtered, post_filtered_candidates, strict=True):
+        candidates[i] = points
+
+    short = [post_filtered[i] for i in short]
+    fallback_candidates = await _search_excluding_ids(
+        qdrant_repo, [query_vectors[i] for i in short], [seen_sets[i] for i in short], fetch_k
+    )
+    for i, points in zip(short, fallback_candidates, strict=True):
+        candidates[i] = points
+    return candidates
+
+
+def merge_interest_candidates(points_per_interest: list[list[Any]], fetch_k: int) -> list[Any]:
+    """
+    Merge the candidates of several interest queries of one user into at most ``fetch_k`` points.
+
+    Interests take turns rank by rank, so every interest contributes its nearest points even when the others are
+    closer to the catalog. A point found by several queries keeps its best score. Returns the points by score.
+    """
+    if len(points_per_interest) == 1:
+        return points_per_interest[0][:fetch_k]
+
+    best: dict[int, Any] = {}
+    for points in itertools.zip_longest(*points_per_interest):
+        for point in points:
+            if point is None:
+                continue
+            known = best.get(point.id)
+            if known is None:
+                if len(best) < fetch_k:
+                    best[point.id] = point
+            elif point.score > known.score:
+                best[point.id] = point
+    return sorted(best.values(), key=lambda point: point.score, reverse=True)
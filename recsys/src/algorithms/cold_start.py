@@ -0,0 +1,96 @@
+import logging
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+
+from src.core.config import ColdStartConfig
+from src.repositories.postgres import RecipeRepository
+from src.repositories.qdrant import QdrantRepository
+from src.utils.seen_set import SeenSet
+from src.utils.vectors import spherical_kmeans
+
+logger = logging.getLogger(__name__)
+
+LIKE_WEIGHT = 5.0
+DISLIKE_WEIGHT = -5.0
+
+
+def order_by_cluster_coverage(scores: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """
+    Interleave clusters: the most popular item of every cluster first, then the second ones and so on.
+
+    Clusters take turns in the order of their most popular item, items of a cluster keep the popularity order.
+    ``scores`` must be sorted in descending order. Returns the row order.
+    """
+    rows = np.arange(len(scores))
+    # Rank of every row inside its cluster, rows are already sorted by popularity
+    by_cluster = np.lexsort((rows, labels))
+    cluster_starts = np.searchsorted(labels[by_cluster], labels[by_cluster], side="left")
+    ranks = np.empty(len(rows), dtype=np.intp)
+    ranks[by_cluster] = np.arange(len(rows)) - cluster_starts
+    # The first row of a cluster is its most popular item, so it orders the clusters inside every round
+    first_rows = np.full(labels.max() + 1, len(rows), dtype=np.intp)
+    np.minimum.at(first_rows, labels, rows)
+    return np.lexsort((first_rows[labels], ranks))
+
+
+class ColdStartPool:
+    """
+    Process-wide list of popular recipes that cover the catalog topics, served to users without enough history.
+
+    The pool is rebuilt periodically from the popularity counts in Postgres and the embeddings of the most popular
+    recipes: they are clustered with spherical k-means and interleaved cluster by cluster, so the first items of the
+    pool span different topics. Serving is a membership check of the pool against the user's seen set.
+    """
+
+    def __init__(self) -> None:
+        self._ids = np.empty(0, dtype=np.int64)
+        self._scores = np.empty(0, dtype=np.float32)
+        self.refreshed_at: datetime | None = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.refreshed_at is not None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def refresh(
+        self, recipe_repo: RecipeRepository, qdrant_repo: QdrantRepository, config: ColdStartConfig
+    ) -> None:
+        now = datetime.now(UTC)
+        popular = await recipe_repo.get_popular_recipes(
+            since=now - timedelta(seconds=config.popularity_window_seconds),
+            limit=config.candidates,
+            like_weight=LIKE_WEIGHT,
+            dislike_weight=DISLIKE_WEIGHT,
+        )
+        recipe_ids = [recipe_id for recipe_id, _ in popular]
+        # Recipes missing from the vector store are deleted or not ingested yet and are not recommended anywhere
+        embeddings = await qdrant_repo.get_recipe_embedding_matrix(recipe_ids)
+        positions = embeddings.positions(recipe_ids)
+        available = positions >= 0
+
+        ids = np.asarray(recipe_ids, dtype=np.int64)[available]
+        scores = np.maximum(np.asarray([score for _, score in popular], dtype=np.float32)[available], 0)
+        if len(ids):
+            _, labels = spherical_kmeans(embeddings.vectors[positions[available]], config.clusters)
+            order = order_by_cluster_coverage(scores, labels)[: config.size]
+            ids, scores = ids[order], scores[order]
+            if scores.max() > 0:
+                scores /= scores.max()
+
+        # Swapped together between two awaits, so readers always see a consistent pool
+        self._ids, self._scores = ids, scores
+        self.refreshed_at = now
+        logger.info("Cold start pool is refreshed with %d recipes", len(ids))
+
+    def discard(self, recipe_id: int) -> None:
+        """Drop a deleted recipe until the next refresh, pools of other worker replicas catch up on their refresh."""
+        keep = self._ids != recipe_id
+        self._ids, self._scores = self._ids[keep], self._scores[keep]
+
+    def get_recommendations(self, seen_set: SeenSet, limit: int) -> list[dict]:
+        ids, scores = self._ids, self._scores
+        rows = np.flatnonzero(~seen_set.contains(ids))[:limit]
+        return [{"recipe_id": int(ids[row]), "score": float(scores[row]), "payload": {}} for row in rows]
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    limit: int,
+    lambda_mult: float,
+    available: np.ndarray | None = None,
+) -> list[int]:
+    """
+    Select candidate indices with Maximal Marginal Relevance.
+
+    The first candidate is always selected. Candidates that are not ``available`` (e.g. have no embedding) are never
+    picked after it. ``embeddings`` must be L2-normalized row-wise (zero rows for missing vectors), so the whole
+    candidate x candidate similarity matrix is computed with a single matmul and the running max-similarity vector
+    is updated once per pick.
+
+    Args:
+        relevance: Relevance of every candidate, shape ``(n,)``
+        embeddings: Normalized candidate embeddings, shape ``(n, dim)``
+        limit: Number of candidates to select
+        lambda_mult: Lambda multiplier for balancing relevance and diversity
+        available: Boolean mask of candidates that can be selected, shape ``(n,)``
+
+    """
+    candidates_count = len(relevance)
+    if candidates_count == 0:
+        return []
+
+    selectable = np.ones(candidates_count, dtype=bool) if available is None else available.copy()
+    selectable[0] = False
+
+    similarity = embeddings @ embeddings.T
+    max_similarity = np.maximum(similarity[0], 0.0)
+    relevance_term = lambda_mult * np.asarray(relevance, dtype=np.float32)
+    diversity_weight = np.float32(1 - lambda_mult)
+
+    selected = [0]
+    while len(selected) < limit and selectable.any():
+        scores = relevance_term - diversity_weight * max_similarity
+        scores[~selectable] = -np.inf
+        best_idx = int(np.argmax(scores))
+        selected.append(best_idx)
+        selectable[best_idx] = False
+        np.maximum(max_similarity, similarity[best_idx], out=max_similarity)
+    return selected
@@ -0,0 +1,246 @@
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from src.models.user_feedback import FeedbackType
+from src.models.user_impression import ImpressionSource
+from src.models.user_preference_state import PreferenceComponent, UserPreferenceState
+from src.repositories.postgres import UserInteractionRepository, UserPreferenceStateRepository
+from src.repositories.qdrant import QdrantRepository
+from src.utils.vectors import EmbeddingMatrix
+
+STATE_DTYPE = np.float64
+
+# Interaction is a triple of user id, preference component and recipe id
+Interaction = tuple[int, PreferenceComponent, int]
+ComponentEmbeddings = dict[PreferenceComponent, np.ndarray | None]
+
+
+def feedback_components(feedback_type: FeedbackType) -> list[PreferenceComponent]:
+    if feedback_type == FeedbackType.like:
+        return [PreferenceComponent.liked]
+    return [PreferenceComponent.disliked]
+
+
+def impression_components(source: ImpressionSource | None) -> list[PreferenceComponent]:
+    if source == ImpressionSource.recs_detail:
+        return [PreferenceComponent.viewed, PreferenceComponent.recs_detail]
+    return [PreferenceComponent.viewed]
+
+
+def _decode(value: bytes | None) -> np.ndarray | None:
+    if value is None:
+        return None
+    return np.frombuffer(value, dtype=STATE_DTYPE)
+
+
+def _encode(value: np.ndarray | None) -> bytes | None:
+    if value is None:
+        return None
+    return value.astype(STATE_DTYPE, copy=False).tobytes()
+
+
+class PreferenceStateManager:
+    """
+    Maintains per-user running sums of normalized recipe embeddings.
+
+    Event handlers apply interactions incrementally, so the user vector is built in O(dim) without reading the
+    interaction history. ``rebuild_from_history`` recomputes the state from the history to repair drift (deleted or
+    re-embedded recipes).
+
+    Only the latest ``max_interactions`` interactions of every component are kept: when a new interaction pushes the
+    count over the limit, the interactions that fell out of the window are read from the latest K index and subtracted.
+    With ``recency_half_life`` the interaction of rank ``r`` (0 is the newest) is weighted with
+    ``0.5 ** (r / recency_half_life)``, a new interaction multiplies the sum by the decay and adds its embedding.
+    Interactions with a recipe without an embedding take a rank and count like the others, they add nothing to the sum,
+    so counts and ranks match the history rows the window is read from.
+    Removed interactions can not be located in a window or a decayed sum, so they drop the state and it is rebuilt on
+    the next request.
+
+    A state is changed only under the advisory lock of its user (``lock_users``): events write and apply their
+    interactions in one transaction holding it, rebuilds read the history and store the state under it. A concurrent
+    interaction is thus either in the history the state was built from or applied to the built state, never both or
+    neither.
+    """
+
+    def __init__(
+        self,
+        state_repo: UserPreferenceStateRepository,
+        interaction_repo: UserInteractionRepository,
+        qdrant_repo: QdrantRepository,
+        max_interactions: int | None = None,
+        recency_half_life: float | None = None,
+    ) -> None:
+        self.state_repo = state_repo
+        self.interaction_repo = interaction_repo
+        self.qdrant_repo = qdrant_repo
+        self.max_interactions = max_interactions
+        self.decay = 0.5 ** (1 / recency_half_life) if recency_half_life else 1.0
+
+    @property
+    def _is_windowed(self) -> bool:
+        return self.max_interactions is not None or self.decay < 1
+
+    def _weight_total(self, count: int) -> float:
+        """Sum of the weights of the ``count`` latest interactions."""
+        if self.decay == 1:
+            return count
+        return (1 - self.decay**count) / (1 - self.decay)
+
+    def _mean(self, vector_sum: np.ndarray | None, count: int) -> np.ndarray | None:
+        if vector_sum is None or count <= 0:
+            return None
+        return vector_sum / self._weight_total(count)
+
+    async def _get_embedding_matrix(self, recipe_ids: Iterable[int]) -> EmbeddingMatrix:
+        return await self.qdrant_repo.get_recipe_embedding_matrix(list(set(recipe_ids)))
+
+    def _get_component_embeddings(self, state: UserPreferenceState) -> ComponentEmbeddings:
+        return {
+            component: self._mean(
+                _decode(getattr(state, f"{component.value}_sum")), getattr(state, f"{component.value}_count")
+            )
+            for component in PreferenceComponent
+        }
+
+    async def get_component_embeddings(self, user_id: int) -> ComponentEmbeddings | None:
+        return (await self.get_users_component_embeddings([user_id])).get(user_id)
+
+    async def get_users_component_embeddings(self, user_ids: Sequence[int]) -> dict[int, ComponentEmbeddings]:
+        states = await self.state_repo.get_states(user_ids)
+        return {state.user_id: self._get_component_embeddings(state) for state in states}
+
+    async def lock_users(self, user_ids: Iterable[int]) -> None:
+        """Hold the state locks of the users until the end of the transaction, see the class docstring."""
+        await self.state_repo.lock_users(user_ids)
+
+    async def rebuild_from_history(self, user_ids: Sequence[int]) -> dict[int, ComponentEmbeddings]:
+        await self.lock_users(user_ids)
+        recipe_ids_by_user = await self.interaction_repo.get_recent_recipe_ids(user_ids, self.max_interactions)
+        return await self.rebuild_many(recipe_ids_by_user)
+
+    async def build_missing_states(self, user_ids: Sequence[int]) -> dict[int, ComponentEmbeddings]:
+        """Build the states of users without one, states built meanwhile by a concurrent request are read instead."""
+        await self.lock_users(user_ids)
+        component_embeddings = await self.get_users_component_embeddings(user_ids)
+        missing_user_ids = [user_id for user_id in user_ids if user_id not in component_embeddings]
+        if missing_user_ids:
+            recipe_ids_by_user = await self.interaction_repo.get_recent_recipe_ids(
+                missing_user_ids, self.max_interactions
+            )
+            component_embeddings |= await self.rebuild_many(recipe_ids_by_user)
+        # Releases the locks when nothing was stored
+        await self.state_repo.commit()
+        return component_embeddings
+
+    async def rebuild_many(
+        self, recipe_ids_by_user: dict[int, dict[PreferenceComponent, list[int]]]
+    ) -> dict[int, ComponentEmbeddings]:
+        """Build the states from the recipe ids of every component, newest first."""
+        embeddings = await self._get_embedding_matrix(
+            recipe_id
+            for recipe_ids_by_component in recipe_ids_by_user.values()
+            for recipe_ids in recipe_ids_by_component.values()
+            for recipe_id in recipe_ids
+        )
+
+        values_by_user: dict[int, dict[str, bytes | int | None]] = {}
+        component_embeddings_by_user: dict[int, ComponentEmbeddings] = {}
+        for user_id, recipe_ids_by_component in recipe_ids_by_user.items():
+            values: dict[str, bytes | int | None] = {}
+            component_embeddings: ComponentEmbeddings = {}
+            for component in PreferenceComponent:
+                positions = embeddings.positions(recipe_ids_by_component.get(component, []))
+                ranks = np.flatnonzero(positions >= 0)
+                count = len(positions)
+                vector_sum = None
+                if len(ranks):
+                    weights = self.decay ** ranks.astype(STATE_DTYPE)
+                    vector_sum = weights @ embeddings.vectors[positions[ranks]].astype(STATE_DTYPE)
+                values[f"{component.value}_sum"] = _encode(vector_sum)
+                values[f"{component.value}_count"] = count
+                component_embeddings[component] = self._mean(vector_sum, count)
+            values_by_user[user_id] = values
+            component_embeddings_by_user[user_id] = component_embeddings
+
+        await self.state_repo.upsert_states(values_by_user)
+        return component_embeddings_by_user
+
+    async def _evict(
+        self, states: Sequence[UserPreferenceState], overflow: dict[int, dict[PreferenceComponent, int]]
+    ) -> None:
+        """Subtract the interactions that are older than the latest ``max_interactions``."""
+        assert self.max_interactions is not None
+        evicted = await self.interaction_repo.get_recent_recipe_ids(
+            sorted(overflow),
+            limit=max(excess for excesses in overflow.values() for excess in excesses.values()),
+            offset=self.max_interactions,
+        )
+        embeddings = await self._get_embedding_matrix(
+            recipe_id
+            for user_id, excesses in overflow.items()
+            for component, excess in excesses.items()
+            for recipe_id in evicted[user_id][component][:excess]
+        )
+
+        for state in states:
+            for component, excess in overflow.get(state.user_id, {}).items():
+                sum_attr, count_attr = f"{component.value}_sum", f"{component.value}_count"
+                vector_sum = _decode(getattr(state, sum_attr))
+                positions = embeddings.positions(evicted[state.user_id][component][:excess])
+                ranks = np.flatnonzero(positions >= 0)
+                if vector_sum is not None and len(ranks):
+                    weights = self.decay ** (self.max_interactions + ranks).astype(STATE_DTYPE)
+                    vector_sum = vector_sum - weights @ embeddings.vectors[positions[ranks]].astype(STATE_DTYPE)
+                setattr(state, sum_attr, _encode(vector_sum))
+                setattr(state, count_attr, self.max_interactions)
+
+    async def apply_interactions(self, interactions: Sequence[Interaction], *, sign: int = 1) -> None:
+        """
+        Add (``sign=1``) or remove (``sign=-1``) interactions from already built user states and commit.
+
+        Users without a state are skipped, their state is built from the history on the next recommendations request.
+        Interactions are added in the given order, the last one is the newest. The commit also commits the
+        interactions the caller wrote after ``lock_users``.
+        """
+        await self._apply_interactions(interactions, sign=sign)
+        await self.state_repo.commit()
+
+    async def _apply_interactions(self, interactions: Sequence[Interaction], *, sign: int) -> None:
+        if not interactions:
+            return
+        if sign < 0 and self._is_windowed:
+            await self.state_repo.delete_states(sorted({user_id for user_id, _, _ in interactions}))
+            return
+
+        embeddings = await self._get_embedding_matrix(recipe_id for _, _, recipe_id in interactions)
+        positions = embeddings.positions([recipe_id for _, _, recipe_id in interactions])
+        interactions_by_user: dict[int, list[tuple[PreferenceComponent, int]]] = defaultdict(list)
+        for (user_id, component, _), position in zip(interactions, positions.tolist(), strict=True):
+            interactions_by_user[user_id].append((component, position))
+
+        states = await self.state_repo.get_states_for_update(sorted(interactions_by_user))
+        overflow: dict[int, dict[PreferenceComponent, int]] = defaultdict(dict)
+        for state in states:
+            for component, position in interactions_by_user[state.user_id]:
+                sum_attr, count_attr = f"{component.value}_sum", f"{component.value}_count"
+                vector_sum = _decode(getattr(state, sum_attr))
+                count = getattr(state, count_attr) + sign
+
+                if count <= 0:
+                    vector_sum, count = None, 0
+                elif vector_sum is not None:
+                    vector_sum = self.decay * vector_sum
+                # A recipe without an embedding only takes its rank
+                if count and position >= 0:
+                    delta = sign * embeddings.vectors[position].astype(STATE_DTYPE)
+                    vector_sum = delta if vector_sum is None else vector_sum + delta
+
+                setattr(state, sum_attr, _encode(vector_sum))
+                setattr(state, count_attr, count)
+                if self.max_interactions is not None and count > self.max_interactions:
+                    overflow[state.user_id][component] = count - self.max_interactions
+
+        if overflow:
+            await self._evict(states, overflow)
@@ -1,27 +1,46 @@
-from collections.abc import Sequence
+import asyncio
+from collections import defaultdict
 
 import numpy as np
 
+from src.algorithms.candidates import merge_interest_candidates, search_unseen_candidates
+from src.algorithms.cold_start import ColdStartPool
+from src.algorithms.mmr import mmr_select
+from src.algorithms.preference_state import ComponentEmbeddings, PreferenceStateManager
+from src.core.config import settings
+from src.core.metrics import RECOMMENDATION_STAGE_SECONDS
+from src.models.user_preference_state import PreferenceComponent
 from src.repositories.embeddings import EmbeddingsRepository
-from src.repositories.postgres import RecipeRepository, UserFeedbackRepository, UserImpressionRepository
+from src.repositories.postgres import UserInteractionRepository
 from src.repositories.qdrant import QdrantRepository
 from src.schemas.recommendations import UserPreferences
+from src.utils.seen_set import SeenSet
+from src.utils.timing import StageTimings
+from src.utils.vectors import EmbeddingMatrix, spherical_kmeans
+
+COMPONENT_WEIGHTS = {
+    PreferenceComponent.liked: 2.0,
+    PreferenceComponent.disliked: -1.0,
+    PreferenceComponent.viewed: 0.2,
+    PreferenceComponent.recs_detail: 0.2,
+}
 
 
 class RecommendationAlgorithm:
     def __init__(
         self,
-        feedback_repo: UserFeedbackRepository,
-        impression_repo: UserImpressionRepository,
+        interaction_repo: UserInteractionRepository,
+        preference_state: PreferenceStateManager,
         qdrant_repo: QdrantRepository,
         embeddings_repo: EmbeddingsRepository,
-        recipe_repo: RecipeRepository,
+        cold_start_pool: ColdStartPool | None = None,
     ) -> None:
-        self.feedback_repo = feedback_repo
-        self.impression_repo = impression_repo
+        self.interaction_repo = interaction_repo
+        self.preference_state = preference_state
         self.qdrant_repo = qdrant_repo
         self.embeddings_repo = embeddings_repo
-        self.recipe_repo = recipe_repo
+        self.cold_start_pool = cold_start_pool
+        self.timings = StageTimings(histogram=RECOMMENDATION_STAGE_SECONDS)
 
     def _validate_parameters(self, user_id: int, limit: int, fetch_k: int, lambda_mult: float) -> None:
         if user_id <= 0:
@@ -37,192 +56,237 @@ class RecommendationAlgorithm:
             msg = "Lambda mult must be in range [0, 1]"
             raise ValueError(msg)
 
-    async def _get_user_interactions(self, user_id: int) -> UserPreferences:
-        liked_ids = await self.feedback_repo.get_liked_recipe_ids(user_id)
-        disliked_ids = await self.feedback_repo.get_disliked_recipe_ids(user_id)
-        viewed_ids = await self.impression_repo.get_viewed_recipe_ids(user_id)
-        recs_detail_ids = await self.impression_repo.get_recs_detail_recipe_ids(user_id)
-        author_recipe_ids = await self.recipe_repo.get_recipe_ids_by_author(user_id)
-        return UserPreferences(
-            favorite_recipes_ids=liked_ids,
-            disliked_recipes_ids=disliked_ids,
-            viewed_recipes_ids=viewed_ids,
-            recs_detail_recipes_ids=recs_detail_ids,
-            author_recipes_ids=author_recipe_ids,
-        )
-
-    def _compute_component_embedding(
-        self,
-        recipe_ids: Sequence[int] | None,
-        recipe_embeddings: dict[int, list[float]],
-    ) -> np.ndarray | None:
-        if not recipe_ids:
-            return None
-
-        valid_embeddings = [recipe_embeddings[rid] for rid in recipe_ids if rid in recipe_embeddings]
-
-        if not valid_embeddings:
-            return None
-
-        normalized_embeddings = []
-        for emb in valid_embeddings:
-            emb_array = np.array(emb, dtype=np.float32)
-            norm = np.linalg.norm(emb_array)
-            if norm > 0:
-                normalized_embeddings.append(emb_array / norm)
-            else:
-                normalized_embeddings.append(emb_array)
-
-        if normalized_embeddings:
-            return np.mean(normalized_embeddings, axis=0)
-        return None
-
-    def _construct_recipe_ids_list(self, user_preferences: UserPreferences) -> list[int]:
-        all_recipe_ids_list: list[int] = []
-        if user_preferences.favorite_recipes_ids:
-            all_recipe_ids_list += user_preferences.favorite_recipes_ids
-        if user_preferences.disliked_recipes_ids:
-            all_recipe_ids_list += user_preferences.disliked_recipes_ids
-        if user_preferences.recs_detail_recipes_ids:
-            all_recipe_ids_list += user_preferences.recs_detail_recipes_ids
-        return all_recipe_ids_list
-
-    async def compute_user_preference_vector(self, user_id: int) -> list[float] | None:
-        user_preferences = await self._get_user_interactions(user_id)
-        all_recipe_ids_list = self._construct_recipe_ids_list(user_preferences)
-
-        all_recipe_ids = list(set(all_recipe_ids_list))
-        if all_recipe_ids:
-            recipe_embeddings = await self.qdrant_repo.get_recipe_embeddings(all_recipe_ids)
-            if not recipe_embeddings:
-                return None
-
-            liked_emb = self._compute_component_embedding(user_preferences.favorite_recipes_ids, recipe_embeddings)
-            disliked_emb = self._compute_component_embedding(user_preferences.disliked_recipes_ids, recipe_embeddings)
-            viewed_emb = self._compute_component_embedding(user_preferences.viewed_recipes_ids, recipe_embeddings)
-            recs_detail_emb = self._compute_component_embedding(
-                user_preferences.recs_detail_recipes_ids, recipe_embeddings
-            )
-        else:
-            liked_emb, disliked_emb, viewed_emb, recs_detail_emb = None, None, None, None
-
-        user_vector = np.array([0.0] * 1024)
-
-        if liked_emb is not None:
-            user_vector = liked_emb * 2.0
-
-        if disliked_emb is not None:
-            user_vector = user_vector - disliked_emb if user_vector is not None else -disliked_emb
-
-        if viewed_emb is not None:
-            user_vector = user_vector + 0.2 * viewed_emb if user_vector is not None else 0.2 * viewed_emb
-
-        if recs_detail_emb is not None:
-            user_vector = user_vector + 0.2 * recs_detail_emb if user_vector is not None else 0.2 * recs_detail_emb
-
-        if user_vector is None:
+    def _combine_component_embeddings(self, component_embeddings: ComponentEmbeddings) -> list[float] | None:
+        weighted_embeddings = [
+            COMPONENT_WEIGHTS[component] * embedding
+            for component, embedding in component_embeddings.items()
+            if embedding is not None
+        ]
+        if not weighted_embeddings:
             return None
 
+        user_vector = np.sum(weighted_embeddings, axis=0)
         norm = np.linalg.norm(user_vector)
-        if norm > 0:
-            user_vector = user_vector / norm
-        else:
+        if norm == 0:
             return None
+        return (user_vector / norm).tolist()
 
-        return user_vector.tolist()
-
-    def _calculate_cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+    async def compute_user_preference_vector(self, user_id: int) -> list[float] | None:
+        return (await self.compute_user_preference_vectors([user_id])).get(user_id)
+
+    async def compute_user_preference_vectors(self, user_ids: list[int]) -> dict[int, list[float] | None]:
+        component_embeddings = await self._get_users_component_embeddings(user_ids)
+        return {user_id: self._combine_component_embeddings(component_embeddings[user_id]) for user_id in user_ids}
+
+    async def _get_users_component_embeddings(self, user_ids: list[int]) -> dict[int, ComponentEmbeddings]:
+        if not user_ids:
+            return {}
+        component_embeddings = await self.preference_state.get_users_component_embeddings(user_ids)
+        missing_user_ids = [user_id for user_id in user_ids if user_id not in component_embeddings]
+        if missing_user_ids:
+            component_embeddings |= await self.preference_state.build_missing_states(missing_user_ids)
+        return component_embeddings
+
+    def _get_interest_liked_ids(self, user_preferences: UserPreferences) -> list[int]:
+        """Return the liked recipes to cluster, empty when there are too few of them for two interests."""
+        config = settings.multi_interest
+        liked_ids = list(dict.fromkeys(user_preferences.favorite_recipes_ids or []))
+        if config.max_interests < 2 or len(liked_ids) < 2 * config.min_likes_per_interest:  # noqa: PLR2004
+            return []
+        return liked_ids[: settings.preference_window.max_interactions]
+
+    def _get_interest_vectors(
+        self, component_embeddings: ComponentEmbeddings, liked_embeddings: EmbeddingMatrix, liked_ids: list[int]
+    ) -> list[list[float]]:
+        """
+        Return one query vector per interest of the user, the largest interest first.
+
+        Liked embeddings are clustered with spherical k-means into up to ``max_interests`` clusters of at least
+        ``min_likes_per_interest`` likes on average. An interest vector is the user vector with the mean of all likes
+        replaced by the mean of the cluster, so the other components keep their weights. Returns an empty list when
+        the likes do not form two interests.
+        """
+        config = settings.multi_interest
+        if not liked_ids:
+            return []
+        positions = liked_embeddings.positions(liked_ids)
+        vectors = liked_embeddings.vectors[positions[positions >= 0]]
+        clusters = min(config.max_interests, len(vectors) // config.min_likes_per_interest)
+        if clusters < 2:  # noqa: PLR2004
+            return []
 
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
+        _, labels = spherical_kmeans(vectors, clusters)
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.zeros((clusters, vectors.shape[1]), dtype=vectors.dtype)
+        np.add.at(sums, labels, vectors)
+        interest_vectors = []
+        for cluster in np.argsort(-counts, kind="stable"):
+            if counts[cluster] == 0:
+                continue
+            interest_vector = self._combine_component_embeddings(
+                component_embeddings | {PreferenceComponent.liked: sums[cluster] / counts[cluster]}
+            )
+            if interest_vector is not None:
+                interest_vectors.append(interest_vector)
+        return interest_vectors if len(interest_vectors) > 1 else []
+
+    def _get_seen_set(self, user_preferences: UserPreferences) -> SeenSet:
+        return SeenSet.from_ids(
+            recipe_id
+            for recipe_ids in (
+                user_preferences.viewed_recipes_ids,
+                user_preferences.favorite_recipes_ids,
+                user_preferences.disliked_recipes_ids,
+                user_preferences.author_recipes_ids,
+            )
+            for recipe_id in recipe_ids or []
+        )
 
-        return np.dot(vec1, vec2) / (norm1 * norm2)
+    def _count_interactions(self, user_preferences: UserPreferences) -> int:
+        return len(
+            {
+                *(user_preferences.viewed_recipes_ids or []),
+                *(user_preferences.favorite_recipes_ids or []),
+                *(user_preferences.disliked_recipes_ids or []),
+            }
+        )
 
     async def _apply_mmr_selection(
-        self, candidates: list[dict], candidate_embeddings: dict[int, list[float]], limit: int, lambda_mult: float
+        self, candidates: list[dict], candidate_embeddings: EmbeddingMatrix, limit: int, lambda_mult: float
     ) -> list[dict]:
         if len(candidates) <= limit:
             return candidates
 
-        selected = [candidates[0]]
-        remaining = candidates[1:]
-
-        while len(selected) < limit and remaining:
-            best_score = -np.inf
-            best_idx = -1
-
-            for i, candidate in enumerate(remaining):
-                candidate_id = candidate["recipe_id"]
-
-                if candidate_id not in candidate_embeddings:
-                    continue
-
-                relevance = 1 - candidate["score"]
-                max_similarity = 0.0
-                current_emb = np.array(candidate_embeddings[candidate_id], dtype=np.float32)
+        embeddings, available = candidate_embeddings.aligned([c["recipe_id"] for c in candidates])
+        if not available.any():
+            return candidates[:1]
 
-                for selected_candidate in selected:
-                    selected_id = selected_candidate["recipe_id"]
-                    if selected_id in candidate_embeddings:
-                        selected_emb = np.array(candidate_embeddings[selected_id], dtype=np.float32)
-                        similarity = self._calculate_cosine_similarity(current_emb, selected_emb)
-                        max_similarity = max(max_similarity, similarity)
-
-                mmr_score = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
-
-                if mmr_score > best_score:
-                    best_score = mmr_score
-                    best_idx = i
-
-            if best_idx != -1:
-                selected.append(remaining.pop(best_idx))
-            else:
-                break
-        return selected
+        relevance = np.array([1 - c["score"] for c in candidates], dtype=np.float32)
+        selected_indices = mmr_select(relevance, embeddings, limit, lambda_mult, available)
+        return [candidates[i] for i in selected_indices]
 
     async def get_recommendations(
         self, user_id: int, limit: int = 10, fetch_k: int = 20, lambda_mult: float = 0.5, *, exclude_viewed: bool = True
     ) -> list[dict]:
-        self._validate_parameters(user_id, limit, fetch_k, lambda_mult)
-
-        user_vector = await self.compute_user_preference_vector(user_id)
-        if user_vector is None:
-            return []
-
-        exclude_ids = []
-        if exclude_viewed:
-            user_preferences = await self._get_user_interactions(user_id)
-            exclude_ids_list: list[int] = []
-            if user_preferences.viewed_recipes_ids:
-                exclude_ids_list += user_preferences.viewed_recipes_ids
-
-            if user_preferences.favorite_recipes_ids:
-                exclude_ids_list += user_preferences.favorite_recipes_ids
-
-            if user_preferences.disliked_recipes_ids:
-                exclude_ids_list += user_preferences.disliked_recipes_ids
-
-            if user_preferences.author_recipes_ids:
-                exclude_ids_list += user_preferences.author_recipes_ids
-
-            exclude_ids = list(set(exclude_ids_list)) if exclude_ids_list else []
-        candidates_result = await self.qdrant_repo.get_recommendations(
-            query_vector=user_vector, limit=fetch_k, exclude_ids=exclude_ids
+        recommendations = await self.get_recommendations_batch(
+            [user_id], limit, fetch_k, lambda_mult, exclude_viewed=exclude_viewed
         )
+        return recommendations[user_id]
 
-        if not candidates_result.points:
-            return []
-
-        candidates = [
-            {"recipe_id": point.id, "score": point.score, "payload": point.payload if hasattr(point, "payload") else {}}
-            for point in candidates_result.points
-        ]
-
-        candidate_ids = [c["recipe_id"] for c in candidates]
-        candidate_embeddings = await self.qdrant_repo.get_recipe_embeddings(candidate_ids)
-        return await self._apply_mmr_selection(candidates, candidate_embeddings, limit, lambda_mult)
+    async def get_recommendations_batch(
+        self,
+        user_ids: list[int],
+        limit: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        *,
+        exclude_viewed: bool = True,
+    ) -> dict[int, list[dict]]:
+        """
+        Build recommendations for several users at once.
+
+        Preference states and interactions are read with one query each, candidate searches of all users go to Qdrant
+        in batch requests (see ``search_unseen_candidates``) and the candidate embeddings of every user are retrieved
+        together. Users without a preference vector or with fewer interactions than
+        ``settings.cold_start.min_interactions`` are served from the cold start pool once it is loaded. Users whose
+        likes form several interests are searched with one query per interest in the same batch, the candidates of
+        their interests are merged before MMR (see ``merge_interest_candidates``). Time spent in every stage is
+        accumulated in ``timings``.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        for user_id in user_ids:
+            self._validate_parameters(user_id, limit, fetch_k, lambda_mult)
+
+        recommendations: dict[int, list[dict]] = {user_id: [] for user_id in user_ids}
+        cold_start_pool = self.cold_start_pool
+        if cold_start_pool is not None and not cold_start_pool.is_ready:
+            cold_start_pool = None
+        min_interactions = settings.cold_start.min_interactions if cold_start_pool is not None else 0
+
+        seen_sets = {user_id: SeenSet.from_ids([]) for user_id in user_ids}
+        sparse_user_ids: set[int] = set()
+        liked_ids_by_user: dict[int, list[int]] = {}
+        if exclude_viewed or min_interactions or settings.multi_interest.max_interests > 1:
+            with self.timings.stage("interactions"):
+                users_preferences = await self.interaction_repo.get_users_preferences(user_ids)
+                if exclude_viewed:
+                    seen_sets = {user_id: self._get_seen_set(users_preferences[user_id]) for user_id in user_ids}
+                sparse_user_ids = {
+                    user_id
+                    for user_id in user_ids
+                    if self._count_interactions(users_preferences[user_id]) < min_interactions
+                }
+                liked_ids_by_user = {
+                    user_id: self._get_interest_liked_ids(users_preferences[user_id])
+                    for user_id in user_ids
+                    if user_id not in sparse_user_ids
+                }
+
+        # Sparse users are served from the pool without reading or rebuilding their preference state. Liked
+        # embeddings of users with several interests are retrieved while the states are read
+        with self.timings.stage("preference_vector"):
+            component_embeddings, liked_embeddings = await asyncio.gather(
+                self._get_users_component_embeddings(
+                    [user_id for user_id in user_ids if user_id not in sparse_user_ids]
+                ),
+                self.qdrant_repo.get_recipe_embedding_matrix(
+                    list({recipe_id for liked_ids in liked_ids_by_user.values() for recipe_id in liked_ids})
+                ),
+            )
+            user_vectors = {
+                user_id: self._combine_component_embeddings(embeddings)
+                for user_id, embeddings in component_embeddings.items()
+            }
+        query_user_vectors = {
+            user_id: vector for user_id in user_ids if (vector := user_vectors.get(user_id)) is not None
+        }
+
+        if cold_start_pool is not None:
+            with self.timings.stage("cold_start"):
+                for user_id in user_ids:
+                    if user_id not in query_user_vectors:
+                        recommendations[user_id] = cold_start_pool.get_recommendations(seen_sets[user_id], limit)
+        if not query_user_vectors:
+            return recommendations
+
+        with self.timings.stage("interests"):
+            queries: list[tuple[int, list[float]]] = []
+            for user_id, user_vector in query_user_vectors.items():
+                interest_vectors = self._get_interest_vectors(
+                    component_embeddings[user_id], liked_embeddings, liked_ids_by_user.get(user_id, [])
+                )
+                queries.extend((user_id, vector) for vector in interest_vectors or [user_vector])
+
+        with self.timings.stage("candidate_query"):
+            candidates_points = await search_unseen_candidates(
+                self.qdrant_repo,
+                query_vectors=[vector for _, vector in queries],
+                seen_sets=[seen_sets[user_id] for user_id, _ in queries],
+                fetch_k=fetch_k,
+                config=settings.seen_filter,
+            )
+        points_by_user: defaultdict[int, list[list]] = defaultdict(list)
+        for (user_id, _), points in zip(queries, candidates_points, strict=True):
+            points_by_user[user_id].append(points)
+        candidates_by_user = {
+            user_id: [
+                {"recipe_id": point.id, "score": point.score, "payload": point.payload or {}}
+                for point in merge_interest_candidates(points_per_interest, fetch_k)
+            ]
+            for user_id, points_per_interest in points_by_user.items()
+        }
+
+        with self.timings.stage("embedding_retrieve"):
+            candidate_embeddings = await self.qdrant_repo.get_recipe_embedding_matrix(
+                list({candidate["recipe_id"] for candidates in candidates_by_user.values() for candidate in candidates})
+            )
+        with self.timings.stage("mmr"):
+            for user_id, candidates in candidates_by_user.items():
+                if candidates:
+                    recommendations[user_id] = await self._apply_mmr_selection(
+                        candidates, candidate_embeddings, limit, lambda_mult
+                    )
+        return recommendations
 
     async def get_all_recipe_ids(self) -> list[int]:
         return await self.qdrant_repo.get_all_recipe_ids()
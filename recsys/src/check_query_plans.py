@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from sqlalchemy import CompoundSelect, Select, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.di import container
+from src.models.user_impression import UserImpression
+from src.repositories.postgres import UserInteractionRepository
+
+logger = logging.getLogger(__name__)
+
+# Queries of every recommendation request, their scans of the interaction tables must be index-only
+HOT_QUERIES: dict[str, Callable[[list[int]], Select | CompoundSelect]] = {
+    "users_preferences": UserInteractionRepository.build_preferences_query,
+    "recent_recipe_ids": lambda user_ids: UserInteractionRepository.build_recent_recipe_ids_query(
+        user_ids, settings.preference_window.max_interactions
+    ),
+}
+# Partitions of user_impression are matched by the prefix
+CHECKED_TABLES = ("user_feedback", "user_impression", "recipes")
+
+
+def iter_scans(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    if "Relation Name" in plan:
+        yield plan
+    for subplan in plan.get("Plans", []):
+        yield from iter_scans(subplan)
+
+
+def find_violations(plan: dict[str, Any]) -> list[str]:
+    return [
+        f"{scan['Node Type']} on {scan['Relation Name']}"
+        for scan in iter_scans(plan)
+        if scan["Relation Name"].startswith(CHECKED_TABLES) and scan["Node Type"] != "Index Only Scan"
+    ]
+
+
+async def explain(session: AsyncSession, stmt: Select | CompoundSelect, *, analyze: bool) -> dict[str, Any]:
+    sql = stmt.compile(dialect=session.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    result = await session.scalar(text(f"EXPLAIN ({options}) {sql}"))
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+async def get_sample_user_ids(session: AsyncSession, users: int) -> list[int]:
+    stmt = select(UserImpression.user_id).order_by(UserImpression.created_at.desc()).limit(users * 100)
+    return list(dict.fromkeys((await session.scalars(stmt)).all()))[:users]
+
+
+async def main(user_ids: list[int] | None, users: int, *, force_index: bool, analyze: bool) -> bool:
+    async with container() as request_container:
+        session = await request_container.get(AsyncSession)
+        user_ids = user_ids or await get_sample_user_ids(session, users)
+        if not user_ids:
+            logger.error("No users with impressions, pass --user-id")
+            return False
+
+        if force_index:
+            # Checks that an index-only plan exists on a small or unanalyzed database
+            await session.execute(text("SET LOCAL enable_seqscan = off"))
+            await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+
+        passed = True
+        for name, build_query in HOT_QUERIES.items():
+            plan = await explain(session, build_query(user_ids), analyze=analyze)
+            violations = find_violations(plan)
+            if violations:
+                passed = False
+                logger.error("%s is not index-only: %s", name, ", ".join(sorted(set(violations))))
+            else:
+                logger.info("%s is index-only", name)
+            if analyze:
+                heap_fetches = sum(scan.get("Heap Fetches", 0) for scan in iter_scans(plan))
+                logger.info("%s: %.1f ms, %d heap fetches", name, plan["Actual Total Time"], heap_fetches)
+        await session.rollback()
+        return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check with EXPLAIN that the hot recommendation queries read the interaction tables index-only"
+    )
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="Explain for the given users")
+    parser.add_argument("--users", type=int, default=20, help="Number of recently active users to explain for")
+    parser.add_argument(
+        "--force-index", action="store_true", help="Disable sequential and bitmap scans, for small databases"
+    )
+    parser.add_argument("--analyze", action="store_true", help="Run the queries and report time and heap fetches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(
+        0 if asyncio.run(main(args.user_ids, args.users, force_index=args.force_index, analyze=args.analyze)) else 1
+    )
@@ -1,7 +1,7 @@
 from pathlib import Path
 from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 PATH = Path(__file__).parent.parent.parent
@@ -10,6 +10,23 @@ PATH = Path(__file__).parent.parent.parent
 class QdrantConfig(BaseModel):
     host: str
     port: int
+    collection_profile: Literal["default", "int8", "int8_on_disk", "on_disk", "compact_hnsw"] = "default"
+    prefer_grpc: bool = False
+    grpc_port: int = 6334
+    timeout_seconds: int = 5
+    # Connections of the REST transport, gRPC multiplexes all requests over one HTTP/2 connection
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+
+    @model_validator(mode="after")
+    def validate_connections(self) -> "QdrantConfig":
+        if self.timeout_seconds <= 0 or self.max_connections <= 0:
+            msg = "Qdrant timeout and max connections must be positive"
+            raise ValueError(msg)
+        if not 0 <= self.max_keepalive_connections <= self.max_connections:
+            msg = "Qdrant max keepalive connections must be in range [0, max_connections]"
+            raise ValueError(msg)
+        return self
 
 
 class PostgresConfig(BaseModel):
@@ -36,6 +53,11 @@ class GigachatConfig(BaseModel):
     api_key: str
 
 
+class EmbeddingsConfig(BaseModel):
+    backend: Literal["gigachat", "hashing"] = "gigachat"
+    dimension: int = 1024
+
+
 class NatsConfig(BaseModel):
     host: str
     port: int
@@ -46,15 +68,183 @@ class AsgiFastStreamConfig(BaseModel):
     port: str
 
 
+class VectorEngineConfig(BaseModel):
+    mode: Literal["qdrant", "local"] = "qdrant"
+    local_path: Path = PATH / ".vector_engine"
+    bootstrap_batch_size: int = 1000
+
+
+class RecipeIngestionConfig(BaseModel):
+    batch_size: int = 64
+    batch_timeout_ms: int = 500
+
+
+class InteractionIngestionConfig(BaseModel):
+    batch_size: int = 500
+    batch_timeout_ms: int = 50
+
+    @model_validator(mode="after")
+    def validate_batch_size(self) -> "InteractionIngestionConfig":
+        # A row of the batch insert takes four bind parameters, asyncpg accepts at most 32767 of them
+        if not 0 < self.batch_size <= 5000:  # noqa: PLR2004
+            msg = "Interaction batch size must be in range [1, 5000]"
+            raise ValueError(msg)
+        return self
+
+
+class RpcConfig(BaseModel):
+    max_in_flight: int = 16
+
+    @model_validator(mode="after")
+    def validate_max_in_flight(self) -> "RpcConfig":
+        if self.max_in_flight <= 0:
+            msg = "Max in-flight RPC requests must be positive"
+            raise ValueError(msg)
+        return self
+
+
+class EmbeddingCacheConfig(BaseModel):
+    enabled: bool = True
+    max_entries: int = 100_000
+    eviction_interval: int = 100
+    stats_log_interval: int = 100
+    touch_interval_seconds: int = 60 * 60
+
+
+class SeenFilterConfig(BaseModel):
+    exact_threshold: int = 256
+    overfetch_factor: float = 4
+    max_page_size: int = 1000
+    max_rounds: int = 3
+
+
+class PreferenceWindowConfig(BaseModel):
+    max_interactions: int | None = 500
+    recency_half_life: float | None = None
+
+    @model_validator(mode="after")
+    def validate_window(self) -> "PreferenceWindowConfig":
+        if self.max_interactions is not None and self.max_interactions <= 0:
+            msg = "Max interactions must be positive"
+            raise ValueError(msg)
+        if self.recency_half_life is not None and self.recency_half_life <= 0:
+            msg = "Recency half-life must be positive"
+            raise ValueError(msg)
+        return self
+
+
+class FeedConfig(BaseModel):
+    scheduler_enabled: bool = True
+    size: int = 10
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    refresh_interval_seconds: float = 30
+    refresh_batch_size: int = 100
+    active_window_seconds: int = 24 * 60 * 60
+    max_age_seconds: int = 60 * 60
+    refresh_claim_seconds: int = 5 * 60
+
+    @model_validator(mode="after")
+    def validate_size(self) -> "FeedConfig":
+        # MMR keeps the candidates order when there are not more of them than the limit, so a feed is a prefix of
+        # the live result only when it is strictly shorter than the candidates pool
+        if not 0 < self.size < self.fetch_k:
+            msg = "Feed size must be positive and less than fetch k"
+            raise ValueError(msg)
+        return self
+
+
+class MultiInterestConfig(BaseModel):
+    max_interests: int = 3
+    min_likes_per_interest: int = 5
+
+    @model_validator(mode="after")
+    def validate_interests(self) -> "MultiInterestConfig":
+        if self.max_interests < 1 or self.min_likes_per_interest < 1:
+            msg = "Max interests and min likes per interest must be positive"
+            raise ValueError(msg)
+        return self
+
+
+class ColdStartConfig(BaseModel):
+    enabled: bool = True
+    size: int = 500
+    candidates: int = 5000
+    clusters: int = 20
+    min_interactions: int = 3
+    popularity_window_seconds: int = 7 * 24 * 60 * 60
+    refresh_interval_seconds: float = 600
+
+    @model_validator(mode="after")
+    def validate_size(self) -> "ColdStartConfig":
+        if not 0 < self.size <= self.candidates:
+            msg = "Cold start pool size must be positive and not greater than candidates"
+            raise ValueError(msg)
+        if self.clusters <= 0:
+            msg = "Cold start clusters must be positive"
+            raise ValueError(msg)
+        return self
+
+
+class ResultCacheConfig(BaseModel):
+    enabled: bool = True
+    ttl_seconds: float = 10
+    max_entries: int = 10_000
+
+    @model_validator(mode="after")
+    def validate_limits(self) -> "ResultCacheConfig":
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            msg = "Result cache TTL and max entries must be positive"
+            raise ValueError(msg)
+        return self
+
+
+class ImpressionPartitionsConfig(BaseModel):
+    maintenance_enabled: bool = True
+    months_ahead: int = 3
+    retention_months: int | None = None
+    maintenance_interval_seconds: float = 60 * 60
+
+    @model_validator(mode="after")
+    def validate_months(self) -> "ImpressionPartitionsConfig":
+        if self.months_ahead < 1:
+            msg = "At least one partition must be created ahead"
+            raise ValueError(msg)
+        if self.retention_months is not None and self.retention_months < 1:
+            msg = "Retention must be at least one month"
+            raise ValueError(msg)
+        return self
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="RECSYS__", env_file=PATH.parent / ".env", env_nested_delimiter="__")
 
-    gigachat: GigachatConfig
+    gigachat: GigachatConfig | None = None
     qdrant: QdrantConfig
     postgres: PostgresConfig
     asgi_faststream: AsgiFastStreamConfig
     nats: NatsConfig
+    vector_engine: VectorEngineConfig = VectorEngineConfig()
+    recipe_ingestion: RecipeIngestionConfig = RecipeIngestionConfig()
+    interaction_ingestion: InteractionIngestionConfig = InteractionIngestionConfig()
+    rpc: RpcConfig = RpcConfig()
+    embeddings: EmbeddingsConfig = EmbeddingsConfig()
+    embedding_cache: EmbeddingCacheConfig = EmbeddingCacheConfig()
+    feed: FeedConfig = FeedConfig()
+    seen_filter: SeenFilterConfig = SeenFilterConfig()
+    preference_window: PreferenceWindowConfig = PreferenceWindowConfig()
+    multi_interest: MultiInterestConfig = MultiInterestConfig()
+    cold_start: ColdStartConfig = ColdStartConfig()
+    result_cache: ResultCacheConfig = ResultCacheConfig()
+    impression_partitions: ImpressionPartitionsConfig = ImpressionPartitionsConfig()
     mode: Literal["dev", "test", "prod"] = "prod"
 
+    @model_validator(mode="after")
+    def validate_embeddings_backend(self) -> "Settings":
+        if self.embeddings.backend == "gigachat" and self.gigachat is None:
+            msg = "GigaChat settings are required for the gigachat embeddings backend"
+            raise ValueError(msg)
+        return self
+
 
 settings = Settings()
@@ -1,17 +1,35 @@
 from collections.abc import AsyncIterator
+from datetime import timedelta
 
+import httpx
 from dishka import Provider, Scope, provide
+from langchain_core.embeddings import Embeddings
 from langchain_gigachat.embeddings import GigaChatEmbeddings
 from qdrant_client.async_qdrant_client import AsyncQdrantClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from src.algorithms.cold_start import ColdStartPool
+from src.algorithms.preference_state import PreferenceStateManager
 from src.algorithms.recommendation_algorithm import RecommendationAlgorithm
 from src.core.config import settings
 from src.db.manager import DatabaseManager
-from src.repositories.embeddings import EmbeddingsRepository
-from src.repositories.postgres import RecipeRepository, UserFeedbackRepository, UserImpressionRepository
-from src.repositories.qdrant import QdrantRepository
+from src.repositories.embeddings import CachedEmbeddingsRepository, EmbeddingCacheStats, EmbeddingsRepository
+from src.repositories.local_vectors import LocalVectorIndex, LocalVectorRepository
+from src.repositories.postgres import (
+    EmbeddingCacheRepository,
+    EmbeddingCollectionRebuildRepository,
+    ImpressionPartitionRepository,
+    RecipeRepository,
+    UserFeedbackRepository,
+    UserImpressionRepository,
+    UserInteractionRepository,
+    UserPreferenceStateRepository,
+    UserRecommendationFeedRepository,
+)
+from src.repositories.qdrant import COLLECTION_PROFILES, QdrantRepository
 from src.services.recs_service import RecommendationService
+from src.utils.hashing_embeddings import HashingEmbeddings
+from src.utils.result_cache import RecommendationResultCache
 
 
 class DatabaseProvider(Provider):
@@ -43,16 +61,38 @@ class QdrantProvider(Provider):
 
     @provide
     def get_qdrant_client(self) -> AsyncQdrantClient:
-        return AsyncQdrantClient(host=settings.qdrant.host, port=settings.qdrant.port)
+        config = settings.qdrant
+        # Explicit limits also keep connections alive for a local host, where the client disables keep-alive by default
+        return AsyncQdrantClient(
+            host=config.host,
+            port=config.port,
+            grpc_port=config.grpc_port,
+            prefer_grpc=config.prefer_grpc,
+            timeout=config.timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=config.max_connections, max_keepalive_connections=config.max_keepalive_connections
+            ),
+        )
+
+    @provide
+    def get_local_vector_index(self) -> LocalVectorIndex:
+        return LocalVectorIndex(settings.vector_engine.local_path)
 
 
 class EmbeddingsProvider(Provider):
     scope = Scope.APP
 
     @provide
-    def get_embeddings_model(self) -> GigaChatEmbeddings:
+    def get_embeddings_model(self) -> Embeddings:
+        if settings.embeddings.backend == "hashing":
+            return HashingEmbeddings(dimension=settings.embeddings.dimension)
+        assert settings.gigachat is not None
         return GigaChatEmbeddings(credentials=settings.gigachat.api_key, verify_ssl_certs=False)
 
+    @provide
+    def get_embedding_cache_stats(self) -> EmbeddingCacheStats:
+        return EmbeddingCacheStats()
+
 
 class RepositoryProvider(Provider):
     scope = Scope.REQUEST
@@ -70,47 +110,131 @@ class RepositoryProvider(Provider):
         return UserImpressionRepository(session)
 
     @provide
-    def get_qdrant_repository(self, qdrant_client: AsyncQdrantClient) -> QdrantRepository:
-        return QdrantRepository(qdrant_client)
+    def get_user_interaction_repository(self, session: AsyncSession) -> UserInteractionRepository:
+        return UserInteractionRepository(session)
+
+    @provide
+    def get_user_preference_state_repository(self, session: AsyncSession) -> UserPreferenceStateRepository:
+        return UserPreferenceStateRepository(session)
+
+    @provide
+    def get_user_recommendation_feed_repository(self, session: AsyncSession) -> UserRecommendationFeedRepository:
+        return UserRecommendationFeedRepository(session)
+
+    @provide
+    def get_embedding_collection_rebuild_repository(
+        self, session: AsyncSession
+    ) -> EmbeddingCollectionRebuildRepository:
+        return EmbeddingCollectionRebuildRepository(session)
+
+    @provide
+    def get_impression_partition_repository(self, session: AsyncSession) -> ImpressionPartitionRepository:
+        return ImpressionPartitionRepository(session)
+
+    @provide
+    def get_qdrant_repository(
+        self, qdrant_client: AsyncQdrantClient, local_vector_index: LocalVectorIndex
+    ) -> QdrantRepository:
+        profile = COLLECTION_PROFILES[settings.qdrant.collection_profile]
+        if settings.vector_engine.mode == "local":
+            return LocalVectorRepository(qdrant_client, local_vector_index, profile)
+        return QdrantRepository(qdrant_client, profile)
+
+    @provide
+    def get_embedding_cache_repository(self, session: AsyncSession) -> EmbeddingCacheRepository:
+        return EmbeddingCacheRepository(session)
 
     @provide
-    def get_embeddings_repository(self, embeddings_model: GigaChatEmbeddings) -> EmbeddingsRepository:
-        return EmbeddingsRepository(embeddings_model)
+    def get_embeddings_repository(
+        self,
+        embeddings_model: Embeddings,
+        cache_repo: EmbeddingCacheRepository,
+        cache_stats: EmbeddingCacheStats,
+    ) -> EmbeddingsRepository:
+        # Local vectors are computed faster than they are read from the cache
+        if not settings.embedding_cache.enabled or settings.embeddings.backend == "hashing":
+            return EmbeddingsRepository(embeddings_model)
+        return CachedEmbeddingsRepository(
+            embeddings_model,
+            cache_repo=cache_repo,
+            stats=cache_stats,
+            max_entries=settings.embedding_cache.max_entries,
+            eviction_interval=settings.embedding_cache.eviction_interval,
+            stats_log_interval=settings.embedding_cache.stats_log_interval,
+            touch_interval=timedelta(seconds=settings.embedding_cache.touch_interval_seconds),
+        )
 
 
 class ServiceProvider(Provider):
     scope = Scope.REQUEST
 
+    @provide(scope=Scope.APP)
+    def get_cold_start_pool(self) -> ColdStartPool:
+        return ColdStartPool()
+
+    @provide(scope=Scope.APP)
+    def get_recommendation_result_cache(self) -> RecommendationResultCache:
+        return RecommendationResultCache(
+            ttl=settings.result_cache.ttl_seconds, max_entries=settings.result_cache.max_entries
+        )
+
+    @provide
+    def get_preference_state_manager(
+        self,
+        state_repo: UserPreferenceStateRepository,
+        interaction_repo: UserInteractionRepository,
+        qdrant_repo: QdrantRepository,
+    ) -> PreferenceStateManager:
+        return PreferenceStateManager(
+            state_repo=state_repo,
+            interaction_repo=interaction_repo,
+            qdrant_repo=qdrant_repo,
+            max_interactions=settings.preference_window.max_interactions,
+            recency_half_life=settings.preference_window.recency_half_life,
+        )
+
     @provide
     def get_recommendation_service(
         self,
         recipe_repo: RecipeRepository,
         feedback_repo: UserFeedbackRepository,
         impression_repo: UserImpressionRepository,
+        interaction_repo: UserInteractionRepository,
+        feed_repo: UserRecommendationFeedRepository,
+        rebuild_repo: EmbeddingCollectionRebuildRepository,
+        preference_state: PreferenceStateManager,
         qdrant_repo: QdrantRepository,
         embeddings_repo: EmbeddingsRepository,
+        cold_start_pool: ColdStartPool,
+        result_cache: RecommendationResultCache,
     ) -> RecommendationService:
         return RecommendationService(
             recipe_repo=recipe_repo,
             feedback_repo=feedback_repo,
             impression_repo=impression_repo,
+            interaction_repo=interaction_repo,
+            feed_repo=feed_repo,
+            rebuild_repo=rebuild_repo,
+            preference_state=preference_state,
             qdrant_repo=qdrant_repo,
             embeddings_repo=embeddings_repo,
+            cold_start_pool=cold_start_pool if settings.cold_start.enabled else None,
+            result_cache=result_cache if settings.result_cache.enabled else None,
         )
 
     @provide
     def get_recommendation_algorithm(
         self,
-        feedback_repo: UserFeedbackRepository,
-        impression_repo: UserImpressionRepository,
+        interaction_repo: UserInteractionRepository,
+        preference_state: PreferenceStateManager,
         qdrant_repo: QdrantRepository,
         embeddings_repo: EmbeddingsRepository,
-        recipe_repo: RecipeRepository,
+        cold_start_pool: ColdStartPool,
     ) -> RecommendationAlgorithm:
         return RecommendationAlgorithm(
-            feedback_repo=feedback_repo,
-            impression_repo=impression_repo,
+            interaction_repo=interaction_repo,
+            preference_state=preference_state,
             qdrant_repo=qdrant_repo,
             embeddings_repo=embeddings_repo,
-            recipe_repo=recipe_repo,
+            cold_start_pool=cold_start_pool if settings.cold_start.enabled else None,
         )
@@ -0,0 +1,75 @@
+import time
+from types import TracebackType
+from typing import Any
+
+from faststream import BaseMiddleware
+from faststream.asgi import AsgiResponse, get
+from faststream.asgi.types import Scope
+
+from src.utils.metrics import Counter, Histogram, MetricsRegistry
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+registry = MetricsRegistry()
+
+RECOMMENDATION_STAGE_SECONDS = registry.register(
+    Histogram(
+        "recsys_recommendation_stage_seconds",
+        "Time spent in a stage of the recommendation algorithm or of the RPC response",
+        ["stage"],
+    )
+)
+NATS_PROCESSING_SECONDS = registry.register(
+    Histogram(
+        "recsys_nats_processing_seconds",
+        "Time from receiving a NATS message or batch to the end of its processing, the reply included",
+        ["subject"],
+    )
+)
+NATS_BATCH_SIZE = registry.register(
+    Histogram("recsys_nats_batch_size", "Messages per handler call", ["subject"], buckets=BATCH_SIZE_BUCKETS)
+)
+NATS_REDELIVERIES = registry.register(
+    Counter("recsys_nats_redelivered_messages_total", "JetStream messages delivered more than once", ["subject"])
+)
+EMBEDDING_REQUEST_SECONDS = registry.register(
+    Histogram("recsys_embedding_request_seconds", "Latency of a call to the embeddings backend", ["operation"])
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Observe the processing time, the batch size and the redeliveries of every consumed message or batch."""
+
+    async def on_receive(self) -> None:
+        self._start = time.perf_counter()
+
+    async def after_processed(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_val: BaseException | None = None,
+        exc_tb: TracebackType | None = None,
+    ) -> bool | None:
+        elapsed = time.perf_counter() - self._start
+        messages: list[Any] = self.msg if isinstance(self.msg, list) else [self.msg]
+        if messages:
+            subject = messages[0].subject
+            NATS_PROCESSING_SECONDS.observe(elapsed, subject)
+            NATS_BATCH_SIZE.observe(len(messages), subject)
+            # Metadata of a JetStream message is parsed from its ack subject, core messages have none
+            redelivered = sum(
+                message.metadata.num_delivered > 1
+                for message in messages
+                if message.reply and message.reply.startswith("$JS.ACK.")
+            )
+            if redelivered:
+                NATS_REDELIVERIES.inc(subject, amount=redelivered)
+        return await super().after_processed(exc_type, exc_val, exc_tb)
+
+
+@get(include_in_schema=False)
+async def metrics_asgi(scope: Scope) -> AsgiResponse:
+    return AsgiResponse(
+        registry.render().encode(),
+        status_code=200,
+        headers={"content-type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
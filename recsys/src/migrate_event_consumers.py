@@ -0,0 +1,128 @@
+"""
+Move the event subscribers from the former push queue consumers to their own consumers.
+
+Subscribers create their consumers with the ``new`` deliver policy, so a new consumer never replays the history kept in
+``recsys_events_stream``. Run this script once after stopping the workers of the previous version and before starting
+the new ones: every new consumer is created at the acknowledged sequence of the consumer it replaces, so the events
+published while no worker was running are not lost, and the former consumers are deleted. Events between the
+contiguously acknowledged sequence and the last delivered one may be processed twice, their handlers are idempotent
+or tolerate it. Consumers that already exist are left as they are, so the script can be run again.
+
+Usage: python -m src.migrate_event_consumers [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import nats
+from nats.js import JetStreamContext
+from nats.js.api import ConsumerConfig, DeliverPolicy
+from nats.js.errors import NotFoundError
+
+from src.core.config import settings
+from src.core.stream import recommendations_stream
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EventConsumer:
+    durable: str
+    subjects: tuple[str, ...]
+    # Deliver group of a push queue consumer, ``None`` for a pull consumer
+    queue: str | None = None
+    # Must match the subscriber, which binds to an existing consumer without updating it
+    max_ack_pending: int | None = None
+
+
+# Former consumer: consumers replacing it
+CONSUMER_MIGRATIONS: dict[str, list[EventConsumer]] = {
+    "recsys-events-recipes-queue": [
+        EventConsumer("recsys-events-add-recipe-batch", ("recsys_events.add_recipe",)),
+        EventConsumer("recsys-events-update-recipe-batch", ("recsys_events.update_recipe",)),
+        EventConsumer(
+            "recsys-events-delete-recipe-queue",
+            ("recsys_events.delete_recipe",),
+            queue="recsys-events-delete-recipe-queue",
+        ),
+    ],
+    "recsys-events-impressions-queue": [
+        EventConsumer("recsys-events-add-impression-batch", ("recsys_events.add_impression",)),
+        EventConsumer(
+            "recsys-events-add-impressions-bulk-queue",
+            ("recsys_events.add_impressions_bulk",),
+            queue="recsys-events-add-impressions-bulk-queue",
+        ),
+    ],
+    "recsys-events-feedback-queue": [
+        EventConsumer(
+            "recsys-events-feedback-batch",
+            ("recsys_events.add_feedback", "recsys_events.delete_feedback"),
+            max_ack_pending=settings.interaction_ingestion.batch_size,
+        ),
+    ],
+}
+
+
+async def _exists(js: JetStreamContext, durable: str) -> bool:
+    try:
+        await js.consumer_info(recommendations_stream.name, durable)
+    except NotFoundError:
+        return False
+    return True
+
+
+async def migrate(nc: nats.NATS, *, dry_run: bool) -> None:
+    js = nc.jetstream()
+    for former_durable, consumers in CONSUMER_MIGRATIONS.items():
+        try:
+            former = await js.consumer_info(recommendations_stream.name, former_durable)
+        except NotFoundError:
+            logger.info("Consumer %s does not exist, nothing to migrate", former_durable)
+            continue
+
+        start_sequence = former.ack_floor.stream_seq + 1 if former.ack_floor else 1
+        for consumer in consumers:
+            if await _exists(js, consumer.durable):
+                logger.info("Consumer %s already exists", consumer.durable)
+                continue
+            logger.info("Creating consumer %s at stream sequence %d", consumer.durable, start_sequence)
+            if dry_run:
+                continue
+            await js.add_consumer(
+                recommendations_stream.name,
+                config=ConsumerConfig(
+                    name=consumer.durable,
+                    durable_name=consumer.durable,
+                    filter_subject=consumer.subjects[0] if len(consumer.subjects) == 1 else None,
+                    filter_subjects=list(consumer.subjects) if len(consumer.subjects) > 1 else None,
+                    deliver_policy=DeliverPolicy.BY_START_SEQUENCE,
+                    opt_start_seq=start_sequence,
+                    deliver_subject=nc.new_inbox() if consumer.queue else None,
+                    deliver_group=consumer.queue,
+                    max_ack_pending=consumer.max_ack_pending,
+                ),
+            )
+
+        logger.info("Deleting consumer %s", former_durable)
+        if not dry_run:
+            await js.delete_consumer(recommendations_stream.name, former_durable)
+
+
+async def main(*, dry_run: bool) -> None:
+    nc = await nats.connect(f"{settings.nats.host}:{settings.nats.port}")
+    try:
+        await migrate(nc, dry_run=dry_run)
+    finally:
+        await nc.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only log what would be done")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(dry_run=args.dry_run))
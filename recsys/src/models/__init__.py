@@ -1,6 +1,19 @@
 from src.models.base import Base
+from src.models.embedding_cache import EmbeddingCache
+from src.models.embedding_collection_rebuild import EmbeddingCollectionRebuild
 from src.models.recipe import Recipe
 from src.models.user_feedback import UserFeedback
 from src.models.user_impression import UserImpression
+from src.models.user_preference_state import UserPreferenceState
+from src.models.user_recommendation_feed import UserRecommendationFeed
 
-__all__ = ["Base", "Recipe", "UserFeedback", "UserImpression"]
+__all__ = [
+    "Base",
+    "EmbeddingCache",
+    "EmbeddingCollectionRebuild",
+    "Recipe",
+    "UserFeedback",
+    "UserImpression",
+    "UserPreferenceState",
+    "UserRecommendationFeed",
+]
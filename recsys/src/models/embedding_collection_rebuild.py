@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base
+
+
+class EmbeddingCollectionRebuild(Base):
+    """Re-embedding of the catalog into a new Qdrant collection, ``last_recipe_id`` is the resume checkpoint."""
+
+    __tablename__ = "embedding_collection_rebuild"
+
+    collection_name: Mapped[str] = mapped_column(nullable=False, unique=True)
+    last_recipe_id: Mapped[int] = mapped_column(nullable=False, default=0)
+    is_completed: Mapped[bool] = mapped_column(nullable=False, default=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -1,3 +1,4 @@
+from sqlalchemy import DateTime, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models.base import Base
@@ -5,5 +6,12 @@ from src.models.base import Base
 
 class Recipe(Base):
     __tablename__ = "recipes"
+    # Own recipes of the user are excluded from the recommendations, they are read with an index-only scan
+    __table_args__ = (Index("ix_recipes_author_id", "author_id", postgresql_include=["id"]),)
 
     author_id: Mapped[int] = mapped_column(nullable=False)
+    title: Mapped[str | None] = mapped_column(nullable=True)
+    tags: Mapped[str | None] = mapped_column(nullable=True)
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
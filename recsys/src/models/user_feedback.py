@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import DateTime, Enum, ForeignKey, func
+from sqlalchemy import DateTime, Enum, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models.base import Base
@@ -13,6 +13,21 @@ class FeedbackType(enum.Enum):
 
 class UserFeedback(Base):
     __tablename__ = "user_feedback"
+    __table_args__ = (
+        # A user has at most one feedback of a type per recipe, redelivered events are no-ops
+        UniqueConstraint(
+            "user_id", "recipe_id", "feedback_type", name="uq_user_feedback_user_id_recipe_id_feedback_type"
+        ),
+        # Latest K feedbacks of a type are read with an index-only backward scan
+        Index(
+            "ix_user_feedback_user_id_feedback_type_created_at",
+            "user_id",
+            "feedback_type",
+            "created_at",
+            "id",
+            postgresql_include=["recipe_id"],
+        ),
+    )
 
     user_id: Mapped[int] = mapped_column(nullable=False)
     recipe_id: Mapped[int] = mapped_column(ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
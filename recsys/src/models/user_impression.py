@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import DateTime, Enum, ForeignKey, func
+from sqlalchemy import DateTime, Enum, ForeignKey, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models.base import Base
@@ -17,11 +17,39 @@ class ImpressionSource(enum.Enum):
 
 
 class UserImpression(Base):
+    """
+    Append-only impressions log, range-partitioned by month of ``created_at``.
+
+    Partitions are named ``user_impression_pYYYY_MM``, created ahead and dropped after the retention period by
+    ``ImpressionPartitionRepository``. The partition key is part of the primary key, as Postgres requires.
+    """
+
     __tablename__ = "user_impression"
+    # Latest K impressions, all and from the recommendations detail page, are read with index-only backward scans
+    __table_args__ = (
+        Index(
+            "ix_user_impression_user_id_created_at",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_include=["recipe_id", "source"],
+        ),
+        Index(
+            "ix_user_impression_recs_detail_user_id_created_at",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_include=["recipe_id"],
+            postgresql_where=text("source = 'recs_detail'"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     user_id: Mapped[int] = mapped_column(nullable=False)
     recipe_id: Mapped[int] = mapped_column(ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
     source: Mapped[ImpressionSource | None] = mapped_column(
         Enum(ImpressionSource, name="impression_source_enum"), nullable=True
     )
-    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False
+    )
@@ -0,0 +1,32 @@
+import enum
+
+from sqlalchemy import DateTime, LargeBinary, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base
+
+
+class PreferenceComponent(enum.Enum):
+    liked = "liked"
+    disliked = "disliked"
+    viewed = "viewed"
+    recs_detail = "recs_detail"
+
+
+class UserPreferenceState(Base):
+    """Running sums of normalized recipe embeddings and their counts for every preference component of the user."""
+
+    __tablename__ = "user_preference_state"
+
+    user_id: Mapped[int] = mapped_column(nullable=False, unique=True)
+    liked_sum: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    liked_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    disliked_sum: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    disliked_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    viewed_sum: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    viewed_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    recs_detail_sum: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    recs_detail_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
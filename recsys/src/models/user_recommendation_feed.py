@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, Index, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base
+
+
+class UserRecommendationFeed(Base):
+    """
+    Precomputed recommendations of the user, ordered as the algorithm returned them.
+
+    An invalidated feed has no ``computed_at`` and no recommendations. Every invalidation bumps ``version``, a feed
+    computed from an older version is not stored.
+    ``refresh_claimed_until`` is the lease of the worker replica refreshing the feed in the background.
+    """
+
+    __tablename__ = "user_recommendation_feed"
+    __table_args__ = (Index("ix_user_recommendation_feed_recipe_ids", "recipe_ids", postgresql_using="gin"),)
+
+    user_id: Mapped[int] = mapped_column(nullable=False, unique=True)
+    recipe_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    scores: Mapped[list[float]] = mapped_column(ARRAY(Float), nullable=False)
+    fetch_k: Mapped[int | None] = mapped_column(nullable=True)
+    lambda_mult: Mapped[float | None] = mapped_column(nullable=True)
+    computed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    version: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    refresh_claimed_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import logging
+
+from src.algorithms.preference_state import PreferenceStateManager
+from src.core.di import container
+from src.repositories.postgres import UserInteractionRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_user_state(user_id: int) -> None:
+    async with container() as request_container:
+        preference_state = await request_container.get(PreferenceStateManager)
+        await preference_state.rebuild_from_history([user_id])
+
+
+async def main(user_ids: list[int] | None) -> None:
+    if not user_ids:
+        async with container() as request_container:
+            interaction_repo = await request_container.get(UserInteractionRepository)
+            user_ids = list(await interaction_repo.get_user_ids())
+
+    for processed, user_id in enumerate(user_ids, start=1):
+        await rebuild_user_state(user_id)
+        if processed % 100 == 0:
+            logger.info("Rebuilt preference states for %d/%d users", processed, len(user_ids))
+    logger.info("Rebuilt preference states for %d users", len(user_ids))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild user preference states from the interaction history")
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="Rebuild only the given users")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.user_ids))
@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+import nats
+
+from src.core.config import settings
+from src.core.di import container
+from src.models.embedding_collection_rebuild import EmbeddingCollectionRebuild
+from src.repositories.embeddings import EmbeddingsRepository, recipe_embedding_text
+from src.repositories.postgres import (
+    EmbeddingCollectionRebuildRepository,
+    RecipeRepository,
+    UserPreferenceStateRepository,
+    UserRecommendationFeedRepository,
+)
+from src.repositories.qdrant import COLLECTION_PROFILES, QdrantRepository
+from src.schemas.tasks import RecipeCollectionSyncMessage
+from src.tasks.recipes import RECIPE_COLLECTION_SYNC_SUBJECT
+
+logger = logging.getLogger(__name__)
+
+# Recipe is a pair of recipe id and embedding text
+RecipeText = tuple[int, str]
+
+
+async def get_or_start_rebuild(
+    collection_name: str | None, vector_size: int, profile_name: str | None
+) -> EmbeddingCollectionRebuild:
+    async with container() as request_container:
+        rebuild_repo = await request_container.get(EmbeddingCollectionRebuildRepository)
+        qdrant_repo = await request_container.get(QdrantRepository)
+
+        rebuild = await rebuild_repo.get_active()
+        if rebuild is not None:
+            if collection_name is not None and collection_name != rebuild.collection_name:
+                msg = f"Rebuild of {rebuild.collection_name} is not completed, resume it first"
+                raise RuntimeError(msg)
+            logger.info("Resuming rebuild of %s after recipe %d", rebuild.collection_name, rebuild.last_recipe_id)
+            return rebuild
+
+        collection_name = collection_name or f"{qdrant_repo.recipe_collection_name}_{datetime.now(UTC):%Y%m%d%H%M%S}"
+        profile = COLLECTION_PROFILES[profile_name] if profile_name else None
+        await qdrant_repo.create_collection(collection_name, vector_size, profile)
+        rebuild = await rebuild_repo.start(collection_name)
+        logger.info("Started rebuild of %s", collection_name)
+        return rebuild
+
+
+async def get_recipes_page(after_id: int, limit: int, updated_after: datetime | None = None) -> list[RecipeText]:
+    async with container() as request_container:
+        recipe_repo = await request_container.get(RecipeRepository)
+        recipes = await recipe_repo.get_recipes_page(after_id, limit, updated_after)
+        return [(recipe.id, recipe_embedding_text(recipe.title or "", recipe.tags)) for recipe in recipes]
+
+
+async def embed_chunk(collection_name: str, recipes: list[RecipeText]) -> None:
+    async with container() as request_container:
+        embeddings_repo = await request_container.get(EmbeddingsRepository)
+        qdrant_repo = await request_container.get(QdrantRepository)
+        embeddings = await embeddings_repo.get_embeddings([text for _, text in recipes])
+        await qdrant_repo.add_recipes(
+            [recipe_id for recipe_id, _ in recipes], embeddings, collection_name=collection_name
+        )
+
+
+async def embed_pages(
+    rebuild: EmbeddingCollectionRebuild,
+    chunk_size: int,
+    concurrency: int,
+    *,
+    after_id: int,
+    updated_after: datetime | None = None,
+) -> int:
+    """Re-embed recipes page by page, ``concurrency`` chunks of a page are embedded in parallel."""
+    embedded = 0
+    while recipes := await get_recipes_page(after_id, chunk_size * concurrency, updated_after):
+        await asyncio.gather(
+            *(
+                embed_chunk(rebuild.collection_name, recipes[start : start + chunk_size])
+                for start in range(0, len(recipes), chunk_size)
+            )
+        )
+        after_id = recipes[-1][0]
+        embedded += len(recipes)
+
+        if updated_after is None:
+            async with container() as request_container:
+                rebuild_repo = await request_container.get(EmbeddingCollectionRebuildRepository)
+                await rebuild_repo.save_checkpoint(rebuild.collection_name, after_id)
+        logger.info("Embedded %d recipes into %s, last recipe %d", embedded, rebuild.collection_name, after_id)
+    return embedded
+
+
+async def copy_recipes_without_text(qdrant_repo: QdrantRepository, recipe_ids: list[int], collection_name: str) -> int:
+    """
+    Copy the vectors of recipes without a stored text from the collection readers use, return how many are missing.
+
+    These recipes can not be re-embedded, their vectors are only copied if the dimensions of both collections match.
+    """
+    source_collection = await qdrant_repo.get_current_collection()
+    if not recipe_ids or source_collection is None or source_collection == collection_name:
+        return len(recipe_ids)
+    if await qdrant_repo.get_vector_size(source_collection) != await qdrant_repo.get_vector_size(collection_name):
+        logger.warning(
+            "Vector sizes of %s and %s differ, recipes without text are not copied", source_collection, collection_name
+        )
+        return len(recipe_ids)
+
+    copied = await qdrant_repo.copy_recipes(recipe_ids, source_collection, collection_name)
+    logger.info("Copied %d recipes without text from %s to %s", len(copied), source_collection, collection_name)
+    return len(recipe_ids) - len(copied)
+
+
+async def broadcast_collection_switch(collection_name: str) -> None:
+    """Make every worker replica reload its local vectors and drop its caches and cold start pool."""
+    nc = await nats.connect(f"{settings.nats.host}:{settings.nats.port}")
+    try:
+        message = RecipeCollectionSyncMessage(collection_name=collection_name)
+        await nc.publish(RECIPE_COLLECTION_SYNC_SUBJECT, message.model_dump_json().encode())
+        await nc.flush()
+    finally:
+        await nc.close()
+
+
+async def reset_user_states(batch_size: int = 1000) -> None:
+    """
+    Delete the preference states and invalidate the feeds, both are built from the vectors of the previous collection.
+
+    Users are processed in id order under their preference state locks, states are rebuilt from the interactions on
+    the next request and feeds on the next refresh.
+    """
+    async with container() as request_container:
+        state_repo = await request_container.get(UserPreferenceStateRepository)
+        feed_repo = await request_container.get(UserRecommendationFeedRepository)
+
+        after_id, deleted = 0, 0
+        while user_ids := await state_repo.get_user_ids_page(after_id, batch_size):
+            await state_repo.lock_users(user_ids)
+            await state_repo.delete_states(user_ids)
+            after_id, deleted = user_ids[-1], deleted + len(user_ids)
+        logger.info("Deleted %d preference states", deleted)
+
+        after_id, invalidated = 0, 0
+        while user_ids := await feed_repo.get_user_ids_page(after_id, batch_size):
+            await feed_repo.invalidate_feeds(user_ids)
+            after_id, invalidated = user_ids[-1], invalidated + len(user_ids)
+        logger.info("Invalidated %d feeds", invalidated)
+
+
+async def switch_to_collection(collection_name: str, *, force: bool, drop_legacy_collection: bool) -> None:
+    async with container() as request_container:
+        recipe_repo = await request_container.get(RecipeRepository)
+        rebuild_repo = await request_container.get(EmbeddingCollectionRebuildRepository)
+        qdrant_repo = await request_container.get(QdrantRepository)
+
+        recipe_ids = await recipe_repo.get_recipe_ids_without_text()
+        missing = await copy_recipes_without_text(qdrant_repo, recipe_ids, collection_name)
+        if missing and not force:
+            msg = (
+                f"{missing} recipes have no stored text and are missing from {collection_name}, "
+                "republish them or pass --force"
+            )
+            raise RuntimeError(msg)
+
+        previous_collection = await qdrant_repo.get_alias_collection()
+        if previous_collection is None and await qdrant_repo.get_current_collection() is not None:
+            if not drop_legacy_collection:
+                msg = (
+                    f"Legacy collection {qdrant_repo.recipe_collection_name} has to be dropped to create the alias, "
+                    "pass --drop-legacy-collection"
+                )
+                raise RuntimeError(msg)
+            await qdrant_repo.delete_legacy_collection()
+
+        await qdrant_repo.switch_alias(collection_name)
+        await rebuild_repo.complete(collection_name)
+        await broadcast_collection_switch(collection_name)
+        await reset_user_states()
+        logger.info(
+            "Alias %s now points to %s, previous collection %s can be deleted",
+            qdrant_repo.recipe_collection_name,
+            collection_name,
+            previous_collection,
+        )
+
+
+async def main(
+    collection_name: str | None,
+    vector_size: int,
+    profile_name: str | None,
+    chunk_size: int,
+    concurrency: int,
+    *,
+    force: bool,
+    drop_legacy_collection: bool,
+) -> None:
+    rebuild = await get_or_start_rebuild(collection_name, vector_size, profile_name)
+    await embed_pages(rebuild, chunk_size, concurrency, after_id=rebuild.last_recipe_id)
+    # Recipes updated after the start were dual-written by the workers, re-embed them with this model anyway
+    caught_up = await embed_pages(rebuild, chunk_size, concurrency, after_id=0, updated_after=rebuild.started_at)
+    logger.info("Re-embedded %d recipes updated during the rebuild", caught_up)
+    await switch_to_collection(rebuild.collection_name, force=force, drop_legacy_collection=drop_legacy_collection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-embed all recipes into a new collection and switch the recipes alias to it"
+    )
+    parser.add_argument("--collection", help="Name of the new collection, recipes_<timestamp> by default")
+    parser.add_argument("--vector-size", type=int, default=1024, help="Embedding dimension of the new collection")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(COLLECTION_PROFILES),
+        help="Storage profile of the new collection, RECSYS__QDRANT__COLLECTION_PROFILE by default",
+    )
+    parser.add_argument("--chunk-size", type=int, default=64, help="Recipes embedded with one request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--force", action="store_true", help="Switch the alias even if some recipes have no text")
+    parser.add_argument(
+        "--drop-legacy-collection",
+        action="store_true",
+        help="Drop a recipes collection created before versioned collections to replace it with the alias",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(
+        main(
+            args.collection,
+            args.vector_size,
+            args.profile,
+            args.chunk_size,
+            args.concurrency,
+            force=args.force,
+            drop_legacy_collection=args.drop_legacy_collection,
+        )
+    )
@@ -1,9 +1,147 @@
-from langchain_gigachat.embeddings import GigaChatEmbeddings
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.core.metrics import EMBEDDING_REQUEST_SECONDS
+from src.repositories.postgres import EmbeddingCacheRepository
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DTYPE = np.float32
+
+
+def recipe_embedding_text(title: str, tags: str | None) -> str:
+    return f"{title}, {tags or ''}"
+
+
+def normalize_embedding_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def _crossed_multiple(counter: int, increment: int, interval: int) -> bool:
+    """Whether adding ``increment`` to a counter has moved it past a multiple of ``interval``."""
+    return counter // interval > (counter - increment) // interval
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """Process-wide counters of the embedding cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
 
 
 class EmbeddingsRepository:
-    def __init__(self, embeddings: GigaChatEmbeddings) -> None:
+    def __init__(self, embeddings: Embeddings) -> None:
         self._embeddings = embeddings
 
+    @property
+    def model(self) -> str:
+        return getattr(self._embeddings, "model", None) or "default"
+
     async def get_embedding(self, text: str) -> list[float]:
-        return await self._embeddings.aembed_query(text)
+        start = time.perf_counter()
+        embedding = await self._embeddings.aembed_query(text)
+        EMBEDDING_REQUEST_SECONDS.observe(time.perf_counter() - start, "query")
+        return embedding
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Embed all texts with a single call to the backend."""
+        if not texts:
+            return []
+        start = time.perf_counter()
+        embeddings = await self._embeddings.aembed_documents(texts)
+        EMBEDDING_REQUEST_SECONDS.observe(time.perf_counter() - start, "documents")
+        return embeddings
+
+
+class CachedEmbeddingsRepository(EmbeddingsRepository):
+    """
+    EmbeddingsRepository that skips the remote call for texts that were already embedded by the same model.
+
+    Entries are keyed by the SHA-256 of the model name and the normalized text and evicted in the least recently used
+    order when there are more than ``max_entries`` of them, the eviction runs once per ``eviction_interval`` misses.
+    The time of the last use is only refreshed once per ``touch_interval``, which is precise enough for the eviction.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_repo: EmbeddingCacheRepository,
+        stats: EmbeddingCacheStats,
+        max_entries: int,
+        eviction_interval: int,
+        stats_log_interval: int,
+        touch_interval: timedelta,
+    ) -> None:
+        super().__init__(embeddings)
+        self._cache_repo = cache_repo
+        self._stats = stats
+        self._max_entries = max_entries
+        self._eviction_interval = eviction_interval
+        self._stats_log_interval = stats_log_interval
+        self._touch_interval = touch_interval
+
+    def _get_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode()).hexdigest()
+
+    def _log_stats(self, lookups: int) -> None:
+        if _crossed_multiple(self._stats.lookups, lookups, self._stats_log_interval):
+            logger.info(
+                "Embedding cache: %d lookups, hit rate %.2f, %d evictions",
+                self._stats.lookups,
+                self._stats.hit_rate,
+                self._stats.evictions,
+            )
+
+    async def get_embedding(self, text: str) -> list[float]:
+        return (await self.get_embeddings([text]))[0]
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        texts = [normalize_embedding_text(text) for text in texts]
+        keys = [self._get_key(text) for text in texts]
+
+        cached_embeddings = await self._cache_repo.get_embeddings(keys, self._touch_interval)
+        embeddings_by_key = {
+            key: np.frombuffer(embedding, dtype=EMBEDDING_CACHE_DTYPE).tolist()
+            for key, embedding in cached_embeddings.items()
+        }
+        missing_texts_by_key = {
+            key: text for key, text in zip(keys, texts, strict=True) if key not in embeddings_by_key
+        }
+        self._stats.hits += len(keys) - len(missing_texts_by_key)
+        self._stats.misses += len(missing_texts_by_key)
+
+        if missing_texts_by_key:
+            missing_embeddings = await super().get_embeddings(list(missing_texts_by_key.values()))
+            new_embeddings_by_key = dict(zip(missing_texts_by_key, missing_embeddings, strict=True))
+            await self._cache_repo.add_embeddings(
+                self.model,
+                {
+                    key: np.asarray(embedding, dtype=EMBEDDING_CACHE_DTYPE).tobytes()
+                    for key, embedding in new_embeddings_by_key.items()
+                },
+            )
+            embeddings_by_key |= new_embeddings_by_key
+
+            if _crossed_multiple(self._stats.misses, len(missing_texts_by_key), self._eviction_interval):
+                self._stats.evictions += await self._cache_repo.evict(self._max_entries)
+
+        self._log_stats(len(keys))
+        return [embeddings_by_key[key] for key in keys]
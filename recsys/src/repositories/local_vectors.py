@@ -0,0 +1,255 @@
+import logging
+import tempfile
+from pathlib import Path
+from typing import IO, Any
+
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.repositories.qdrant import CollectionProfile, QdrantRepository
+from src.utils.vectors import EmbeddingMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorIndex:
+    """
+    Process-wide copy of the recipes collection as a contiguous memory-mapped float32 matrix.
+
+    Rows are L2-normalized, so exact cosine top-k is a single matrix-vector product. Qdrant stays the source of truth:
+    the index is bootstrapped from a full scroll and then kept in sync from the recipe events.
+    """
+
+    def __init__(self, path: Path, initial_capacity: int = 1024) -> None:
+        self._path = path
+        self._initial_capacity = initial_capacity
+        self._file: IO[bytes] | None = None
+        self._matrix: np.memmap | None = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows: dict[int, int] = {}
+        self._size = 0
+        self._touched_during_bootstrap: set[int] | None = None
+        self.is_ready = False
+
+    def _allocate(self, dim: int) -> None:
+        self._path.mkdir(parents=True, exist_ok=True)
+        # Files of older versions were named by pid and never removed
+        for stale_file in self._path.glob("recipe_vectors.*.f32"):
+            stale_file.unlink(missing_ok=True)
+        # The file is unlinked right away, its space is freed when it is closed or the process exits
+        self._file = tempfile.TemporaryFile(dir=self._path, prefix="recipe_vectors-", suffix=".f32")  # noqa: SIM115
+        self._matrix = np.memmap(self._file, dtype=np.float32, mode="w+", shape=(self._initial_capacity, dim))
+        self._ids = np.empty(self._initial_capacity, dtype=np.int64)
+
+    def _grow(self) -> None:
+        assert self._matrix is not None
+        assert self._file is not None
+        capacity, dim = self._matrix.shape
+        self._matrix.flush()
+        del self._matrix
+
+        # memmap extends the file to the new shape
+        new_capacity = capacity * 2
+        self._matrix = np.memmap(self._file, dtype=np.float32, mode="r+", shape=(new_capacity, dim))
+        self._ids = np.resize(self._ids, new_capacity)
+
+    def _reset(self) -> None:
+        self._matrix = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows = {}
+        self._size = 0
+
+    def _upsert_row(self, recipe_id: int, vector: np.ndarray) -> None:
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        if self._matrix is None:
+            self._allocate(len(vector))
+        assert self._matrix is not None
+
+        row = self._rows.get(recipe_id)
+        if row is None:
+            if self._size == len(self._matrix):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._ids[row] = recipe_id
+            self._rows[recipe_id] = row
+        self._matrix[row] = vector
+
+    def upsert(self, recipe_id: int, vector: np.ndarray) -> None:
+        if self._touched_during_bootstrap is not None:
+            self._touched_during_bootstrap.add(recipe_id)
+        self._upsert_row(recipe_id, vector)
+
+    def delete(self, recipe_id: int) -> None:
+        if self._touched_during_bootstrap is not None:
+            self._touched_during_bootstrap.add(recipe_id)
+
+        row = self._rows.pop(recipe_id, None)
+        if row is None or self._matrix is None:
+            return
+
+        last_row = self._size - 1
+        if row != last_row:
+            moved_id = int(self._ids[last_row])
+            self._matrix[row] = self._matrix[last_row]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._size -= 1
+
+    async def bootstrap(self, qdrant_repo: QdrantRepository, batch_size: int = 1000) -> None:
+        """Load the whole collection from Qdrant. Events applied meanwhile win over the scrolled vectors."""
+        self.is_ready = False
+        self._reset()
+        self._touched_during_bootstrap = set()
+        try:
+            async for points in qdrant_repo.iter_recipe_vectors(batch_size):
+                for recipe_id, vector in points:
+                    if recipe_id not in self._touched_during_bootstrap:
+                        self._upsert_row(recipe_id, np.asarray(vector, dtype=np.float32))
+        finally:
+            self._touched_during_bootstrap = None
+
+        self.is_ready = True
+        logger.info("Local vector index is loaded with %d recipes", self._size)
+
+    def search(
+        self, query_vector: np.ndarray, limit: int, exclude_ids: list[int] | None = None
+    ) -> list[tuple[int, float]]:
+        if self._matrix is None or self._size == 0:
+            return []
+
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm > 0:
+            query_vector = query_vector / norm
+
+        scores = self._matrix[: self._size] @ query_vector
+        if exclude_ids:
+            excluded_rows = [self._rows[recipe_id] for recipe_id in exclude_ids if recipe_id in self._rows]
+            scores[excluded_rows] = -np.inf
+
+        k = min(limit, self._size)
+        top_rows = np.argpartition(-scores, k - 1)[:k]
+        top_rows = top_rows[np.argsort(-scores[top_rows], kind="stable")]
+        return [(int(self._ids[row]), float(scores[row])) for row in top_rows if scores[row] > -np.inf]
+
+    def get_vectors(self, recipe_ids: list[int]) -> dict[int, np.ndarray]:
+        if self._matrix is None:
+            return {}
+        return {
+            recipe_id: np.array(self._matrix[self._rows[recipe_id]])
+            for recipe_id in recipe_ids
+            if recipe_id in self._rows
+        }
+
+    def get_matrix(self, recipe_ids: list[int]) -> EmbeddingMatrix:
+        if self._matrix is None:
+            return EmbeddingMatrix.empty()
+
+        rows = [self._rows[recipe_id] for recipe_id in recipe_ids if recipe_id in self._rows]
+        return EmbeddingMatrix(ids=self._ids[rows], vectors=np.asarray(self._matrix[rows]))
+
+    def recipe_ids(self) -> list[int]:
+        return self._ids[: self._size].tolist()
+
+
+class LocalVectorRepository(QdrantRepository):
+    """QdrantRepository that writes through to Qdrant and serves reads from the in-process ``LocalVectorIndex``."""
+
+    def __init__(
+        self, client: AsyncQdrantClient, index: LocalVectorIndex, profile: CollectionProfile | None = None
+    ) -> None:
+        super().__init__(client, profile)
+        self._index = index
+
+    async def add_recipes(
+        self,
+        recipe_ids: list[int],
+        embeddings: list[list[float]],
+        payloads: list[dict[str, Any] | None] | None = None,
+        collection_name: str | None = None,
+    ) -> None:
+        await super().add_recipes(recipe_ids, embeddings, payloads, collection_name)
+        # Writes to a collection that is being rebuilt are not served until the alias swap is broadcast, see reload
+        if collection_name is not None:
+            return
+        for recipe_id, embedding in zip(recipe_ids, embeddings, strict=True):
+            self._index.upsert(recipe_id, np.asarray(embedding, dtype=np.float32))
+
+    async def delete_recipe(self, recipe_id: int, collection_name: str | None = None) -> None:
+        await super().delete_recipe(recipe_id, collection_name)
+        if collection_name is None:
+            self._index.delete(recipe_id)
+
+    async def reload(self, batch_size: int) -> None:
+        """Load the collection the alias points to, reads fall back to Qdrant meanwhile."""
+        await self._index.bootstrap(self, batch_size)
+
+    async def sync_recipes(self, recipe_ids: list[int], *, deleted: bool) -> None:
+        """Apply changes made by another worker replica."""
+        if deleted:
+            for recipe_id in recipe_ids:
+                self._index.delete(recipe_id)
+            return
+
+        embeddings = await super().get_recipe_embedding_matrix(recipe_ids)
+        positions = embeddings.positions(recipe_ids)
+        for recipe_id, position in zip(recipe_ids, positions.tolist(), strict=True):
+            if position >= 0:
+                self._index.upsert(recipe_id, embeddings.vectors[position])
+            else:
+                self._index.delete(recipe_id)
+
+    async def get_recommendations(
+        self,
+        query_vector: list[float],
+        limit: int = 10,
+        exclude_ids: list[int] | None = None,
+        offset: int = 0,
+    ) -> Any:
+        if not self._index.is_ready:
+            return await super().get_recommendations(query_vector, limit, exclude_ids, offset)
+
+        points = self._index.search(np.asarray(query_vector, dtype=np.float32), offset + limit, exclude_ids)[offset:]
+        return models.QueryResponse(
+            points=[models.ScoredPoint(id=recipe_id, version=0, score=score) for recipe_id, score in points]
+        )
+
+    async def get_recommendations_batch(
+        self,
+        query_vectors: list[list[float]],
+        limit: int = 10,
+        exclude_ids: list[list[int]] | None = None,
+        offsets: list[int] | None = None,
+    ) -> list[Any]:
+        if not self._index.is_ready:
+            return await super().get_recommendations_batch(query_vectors, limit, exclude_ids, offsets)
+
+        exclude_ids = exclude_ids or [[] for _ in query_vectors]
+        offsets = offsets or [0] * len(query_vectors)
+        return [
+            await self.get_recommendations(query_vector, limit, query_exclude_ids, offset)
+            for query_vector, query_exclude_ids, offset in zip(query_vectors, exclude_ids, offsets, strict=True)
+        ]
+
+    async def get_all_recipe_ids(self) -> list[int]:
+        if not self._index.is_ready:
+            return await super().get_all_recipe_ids()
+        return self._index.recipe_ids()
+
+    async def get_recipe_embeddings(self, recipe_ids: list[int]) -> dict[int, list[float]]:
+        if not self._index.is_ready:
+            return await super().get_recipe_embeddings(recipe_ids)
+        return {recipe_id: vector.tolist() for recipe_id, vector in self._index.get_vectors(recipe_ids).items()}
+
+    async def get_recipe_embedding_matrix(self, recipe_ids: list[int]) -> EmbeddingMatrix:
+        if not self._index.is_ready:
+            return await super().get_recipe_embedding_matrix(recipe_ids)
+        return self._index.get_matrix(recipe_ids)
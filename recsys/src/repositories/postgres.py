@@ -1,34 +1,144 @@
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
+from datetime import UTC, date, datetime, timedelta
 from typing import Any
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import (
+    Integer,
+    column,
+    delete,
+    distinct,
+    func,
+    literal,
+    or_,
+    select,
+    table,
+    text,
+    true,
+    union,
+    union_all,
+    update,
+    values,
+)
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.dml import ReturningInsert
+from sqlalchemy.sql.expression import ColumnElement, CompoundSelect
 
+from src.models.embedding_cache import EmbeddingCache
+from src.models.embedding_collection_rebuild import EmbeddingCollectionRebuild
 from src.models.recipe import Recipe
 from src.models.user_feedback import FeedbackType, UserFeedback
 from src.models.user_impression import ImpressionSource, UserImpression
+from src.models.user_preference_state import PreferenceComponent, UserPreferenceState
+from src.models.user_recommendation_feed import UserRecommendationFeed
+from src.schemas.recommendations import UserPreferences
+
+
+def _insert_for_existing_recipes(
+    model: type[UserFeedback] | type[UserImpression], rows: Sequence[dict[str, Any]]
+) -> ReturningInsert[Any]:
+    """
+    Build a multi-row ``INSERT ... SELECT FROM (VALUES ...)`` that skips rows of missing recipes.
+
+    A single event about a deleted recipe would otherwise fail the foreign key of the whole batch, and the batch would
+    be redelivered forever. Rows are inserted in the given order, so ids follow the order of the events.
+    """
+    names = list(rows[0])
+    new_rows = values(
+        *(column(name, model.__table__.c[name].type) for name in names),
+        column("position", Integer),
+        name="new_rows",
+    ).data([(*(row[name] for name in names), position) for position, row in enumerate(rows)])
+    existing_rows = (
+        select(*(new_rows.c[name] for name in names))
+        .join(Recipe, Recipe.id == new_rows.c.recipe_id)
+        .order_by(new_rows.c.position)
+    )
+    return insert(model).from_select(names, existing_rows).on_conflict_do_nothing().returning(model)
+
+
+IMPRESSION_PARTITION_PREFIX = f"{UserImpression.__tablename__}_p"
+IMPRESSION_DEFAULT_PARTITION = f"{UserImpression.__tablename__}_default"
+# Serializes the partition maintenance of the worker replicas
+IMPRESSION_PARTITIONS_LOCK_ID = 4_518_203
+# First key of the two-key advisory locks of the user preference states, the second one is the user id
+PREFERENCE_STATE_LOCK_NAMESPACE = 4_518_204
+
+
+_IMPRESSION_COLUMNS = [impression_column.name for impression_column in UserImpression.__table__.columns]
+_default_impression_partition = table(
+    IMPRESSION_DEFAULT_PARTITION,
+    *(column(impression_column.name, impression_column.type) for impression_column in UserImpression.__table__.columns),
+)
+_moved_impressions = table(
+    "impressions_to_move",
+    *(column(impression_column.name, impression_column.type) for impression_column in UserImpression.__table__.columns),
+)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_start(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=UTC)
+
+
+def _is_recs_detail() -> ColumnElement[bool]:
+    # Inlined, so that generic plans can use the partial index
+    return UserImpression.source == literal(
+        ImpressionSource.recs_detail, UserImpression.source.type, literal_execute=True
+    )
 
 
 class UserFeedbackRepository:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
-    async def add_feedback(self, user_id: int, recipe_id: int, feedback_type: FeedbackType) -> UserFeedback:
-        feedback = UserFeedback(user_id=user_id, recipe_id=recipe_id, feedback_type=feedback_type)
-        self.session.add(feedback)
-        await self.session.commit()
-        await self.session.refresh(feedback)
+    async def add_feedback(
+        self, user_id: int, recipe_id: int, feedback_type: FeedbackType, *, commit: bool = True
+    ) -> UserFeedback | None:
+        """Insert the feedback, return ``None`` if the user already left it."""
+        stmt = (
+            insert(UserFeedback)
+            .values(user_id=user_id, recipe_id=recipe_id, feedback_type=feedback_type)
+            .on_conflict_do_nothing(constraint="uq_user_feedback_user_id_recipe_id_feedback_type")
+            .returning(UserFeedback)
+        )
+        feedback = (await self.session.scalars(stmt)).one_or_none()
+        if commit:
+            await self.session.commit()
         return feedback
 
-    async def delete_feedback(self, user_id: int, recipe_id: int, feedback_type: FeedbackType) -> None:
+    async def add_feedbacks_bulk(
+        self, feedbacks: Sequence[dict[str, Any]], *, commit: bool = True
+    ) -> Sequence[UserFeedback]:
+        """
+        Insert feedbacks with one statement and return the inserted ones.
+
+        Feedbacks the users already left (redeliveries, repeated events in the batch) and feedbacks on missing recipes
+        are skipped.
+        """
+        if not feedbacks:
+            return []
+        result = await self.session.scalars(_insert_for_existing_recipes(UserFeedback, feedbacks))
+        if commit:
+            await self.session.commit()
+        return sorted(result.all(), key=lambda feedback: feedback.id)
+
+    async def delete_feedback(
+        self, user_id: int, recipe_id: int, feedback_type: FeedbackType, *, commit: bool = True
+    ) -> int:
         stmt = delete(UserFeedback).where(
             UserFeedback.user_id == user_id,
             UserFeedback.recipe_id == recipe_id,
             UserFeedback.feedback_type == feedback_type,
         )
-        await self.session.execute(stmt)
-        await self.session.commit()
+        result = await self.session.execute(stmt)
+        if commit:
+            await self.session.commit()
+        return result.rowcount
 
     async def get_feedback(self, user_id: int, recipe_id: int) -> UserFeedback | None:
         stmt = select(UserFeedback).where(UserFeedback.user_id == user_id, UserFeedback.recipe_id == recipe_id)
@@ -59,18 +169,27 @@ class UserImpressionRepository:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
-    async def add_impression(self, user_id: int, recipe_id: int, source: ImpressionSource) -> UserImpression:
-        impression = UserImpression(user_id=user_id, recipe_id=recipe_id, source=source)
-        self.session.add(impression)
-        await self.session.commit()
-        await self.session.refresh(impression)
+    async def add_impression(
+        self, user_id: int, recipe_id: int, source: ImpressionSource, *, commit: bool = True
+    ) -> UserImpression:
+        stmt = (
+            insert(UserImpression).values(user_id=user_id, recipe_id=recipe_id, source=source).returning(UserImpression)
+        )
+        impression = (await self.session.scalars(stmt)).one()
+        if commit:
+            await self.session.commit()
         return impression
 
-    async def add_impressions_bulk(self, impressions: list[dict[str, Any]]) -> Sequence[UserImpression]:
-        stmt = insert(UserImpression).values(impressions).returning(UserImpression)
-        result = await self.session.scalars(stmt)
-        await self.session.commit()
-        return result.all()
+    async def add_impressions_bulk(
+        self, impressions: list[dict[str, Any]], *, commit: bool = True
+    ) -> Sequence[UserImpression]:
+        """Insert impressions with one statement, impressions of missing recipes are skipped."""
+        if not impressions:
+            return []
+        result = await self.session.scalars(_insert_for_existing_recipes(UserImpression, impressions))
+        if commit:
+            await self.session.commit()
+        return sorted(result.all(), key=lambda impression: impression.id)
 
     async def list_impressions(self, user_id: int) -> Sequence[UserImpression]:
         stmt = select(UserImpression).where(UserImpression.user_id == user_id)
@@ -100,6 +219,21 @@ class RecipeRepository:
         await self.session.commit()
         return result.first()
 
+    async def add_recipes(self, recipes: Sequence[dict[str, Any]]) -> None:
+        """Upsert recipes (``id``, ``author_id``, ``title``, ``tags``) with a single statement."""
+        stmt = insert(Recipe).values(list(recipes))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Recipe.id],
+            set_={
+                "author_id": stmt.excluded.author_id,
+                "title": stmt.excluded.title,
+                "tags": stmt.excluded.tags,
+                "updated_at": func.now(),
+            },
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
     async def publish_recipe(self, recipe_id: int) -> Recipe | None:
         stmt = update(Recipe).where(Recipe.id == recipe_id).values(is_published=True).returning(Recipe)
         result = await self.session.scalars(stmt)
@@ -115,3 +249,582 @@ class RecipeRepository:
         stmt = select(Recipe.id).where(Recipe.author_id == author_id)
         result = await self.session.scalars(stmt)
         return result.all()
+
+    async def get_recipes_page(
+        self, after_id: int, limit: int, updated_after: datetime | None = None
+    ) -> Sequence[Recipe]:
+        """Return the next page of recipes with a text in id order, keyset-paginated by ``after_id``."""
+        stmt = select(Recipe).where(Recipe.id > after_id, Recipe.title.is_not(None)).order_by(Recipe.id).limit(limit)
+        if updated_after is not None:
+            stmt = stmt.where(Recipe.updated_at >= updated_after)
+        result = await self.session.scalars(stmt)
+        return result.all()
+
+    async def get_recipe_ids_without_text(self) -> list[int]:
+        stmt = select(Recipe.id).where(Recipe.title.is_(None)).order_by(Recipe.id)
+        result = await self.session.scalars(stmt)
+        return list(result.all())
+
+    async def get_popular_recipes(
+        self, since: datetime, limit: int, like_weight: float, dislike_weight: float
+    ) -> list[tuple[int, float]]:
+        """
+        Return ``limit`` recipes with the highest popularity score since ``since``, newest first among equal scores.
+
+        The score is the number of distinct users that saw the recipe plus weighted likes and dislikes, recipes
+        without interactions score zero, so a young catalog is filled with the newest recipes.
+        """
+        impressions = (
+            select(UserImpression.recipe_id, func.count(distinct(UserImpression.user_id)).label("viewers"))
+            .where(UserImpression.created_at >= since)
+            .group_by(UserImpression.recipe_id)
+            .subquery()
+        )
+        feedback = (
+            select(
+                UserFeedback.recipe_id,
+                func.count().filter(UserFeedback.feedback_type == FeedbackType.like).label("likes"),
+                func.count().filter(UserFeedback.feedback_type == FeedbackType.dislike).label("dislikes"),
+            )
+            .where(UserFeedback.created_at >= since)
+            .group_by(UserFeedback.recipe_id)
+            .subquery()
+        )
+        score = (
+            func.coalesce(impressions.c.viewers, 0)
+            + like_weight * func.coalesce(feedback.c.likes, 0)
+            + dislike_weight * func.coalesce(feedback.c.dislikes, 0)
+        ).label("score")
+        stmt = (
+            select(Recipe.id, score)
+            .outerjoin(impressions, impressions.c.recipe_id == Recipe.id)
+            .outerjoin(feedback, feedback.c.recipe_id == Recipe.id)
+            .order_by(score.desc(), Recipe.id.desc())
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return [(recipe_id, float(recipe_score)) for recipe_id, recipe_score in result.tuples()]
+
+
+class UserInteractionRepository:
+    """Loads every interaction of the user in one round trip and memoizes it for the repository lifetime."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self._preferences: dict[int, UserPreferences] = {}
+
+    async def get_user_preferences(self, user_id: int) -> UserPreferences:
+        return (await self.get_users_preferences([user_id]))[user_id]
+
+    async def get_users_preferences(self, user_ids: Sequence[int]) -> dict[int, UserPreferences]:
+        missing_user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self._preferences]
+        if missing_user_ids:
+            self._preferences.update(await self._load_users_preferences(missing_user_ids))
+        return {user_id: self._preferences[user_id] for user_id in user_ids}
+
+    async def get_user_ids(self) -> Sequence[int]:
+        stmt = union(select(UserFeedback.user_id), select(UserImpression.user_id))
+        result = await self.session.scalars(stmt)
+        return result.all()
+
+    async def get_recent_recipe_ids(
+        self, user_ids: Sequence[int], limit: int | None, offset: int = 0
+    ) -> dict[int, dict[PreferenceComponent, list[int]]]:
+        """
+        Return recipe ids of every preference component of the users, newest first.
+
+        Every component of every user is read by a ``LATERAL`` subquery that stops after ``offset + limit`` entries of
+        the ``(user_id, ..., created_at, id)`` index, so the cost does not grow with the length of the history.
+        """
+        recipe_ids: dict[int, dict[PreferenceComponent, list[int]]] = {
+            user_id: {component: [] for component in PreferenceComponent} for user_id in user_ids
+        }
+        if not user_ids:
+            return recipe_ids
+
+        result = await self.session.execute(self.build_recent_recipe_ids_query(user_ids, limit, offset))
+        for component, user_id, recipe_id, _, _ in sorted(
+            result.tuples(), key=lambda row: (row[3], row[4]), reverse=True
+        ):
+            recipe_ids[user_id][PreferenceComponent(component)].append(recipe_id)
+        return recipe_ids
+
+    @staticmethod
+    def build_recent_recipe_ids_query(user_ids: Sequence[int], limit: int | None, offset: int = 0) -> CompoundSelect:
+        users = values(column("user_id", Integer), name="users").data([(user_id,) for user_id in user_ids])
+        components: dict[PreferenceComponent, tuple[type[UserFeedback | UserImpression], list[ColumnElement[bool]]]] = {
+            PreferenceComponent.liked: (UserFeedback, [UserFeedback.feedback_type == FeedbackType.like]),
+            PreferenceComponent.disliked: (UserFeedback, [UserFeedback.feedback_type == FeedbackType.dislike]),
+            PreferenceComponent.viewed: (UserImpression, []),
+            PreferenceComponent.recs_detail: (UserImpression, [_is_recs_detail()]),
+        }
+        selects = []
+        for component, (model, conditions) in components.items():
+            recent = (
+                select(model.recipe_id, model.created_at, model.id)
+                .where(model.user_id == users.c.user_id, *conditions)
+                .order_by(model.created_at.desc(), model.id.desc())
+                .offset(offset)
+                .limit(limit)
+                .lateral()
+            )
+            selects.append(
+                select(
+                    literal(component.value).label("component"),
+                    users.c.user_id,
+                    recent.c.recipe_id,
+                    recent.c.created_at,
+                    recent.c.id,
+                ).select_from(users.join(recent, true()))
+            )
+        return union_all(*selects)
+
+    @staticmethod
+    def build_preferences_query(user_ids: Sequence[int]) -> CompoundSelect:
+        return union_all(
+            select(literal("favorite").label("kind"), UserFeedback.user_id, UserFeedback.recipe_id).where(
+                UserFeedback.user_id.in_(user_ids), UserFeedback.feedback_type == FeedbackType.like
+            ),
+            select(literal("disliked").label("kind"), UserFeedback.user_id, UserFeedback.recipe_id).where(
+                UserFeedback.user_id.in_(user_ids), UserFeedback.feedback_type == FeedbackType.dislike
+            ),
+            select(literal("viewed").label("kind"), UserImpression.user_id, UserImpression.recipe_id).where(
+                UserImpression.user_id.in_(user_ids)
+            ),
+            select(literal("recs_detail").label("kind"), UserImpression.user_id, UserImpression.recipe_id).where(
+                UserImpression.user_id.in_(user_ids), _is_recs_detail()
+            ),
+            select(literal("author").label("kind"), Recipe.author_id, Recipe.id).where(Recipe.author_id.in_(user_ids)),
+        )
+
+    async def _load_users_preferences(self, user_ids: list[int]) -> dict[int, UserPreferences]:
+        result = await self.session.execute(self.build_preferences_query(user_ids))
+
+        recipe_ids: dict[int, dict[str, list[int]]] = {
+            user_id: {"favorite": [], "disliked": [], "viewed": [], "recs_detail": [], "author": []}
+            for user_id in user_ids
+        }
+        for kind, user_id, recipe_id in result.tuples():
+            recipe_ids[user_id][kind].append(recipe_id)
+
+        return {
+            user_id: UserPreferences(
+                favorite_recipes_ids=user_recipe_ids["favorite"],
+                disliked_recipes_ids=user_recipe_ids["disliked"],
+                viewed_recipes_ids=user_recipe_ids["viewed"],
+                recs_detail_recipes_ids=user_recipe_ids["recs_detail"],
+                author_recipes_ids=user_recipe_ids["author"],
+            )
+            for user_id, user_recipe_ids in recipe_ids.items()
+        }
+
+
+class UserPreferenceStateRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_states(self, user_ids: Sequence[int]) -> Sequence[UserPreferenceState]:
+        stmt = select(UserPreferenceState).where(UserPreferenceState.user_id.in_(user_ids))
+        result = await self.session.scalars(stmt)
+        return result.all()
+
+    async def get_states_for_update(self, user_ids: Sequence[int]) -> Sequence[UserPreferenceState]:
+        stmt = (
+            select(UserPreferenceState)
+            .where(UserPreferenceState.user_id.in_(user_ids))
+            .order_by(UserPreferenceState.user_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        result = await self.session.scalars(stmt)
+        return result.all()
+
+    async def lock_users(self, user_ids: Iterable[int]) -> None:
+        """Take the advisory locks of the users until the end of the transaction, in id order to avoid deadlocks."""
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return
+        ids = values(column("user_id", Integer), name="locked_users").data([(user_id,) for user_id in user_ids])
+        ordered_ids = select(ids.c.user_id).order_by(ids.c.user_id).subquery()
+        await self.session.execute(
+            select(func.pg_advisory_xact_lock(PREFERENCE_STATE_LOCK_NAMESPACE, ordered_ids.c.user_id))
+        )
+
+    async def upsert_states(self, values_by_user: dict[int, dict[str, Any]]) -> None:
+        if not values_by_user:
+            return
+
+        stmt = insert(UserPreferenceState).values(
+            [{"user_id": user_id, **values} for user_id, values in values_by_user.items()]
+        )
+        columns = next(iter(values_by_user.values())).keys()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserPreferenceState.user_id],
+            set_={**{column: stmt.excluded[column] for column in columns}, "updated_at": func.now()},
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def get_user_ids_page(self, after_id: int, limit: int) -> list[int]:
+        stmt = (
+            select(UserPreferenceState.user_id)
+            .where(UserPreferenceState.user_id > after_id)
+            .order_by(UserPreferenceState.user_id)
+            .limit(limit)
+        )
+        return list((await self.session.scalars(stmt)).all())
+
+    async def delete_states(self, user_ids: Sequence[int]) -> None:
+        stmt = delete(UserPreferenceState).where(UserPreferenceState.user_id.in_(user_ids))
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def commit(self) -> None:
+        await self.session.commit()
+
+
+class UserRecommendationFeedRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_feed(self, user_id: int) -> UserRecommendationFeed | None:
+        """Return the feed row of the user, its version is needed to store a recomputed feed."""
+        stmt = select(UserRecommendationFeed).where(UserRecommendationFeed.user_id == user_id)
+        result = await self.session.scalars(stmt)
+        return result.first()
+
+    async def claim_users_to_refresh(
+        self,
+        active_after: datetime,
+        computed_after: datetime,
+        fetch_k: int,
+        lambda_mult: float,
+        limit: int,
+        claim_seconds: int,
+    ) -> dict[int, int]:
+        """
+        Claim users with interactions after ``active_after`` and without a fresh feed built with the same parameters.
+
+        Users claimed by another worker replica are skipped, a claim lasts ``claim_seconds`` unless the feed is stored
+        earlier, so users of a crashed replica are refreshed later. Returns the feed versions of the claimed users.
+        """
+        active_users = union(
+            select(UserFeedback.user_id).where(UserFeedback.created_at >= active_after),
+            select(UserImpression.user_id).where(UserImpression.created_at >= active_after),
+        ).subquery()
+        feed = UserRecommendationFeed
+        is_unclaimed = or_(feed.refresh_claimed_until.is_(None), feed.refresh_claimed_until <= func.now())
+        candidates_stmt = (
+            select(active_users.c.user_id)
+            .outerjoin(feed, feed.user_id == active_users.c.user_id)
+            .where(
+                active_users.c.user_id > 0,
+                or_(
+                    feed.computed_at.is_(None),
+                    feed.computed_at < computed_after,
+                    feed.fetch_k.is_distinct_from(fetch_k),
+                    feed.lambda_mult.is_distinct_from(lambda_mult),
+                ),
+                is_unclaimed,
+            )
+            .limit(limit)
+        )
+        candidates = sorted((await self.session.scalars(candidates_stmt)).all())
+        if not candidates:
+            return {}
+
+        claimed_until = func.now() + timedelta(seconds=claim_seconds)
+        # A candidate claimed concurrently by another replica keeps its claim, the conflict waits for that commit
+        stmt = insert(feed).values(
+            [
+                {"user_id": user_id, "recipe_ids": [], "scores": [], "refresh_claimed_until": claimed_until}
+                for user_id in candidates
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[feed.user_id],
+            set_={"refresh_claimed_until": stmt.excluded.refresh_claimed_until},
+            where=is_unclaimed,
+        )
+        claimed = dict((await self.session.execute(stmt.returning(feed.user_id, feed.version))).tuples().all())
+        await self.session.commit()
+        return claimed
+
+    async def upsert_feeds(
+        self,
+        recommendations_by_user: dict[int, list[dict[str, Any]]],
+        fetch_k: int,
+        lambda_mult: float,
+        versions: dict[int, int],
+    ) -> int:
+        """
+        Store the feeds computed after the ``versions`` of the users were read, return how many were stored.
+
+        A feed invalidated after that misses events it was not computed from and is skipped, so are empty feeds.
+        """
+        rows = [
+            {
+                "user_id": user_id,
+                "recipe_ids": [item["recipe_id"] for item in recommendations],
+                "scores": [item["score"] for item in recommendations],
+                "fetch_k": fetch_k,
+                "lambda_mult": lambda_mult,
+                "computed_at": func.now(),
+                "version": versions.get(user_id, 0),
+            }
+            # Sorted, so that concurrent upserts and invalidations lock the rows in the same order
+            for user_id, recommendations in sorted(recommendations_by_user.items())
+            if recommendations
+        ]
+        if not rows:
+            return 0
+
+        stmt = insert(UserRecommendationFeed).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserRecommendationFeed.user_id],
+            set_={
+                "recipe_ids": stmt.excluded.recipe_ids,
+                "scores": stmt.excluded.scores,
+                "fetch_k": stmt.excluded.fetch_k,
+                "lambda_mult": stmt.excluded.lambda_mult,
+                "computed_at": stmt.excluded.computed_at,
+                "refresh_claimed_until": None,
+            },
+            where=UserRecommendationFeed.version == stmt.excluded.version,
+        )
+        stored = (await self.session.scalars(stmt.returning(UserRecommendationFeed.user_id))).all()
+        await self.session.commit()
+        return len(stored)
+
+    async def get_user_ids_page(self, after_id: int, limit: int) -> list[int]:
+        stmt = (
+            select(UserRecommendationFeed.user_id)
+            .where(UserRecommendationFeed.user_id > after_id)
+            .order_by(UserRecommendationFeed.user_id)
+            .limit(limit)
+        )
+        return list((await self.session.scalars(stmt)).all())
+
+    async def invalidate_feeds(self, user_ids: Iterable[int], *, commit: bool = True) -> None:
+        """Drop the feeds of the users and bump their versions, feeds being computed for them are not stored."""
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return
+
+        stmt = insert(UserRecommendationFeed).values(
+            [{"user_id": user_id, "recipe_ids": [], "scores": [], "version": 1} for user_id in user_ids]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserRecommendationFeed.user_id],
+            set_={
+                "recipe_ids": [],
+                "scores": [],
+                "fetch_k": None,
+                "lambda_mult": None,
+                "computed_at": None,
+                "version": UserRecommendationFeed.version + 1,
+            },
+        )
+        await self.session.execute(stmt)
+        if commit:
+            await self.session.commit()
+
+    async def invalidate_feeds_with_recipe(self, recipe_id: int) -> None:
+        stmt = (
+            select(UserRecommendationFeed.user_id)
+            .where(UserRecommendationFeed.recipe_ids.contains([recipe_id]))
+            .order_by(UserRecommendationFeed.user_id)
+        )
+        await self.invalidate_feeds((await self.session.scalars(stmt)).all())
+
+
+class EmbeddingCacheRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_embeddings(self, keys: Sequence[str], touch_interval: timedelta) -> dict[str, bytes]:
+        """
+        Return the cached embeddings by key and mark the ones not used for ``touch_interval`` as recently used.
+
+        Only stale entries are updated, in key order and skipping the rows another lookup is updating, so concurrent
+        lookups of the same texts neither write every time nor wait for each other.
+        """
+        stmt = select(EmbeddingCache.key, EmbeddingCache.embedding).where(EmbeddingCache.key.in_(keys))
+        embeddings = dict((await self.session.execute(stmt)).tuples().all())
+        if embeddings:
+            stale_ids = (
+                select(EmbeddingCache.id)
+                .where(
+                    EmbeddingCache.key.in_(sorted(embeddings)),
+                    EmbeddingCache.last_used_at < func.now() - touch_interval,
+                )
+                .order_by(EmbeddingCache.key)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            await self.session.execute(
+                update(EmbeddingCache).where(EmbeddingCache.id.in_(stale_ids)).values(last_used_at=func.now())
+            )
+        await self.session.commit()
+        return embeddings
+
+    async def add_embeddings(self, model: str, embeddings_by_key: dict[str, bytes]) -> None:
+        # Sorted so that concurrent upserts lock the rows in the same order
+        stmt = insert(EmbeddingCache).values(
+            [
+                {"key": key, "model": model, "embedding": embedding}
+                for key, embedding in sorted(embeddings_by_key.items())
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EmbeddingCache.key],
+            set_={"embedding": stmt.excluded.embedding, "last_used_at": func.now()},
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def evict(self, max_entries: int) -> int:
+        """Delete the least recently used entries above ``max_entries``."""
+        stale_ids = (
+            select(EmbeddingCache.id).order_by(EmbeddingCache.last_used_at.desc()).offset(max_entries).scalar_subquery()
+        )
+        result = await self.session.execute(delete(EmbeddingCache).where(EmbeddingCache.id.in_(stale_ids)))
+        await self.session.commit()
+        return result.rowcount
+
+
+class EmbeddingCollectionRebuildRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_active(self) -> EmbeddingCollectionRebuild | None:
+        stmt = (
+            select(EmbeddingCollectionRebuild)
+            .where(EmbeddingCollectionRebuild.is_completed.is_(False))
+            .order_by(EmbeddingCollectionRebuild.started_at.desc())
+            .limit(1)
+        )
+        result = await self.session.scalars(stmt)
+        return result.first()
+
+    async def start(self, collection_name: str) -> EmbeddingCollectionRebuild:
+        rebuild = EmbeddingCollectionRebuild(collection_name=collection_name)
+        self.session.add(rebuild)
+        await self.session.commit()
+        await self.session.refresh(rebuild)
+        return rebuild
+
+    async def save_checkpoint(self, collection_name: str, last_recipe_id: int) -> None:
+        stmt = (
+            update(EmbeddingCollectionRebuild)
+            .where(EmbeddingCollectionRebuild.collection_name == collection_name)
+            .values(last_recipe_id=last_recipe_id)
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def complete(self, collection_name: str) -> None:
+        stmt = (
+            update(EmbeddingCollectionRebuild)
+            .where(EmbeddingCollectionRebuild.collection_name == collection_name)
+            .values(is_completed=True, completed_at=func.now())
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+
+class ImpressionPartitionRepository:
+    """Creates and drops the monthly partitions of ``user_impression``, bounds are UTC month starts."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_partition_months(self) -> list[date]:
+        stmt = text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+            """
+        )
+        names = (await self.session.scalars(stmt, {"parent": UserImpression.__tablename__})).all()
+        return sorted(
+            datetime.strptime(name.removeprefix(IMPRESSION_PARTITION_PREFIX), "%Y_%m").date()  # noqa: DTZ007
+            for name in names
+            if name.startswith(IMPRESSION_PARTITION_PREFIX)
+        )
+
+    async def _create_partition(self, month: date) -> None:
+        """
+        Create the partition of the month.
+
+        A partition can not be created while the default partition holds rows of its range, such rows are moved
+        aside and inserted back into the new partition in the same transaction.
+        """
+        start, end = _month_start(month), _month_start(add_months(month, 1))
+        await self.session.execute(
+            text(
+                f"CREATE TEMPORARY TABLE {_moved_impressions.name} (LIKE {UserImpression.__tablename__}) ON COMMIT DROP"
+            )
+        )
+        moved = (
+            delete(_default_impression_partition)
+            .where(
+                _default_impression_partition.c.created_at >= start, _default_impression_partition.c.created_at < end
+            )
+            .returning(*_default_impression_partition.c)
+            .cte("moved")
+        )
+        await self.session.execute(insert(_moved_impressions).from_select(_IMPRESSION_COLUMNS, select(moved)))
+        await self.session.execute(
+            text(
+                f"CREATE TABLE {IMPRESSION_PARTITION_PREFIX}{month:%Y_%m} PARTITION OF {UserImpression.__tablename__} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        await self.session.execute(
+            insert(UserImpression).from_select(_IMPRESSION_COLUMNS, select(*_moved_impressions.c))
+        )
+        await self.session.execute(text(f"DROP TABLE {_moved_impressions.name}"))
+
+    async def maintain(
+        self, today: date, months_ahead: int, retention_months: int | None
+    ) -> tuple[list[date], list[date]]:
+        """
+        Create the partitions ahead and drop the expired ones
+
+        Partitions up to ``months_ahead`` months after the current one are created, partitions that ended
+        ``retention_months`` months before the current one are dropped with the expired rows of the default partition.
+
+        Returns:
+            Months of the created and of the dropped partitions
+
+        """
+        await self.session.execute(select(func.pg_advisory_xact_lock(IMPRESSION_PARTITIONS_LOCK_ID)))
+        existing_months = await self.get_partition_months()
+        current_month = today.replace(day=1)
+
+        created = [
+            month
+            for month in (add_months(current_month, months) for months in range(months_ahead + 1))
+            if month not in existing_months
+        ]
+        for month in created:
+            await self._create_partition(month)
+
+        dropped = []
+        if retention_months is not None:
+            cutoff = add_months(current_month, -retention_months)
+            dropped = [month for month in existing_months if add_months(month, 1) <= cutoff]
+            for month in dropped:
+                await self.session.execute(text(f"DROP TABLE {IMPRESSION_PARTITION_PREFIX}{month:%Y_%m}"))
+            await self.session.execute(
+                delete(_default_impression_partition).where(
+                    _default_impression_partition.c.created_at < _month_start(cutoff)
+                )
+            )
+
+        await self.session.commit()
+        return created, dropped
@@ -1,55 +1,264 @@
 import logging
-from typing import Any
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any, cast
 
+import numpy as np
 from qdrant_client.async_qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models
 
+from src.utils.vectors import EmbeddingMatrix, normalize_rows
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class CollectionProfile:
+    """
+    Storage and index settings of a recipes collection with the matching search parameters.
+
+    ``quantized`` keeps int8 copies of the vectors in RAM and rescores the ``oversampling`` times larger candidate
+    list with the original vectors, ``on_disk`` moves the original float32 vectors to memory-mapped storage.
+    """
+
+    on_disk: bool = False
+    quantized: bool = False
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_ef: int | None = None
+    oversampling: float = 2.0
+
+    def vectors_config(self, vector_size: int) -> models.VectorParams:
+        return models.VectorParams(size=vector_size, distance=models.Distance.COSINE, on_disk=self.on_disk)
+
+    def hnsw_config(self) -> models.HnswConfigDiff:
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self) -> models.ScalarQuantization | None:
+        if not self.quantized:
+            return None
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+
+    def search_params(self) -> models.SearchParams | None:
+        if self.hnsw_ef is None and not self.quantized:
+            return None
+        quantization = (
+            models.QuantizationSearchParams(rescore=True, oversampling=self.oversampling) if self.quantized else None
+        )
+        return models.SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+    def estimate_ram_bytes(self, vectors_count: int, vector_size: int) -> int:
+        """Rough resident size: float32 vectors unless on disk, int8 copies and the level 0 HNSW links."""
+        vectors = 0 if self.on_disk else vectors_count * vector_size * 4
+        quantized = vectors_count * vector_size if self.quantized else 0
+        graph = vectors_count * self.hnsw_m * 2 * 4
+        return vectors + quantized + graph
+
+
+COLLECTION_PROFILES = {
+    # float32 vectors in RAM, Qdrant defaults
+    "default": CollectionProfile(),
+    # ~4x less RAM for vectors, originals stay in RAM for rescoring
+    "int8": CollectionProfile(quantized=True, hnsw_ef=128),
+    # Only int8 copies and the graph in RAM, rescoring reads originals from disk
+    "int8_on_disk": CollectionProfile(on_disk=True, quantized=True, hnsw_ef=128),
+    "on_disk": CollectionProfile(on_disk=True, hnsw_ef=128),
+    # Sparser graph for a smaller index, higher ef at search time compensates recall
+    "compact_hnsw": CollectionProfile(hnsw_m=8, hnsw_ef_construct=64, hnsw_ef=128),
+}
+
+
 class QdrantRepository:
-    def __init__(self, client: AsyncQdrantClient) -> None:
+    def __init__(self, client: AsyncQdrantClient, profile: CollectionProfile | None = None) -> None:
         self._client = client
         self.recipe_collection_name = "recipes"
+        self.profile = profile or COLLECTION_PROFILES["default"]
 
-    async def create_recipes_collection(self) -> None:
-        if not await self._client.collection_exists(self.recipe_collection_name):
+    async def create_collection(
+        self, collection_name: str, vector_size: int = 1024, profile: CollectionProfile | None = None
+    ) -> None:
+        profile = profile or self.profile
+        if not await self._client.collection_exists(collection_name):
             await self._client.create_collection(
-                collection_name=self.recipe_collection_name,
-                vectors_config=models.VectorParams(size=1024, distance=models.Distance.COSINE),
+                collection_name=collection_name,
+                vectors_config=profile.vectors_config(vector_size),
+                hnsw_config=profile.hnsw_config(),
+                quantization_config=profile.quantization_config(),
+            )
+
+    async def create_recipes_collection(self) -> None:
+        """Create the first versioned collection behind the ``recipes`` alias on a fresh install."""
+        if await self.get_alias_collection() is not None:
+            return
+        if await self._client.collection_exists(self.recipe_collection_name):
+            return
+
+        collection_name = f"{self.recipe_collection_name}_v1"
+        await self.create_collection(collection_name)
+        await self.switch_alias(collection_name)
+
+    async def get_alias_collection(self) -> str | None:
+        """Return the collection the ``recipes`` alias points to, ``None`` if there is no alias."""
+        response = await self._client.get_aliases()
+        for alias in response.aliases:
+            if alias.alias_name == self.recipe_collection_name:
+                return alias.collection_name
+        return None
+
+    async def get_current_collection(self) -> str | None:
+        """Return the collection readers currently use: the alias target or a legacy ``recipes`` collection."""
+        alias_collection = await self.get_alias_collection()
+        if alias_collection is not None:
+            return alias_collection
+        if await self._client.collection_exists(self.recipe_collection_name):
+            return self.recipe_collection_name
+        return None
+
+    async def get_vector_size(self, collection_name: str) -> int | None:
+        collection_info = await self._client.get_collection(collection_name)
+        vectors = collection_info.config.params.vectors
+        return vectors.size if isinstance(vectors, models.VectorParams) else None
+
+    async def copy_recipes(
+        self, recipe_ids: list[int], source_collection: str, target_collection: str, batch_size: int = 1000
+    ) -> list[int]:
+        """Copy the points of the recipes with their payloads between collections, return the copied ids."""
+        copied: list[int] = []
+        for start in range(0, len(recipe_ids), batch_size):
+            offset = None
+            scroll_filter = models.Filter(must=[models.HasIdCondition(has_id=recipe_ids[start : start + batch_size])])
+            while True:
+                points, offset = await self._client.scroll(
+                    collection_name=source_collection,
+                    scroll_filter=scroll_filter,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                if points:
+                    await self._client.upsert(
+                        collection_name=target_collection,
+                        points=[
+                            models.PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+                            for point in points
+                            if point.vector is not None
+                        ],
+                    )
+                    copied.extend(point.id for point in points if isinstance(point.id, int))
+                if offset is None:
+                    break
+        return copied
+
+    async def delete_legacy_collection(self) -> None:
+        """Drop a real ``recipes`` collection of an installation created before versioned collections."""
+        if await self.get_alias_collection() is None and await self._client.collection_exists(
+            self.recipe_collection_name
+        ):
+            logger.warning("Dropping legacy collection %s", self.recipe_collection_name)
+            await self._client.delete_collection(self.recipe_collection_name)
+
+    async def switch_alias(self, collection_name: str) -> None:
+        """
+        Point the ``recipes`` alias to the collection, readers switch atomically.
+
+        Installations created before versioned collections have a real ``recipes`` collection, an alias can not share
+        its name, so it has to be dropped with ``delete_legacy_collection`` first.
+        """
+        operations: list[models.AliasOperations] = []
+        if await self.get_alias_collection() is not None:
+            operations.append(
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.recipe_collection_name))
+            )
+        elif await self._client.collection_exists(self.recipe_collection_name):
+            msg = f"Legacy collection {self.recipe_collection_name} exists, drop it before creating the alias"
+            raise RuntimeError(msg)
+
+        operations.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(collection_name=collection_name, alias_name=self.recipe_collection_name)
             )
+        )
+        await self._client.update_collection_aliases(change_aliases_operations=operations)
 
     async def add_recipe(self, recipe_id: int, embedding: list[float], payload: dict[str, Any] | None = None) -> None:
+        await self.add_recipes([recipe_id], [embedding], [payload])
+
+    async def add_recipes(
+        self,
+        recipe_ids: list[int],
+        embeddings: list[list[float]],
+        payloads: list[dict[str, Any] | None] | None = None,
+        collection_name: str | None = None,
+    ) -> None:
+        """Upsert all recipes with a single request, into ``collection_name`` instead of the alias if given."""
+        payloads = payloads or [None] * len(recipe_ids)
         await self._client.upsert(
-            collection_name=self.recipe_collection_name,
+            collection_name=collection_name or self.recipe_collection_name,
             points=[
                 models.PointStruct(
                     id=recipe_id,
                     vector=embedding,
                     payload=payload,
                 )
+                for recipe_id, embedding, payload in zip(recipe_ids, embeddings, payloads, strict=True)
             ],
         )
 
-    async def delete_recipe(self, recipe_id: int) -> None:
-        await self._client.delete(collection_name=self.recipe_collection_name, points_selector=[recipe_id])
+    async def delete_recipe(self, recipe_id: int, collection_name: str | None = None) -> None:
+        await self._client.delete(
+            collection_name=collection_name or self.recipe_collection_name, points_selector=[recipe_id]
+        )
+
+    def _build_exclude_filter(self, exclude_ids: list[int] | None) -> models.Filter | None:
+        if not exclude_ids:
+            return None
+        return models.Filter(must_not=[models.HasIdCondition(has_id=exclude_ids)])
 
     async def get_recommendations(
         self,
         query_vector: list[float],
         limit: int = 10,
         exclude_ids: list[int] | None = None,
+        offset: int = 0,
     ) -> Any:
-        filter_condition = None
-        if exclude_ids:
-            filter_condition = models.Filter(must_not=[models.HasIdCondition(has_id=exclude_ids)])
         return await self._client.query_points(
             collection_name=self.recipe_collection_name,
             query=query_vector,
             limit=limit,
-            query_filter=filter_condition,
+            offset=offset,
+            query_filter=self._build_exclude_filter(exclude_ids),
+            search_params=self.profile.search_params(),
         )
 
+    async def get_recommendations_batch(
+        self,
+        query_vectors: list[list[float]],
+        limit: int = 10,
+        exclude_ids: list[list[int]] | None = None,
+        offsets: list[int] | None = None,
+    ) -> list[Any]:
+        """Run one query per vector in a single ``query_batch_points`` request."""
+        if not query_vectors:
+            return []
+
+        exclude_ids = exclude_ids or [[] for _ in query_vectors]
+        offsets = offsets or [0] * len(query_vectors)
+        search_params = self.profile.search_params()
+        requests = [
+            models.QueryRequest(
+                query=query_vector,
+                limit=limit,
+                offset=offset,
+                filter=self._build_exclude_filter(query_exclude_ids),
+                params=search_params,
+            )
+            for query_vector, query_exclude_ids, offset in zip(query_vectors, exclude_ids, offsets, strict=True)
+        ]
+        return await self._client.query_batch_points(collection_name=self.recipe_collection_name, requests=requests)
+
     async def get_all_recipe_ids(self) -> list[int]:
         try:
             collection_info = await self._client.get_collection(self.recipe_collection_name)
@@ -85,6 +294,24 @@ class QdrantRepository:
         else:
             return recipe_ids
 
+    async def iter_recipe_vectors(self, batch_size: int = 1000) -> AsyncIterator[list[tuple[int, list[float]]]]:
+        offset = None
+        while True:
+            points, offset = await self._client.scroll(
+                collection_name=self.recipe_collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=True,
+            )
+            yield [
+                (point.id, cast("list[float]", point.vector))
+                for point in points
+                if isinstance(point.id, int) and isinstance(point.vector, list)
+            ]
+            if offset is None:
+                break
+
     async def get_recipe_embeddings(self, recipe_ids: list[int]) -> dict[int, list[float]]:
         result = await self._client.retrieve(
             collection_name=self.recipe_collection_name, ids=recipe_ids, with_vectors=True, with_payload=False
@@ -98,3 +325,18 @@ class QdrantRepository:
                     embeddings[point.id] = vector_floats
 
         return embeddings
+
+    async def get_recipe_embedding_matrix(self, recipe_ids: list[int]) -> EmbeddingMatrix:
+        if not recipe_ids:
+            return EmbeddingMatrix.empty()
+
+        result = await self._client.retrieve(
+            collection_name=self.recipe_collection_name, ids=recipe_ids, with_vectors=True, with_payload=False
+        )
+        points = [point for point in result if isinstance(point.id, int) and isinstance(point.vector, list)]
+        if not points:
+            return EmbeddingMatrix.empty()
+
+        ids = np.fromiter((point.id for point in points), dtype=np.int64, count=len(points))
+        vectors = np.array([point.vector for point in points], dtype=np.float32)
+        return EmbeddingMatrix(ids=ids, vectors=normalize_rows(vectors))
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+from src.core.config import settings
+from src.core.di import container
+from src.repositories.postgres import ImpressionPartitionRepository
+from src.services.recs_service import RecommendationService
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_feeds_periodically() -> None:
+    """Materialize feeds of active users in batches, sleeping between rounds when there is nothing left to refresh."""
+    while True:
+        refreshed = 0
+        try:
+            async with container() as request_container:
+                service = await request_container.get(RecommendationService)
+                refreshed = await service.refresh_feeds()
+        except Exception:
+            logger.exception("Failed to refresh recommendation feeds")
+
+        if refreshed:
+            logger.info("Refreshed %d recommendation feeds", refreshed)
+        if refreshed < settings.feed.refresh_batch_size:
+            await asyncio.sleep(settings.feed.refresh_interval_seconds)
+
+
+async def refresh_cold_start_pool_periodically() -> None:
+    """Rebuild the in-memory cold start pool of this worker process every refresh interval."""
+    while True:
+        try:
+            async with container() as request_container:
+                service = await request_container.get(RecommendationService)
+                await service.refresh_cold_start_pool()
+        except Exception:
+            logger.exception("Failed to refresh the cold start pool")
+
+        await asyncio.sleep(settings.cold_start.refresh_interval_seconds)
+
+
+async def maintain_impression_partitions_periodically() -> None:
+    """Create the upcoming monthly partitions of the impressions table and drop the expired ones."""
+    config = settings.impression_partitions
+    while True:
+        try:
+            async with container() as request_container:
+                partition_repo = await request_container.get(ImpressionPartitionRepository)
+                created, dropped = await partition_repo.maintain(
+                    datetime.now(UTC).date(), config.months_ahead, config.retention_months
+                )
+            if created or dropped:
+                logger.info("Created impression partitions %s, dropped %s", created, dropped)
+        except Exception:
+            logger.exception("Failed to maintain impression partitions")
+
+        await asyncio.sleep(config.maintenance_interval_seconds)
@@ -10,6 +10,11 @@ class RecommendationItem(BaseModel):
     score: float = Field(ge=0.0, le=2, description="Recipe relevancy score", examples=[0.95, 0.87, 0.73])
 
 
+class UserRecommendations(BaseModel):
+    user_id: int = Field(description="User ID", examples=[1, 42])
+    recommendations: list[RecommendationItem] = Field(description="Recommendations of the user")
+
+
 class UserPreferences(BaseModel):
     favorite_recipes_ids: Sequence[int] | None = Field(
         description="List of favorite recipes IDs", examples=[[1, 2, 3], [42, 123, 789]]
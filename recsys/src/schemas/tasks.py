@@ -1,3 +1,5 @@
+from typing import Annotated
+
 from pydantic import BaseModel, ConfigDict, Field
 
 from src.repositories.postgres import FeedbackType, ImpressionSource
@@ -6,7 +8,21 @@ from src.repositories.postgres import FeedbackType, ImpressionSource
 class GetRecommendationsRequest(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
-    user_id: int = Field(examples=[1, 42])
+    user_id: int = Field(gt=0, examples=[1, 42])
+    limit: int = Field(default=10, ge=1, le=100, description="Number of recommendations", examples=[10, 20, 50])
+    fetch_k: int = Field(
+        default=20, ge=1, le=200, description="Number of candidates for selection", examples=[20, 50, 100]
+    )
+    lambda_mult: float = Field(
+        default=0.5, ge=0.0, le=1.0, description="Balance between relevance and diversity", examples=[0.3, 0.5, 0.7]
+    )
+    exclude_viewed: bool = Field(default=True, description="Exclude viewed recipes", examples=[True, False])
+
+
+class GetRecommendationsBatchRequest(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    user_ids: list[Annotated[int, Field(gt=0)]] = Field(min_length=1, max_length=1000, examples=[[1, 42]])
     limit: int = Field(default=10, ge=1, le=100, description="Number of recommendations", examples=[10, 20, 50])
     fetch_k: int = Field(
         default=20, ge=1, le=200, description="Number of candidates for selection", examples=[20, 50, 100]
@@ -63,3 +79,16 @@ class AddImpressionRequest(BaseModel):
         description="Source of impression feed",
         examples=[ImpressionSource.search, ImpressionSource.feed, ImpressionSource.recs],
     )
+
+
+class RecipeVectorSyncMessage(BaseModel):
+    recipe_ids: list[int] = Field(examples=[[1, 42, 123]])
+    deleted: bool = Field(default=False, description="Are the recipes deleted from the collection", examples=[False])
+
+
+class RecipeCollectionSyncMessage(BaseModel):
+    collection_name: str = Field(description="Collection the recipes alias points to now", examples=["recipes_v2"])
+
+
+class UserInteractionsSyncMessage(BaseModel):
+    user_ids: list[int] = Field(description="Users with new or deleted interactions", examples=[[1, 42]])
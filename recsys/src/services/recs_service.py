@@ -1,10 +1,23 @@
+import logging
+from collections.abc import Collection, Sequence
+from datetime import UTC, datetime, timedelta
 from typing import Annotated, Any
 
 from dishka.integrations.faststream import FromDishka
 from faststream import Context
 
-from src.repositories.embeddings import EmbeddingsRepository
+from src.algorithms.cold_start import ColdStartPool
+from src.algorithms.preference_state import (
+    PreferenceStateManager,
+    feedback_components,
+    impression_components,
+)
+from src.algorithms.recommendation_algorithm import RecommendationAlgorithm
+from src.core.config import settings
+from src.repositories.embeddings import EmbeddingsRepository, recipe_embedding_text
+from src.repositories.local_vectors import LocalVectorRepository
 from src.repositories.postgres import (
+    EmbeddingCollectionRebuildRepository,
     FeedbackType,
     ImpressionSource,
     RecipeRepository,
@@ -12,9 +25,14 @@ from src.repositories.postgres import (
     UserFeedbackRepository,
     UserImpression,
     UserImpressionRepository,
+    UserInteractionRepository,
+    UserRecommendationFeedRepository,
 )
 from src.repositories.qdrant import QdrantRepository
-from src.schemas.tasks import AddImpressionRequest
+from src.schemas.tasks import AddFeedbackRequest, AddImpressionRequest, AddRecipeRequest, UpdateRecipeRequest
+from src.utils.result_cache import RecommendationResultCache
+
+logger = logging.getLogger(__name__)
 
 
 class RecommendationService:
@@ -23,38 +41,157 @@ class RecommendationService:
         recipe_repo: RecipeRepository,
         feedback_repo: UserFeedbackRepository,
         impression_repo: UserImpressionRepository,
+        interaction_repo: UserInteractionRepository,
+        feed_repo: UserRecommendationFeedRepository,
+        rebuild_repo: EmbeddingCollectionRebuildRepository,
+        preference_state: PreferenceStateManager,
         qdrant_repo: QdrantRepository,
         embeddings_repo: EmbeddingsRepository,
+        cold_start_pool: ColdStartPool | None = None,
+        result_cache: RecommendationResultCache | None = None,
     ) -> None:
         self.recipe_repo = recipe_repo
         self.feedback_repo = feedback_repo
         self.impression_repo = impression_repo
+        self.interaction_repo = interaction_repo
+        self.feed_repo = feed_repo
+        self.rebuild_repo = rebuild_repo
+        self.preference_state = preference_state
         self.qdrant_repo = qdrant_repo
         self.embeddings_repo = embeddings_repo
+        self.cold_start_pool = cold_start_pool
+        self.result_cache = result_cache
 
-    async def add_feedback(self, user_id: int, recipe_id: int, feedback_type: FeedbackType) -> UserFeedback:
-        return await self.feedback_repo.add_feedback(user_id, recipe_id, feedback_type)
+    async def add_feedback(self, user_id: int, recipe_id: int, feedback_type: FeedbackType) -> UserFeedback | None:
+        await self.preference_state.lock_users([user_id])
+        feedback = await self.feedback_repo.add_feedback(user_id, recipe_id, feedback_type, commit=False)
+        # A redelivered event is already applied
+        if feedback is None:
+            return None
+        await self.feed_repo.invalidate_feeds([user_id], commit=False)
+        await self.preference_state.apply_interactions(
+            [(user_id, component, recipe_id) for component in feedback_components(feedback_type)]
+        )
+        self.invalidate_cached_recommendations([user_id])
+        return feedback
+
+    async def add_feedbacks_bulk(self, feedbacks: list[AddFeedbackRequest]) -> list[UserFeedback]:
+        feedbacks_list = [feedback.model_dump() for feedback in feedbacks]
+        # Committed together with the preference states, see PreferenceStateManager
+        await self.preference_state.lock_users(feedback.user_id for feedback in feedbacks)
+        created_feedbacks = list(await self.feedback_repo.add_feedbacks_bulk(feedbacks_list, commit=False))
+        user_ids = sorted({feedback.user_id for feedback in created_feedbacks})
+        await self.feed_repo.invalidate_feeds(user_ids, commit=False)
+        await self.preference_state.apply_interactions(
+            [
+                (feedback.user_id, component, feedback.recipe_id)
+                for feedback in created_feedbacks
+                for component in feedback_components(feedback.feedback_type)
+            ]
+        )
+        self.invalidate_cached_recommendations(user_ids)
+        return created_feedbacks
 
     async def delete_feedback(self, user_id: int, recipe_id: int, feedback_type: FeedbackType) -> None:
-        return await self.feedback_repo.delete_feedback(user_id, recipe_id, feedback_type)
+        await self.preference_state.lock_users([user_id])
+        deleted_count = await self.feedback_repo.delete_feedback(user_id, recipe_id, feedback_type, commit=False)
+        if not deleted_count:
+            return
+        await self.feed_repo.invalidate_feeds([user_id], commit=False)
+        await self.preference_state.apply_interactions(
+            [(user_id, component, recipe_id) for component in feedback_components(feedback_type)] * deleted_count,
+            sign=-1,
+        )
+        self.invalidate_cached_recommendations([user_id])
 
     async def add_impression(self, user_id: int, recipe_id: int, source: ImpressionSource) -> UserImpression:
-        return await self.impression_repo.add_impression(user_id, recipe_id, source)
+        await self.preference_state.lock_users([user_id])
+        impression = await self.impression_repo.add_impression(user_id, recipe_id, source, commit=False)
+        await self.feed_repo.invalidate_feeds([user_id], commit=False)
+        await self.preference_state.apply_interactions(
+            [(user_id, component, recipe_id) for component in impression_components(source)]
+        )
+        self.invalidate_cached_recommendations([user_id])
+        return impression
 
     async def add_impressions_bulk(self, impressions: list[AddImpressionRequest]) -> list[UserImpression]:
         impressions_list = [impression.model_dump() for impression in impressions]
-        return list(await self.impression_repo.add_impressions_bulk(impressions_list))
+        # Committed together with the preference states, see PreferenceStateManager
+        await self.preference_state.lock_users(impression.user_id for impression in impressions)
+        created_impressions = list(await self.impression_repo.add_impressions_bulk(impressions_list, commit=False))
+        user_ids = sorted({impression.user_id for impression in created_impressions})
+        await self.feed_repo.invalidate_feeds(user_ids, commit=False)
+        await self.preference_state.apply_interactions(
+            [
+                (impression.user_id, component, impression.recipe_id)
+                for impression in created_impressions
+                for component in impression_components(impression.source)
+            ]
+        )
+        self.invalidate_cached_recommendations(user_ids)
+        return created_impressions
 
     async def delete_recipe(self, recipe_id: int) -> None:
         await self.recipe_repo.delete_recipe(recipe_id)
-        return await self.qdrant_repo.delete_recipe(recipe_id)
+        await self.qdrant_repo.delete_recipe(recipe_id)
+        rebuild = await self.rebuild_repo.get_active()
+        if rebuild is not None:
+            await self.qdrant_repo.delete_recipe(recipe_id, rebuild.collection_name)
+        await self.feed_repo.invalidate_feeds_with_recipe(recipe_id)
+        if self.cold_start_pool is not None:
+            self.cold_start_pool.discard(recipe_id)
+        if self.result_cache is not None:
+            self.result_cache.clear()
 
-    async def add_recipe_with_embedding(
-        self, author_id: int, recipe_id: int, title: str, tags: str, payload: dict[str, Any] | None = None
-    ) -> None:
-        embedding = await self.embeddings_repo.get_embedding(f"{title}, {tags}")
-        await self.recipe_repo.add_recipe(recipe_id, author_id)
-        return await self.qdrant_repo.add_recipe(recipe_id, embedding, payload)
+    def invalidate_cached_recommendations(self, user_ids: Collection[int]) -> None:
+        """Drop the cached results of users whose interactions have changed, in this process only."""
+        if self.result_cache is not None:
+            self.result_cache.invalidate_users(user_ids)
+
+    async def add_recipes_with_embeddings(self, recipes: Sequence[AddRecipeRequest | UpdateRecipeRequest]) -> None:
+        """
+        Embed recipes with one remote call and store them with one Postgres upsert and one Qdrant upsert.
+
+        While a collection rebuild is running the recipes are also written to the new collection, the rebuild embeds
+        them with its own model on the catch-up pass if the vectors are incompatible.
+        """
+        recipes = list({recipe.recipe_id: recipe for recipe in recipes}.values())
+        if not recipes:
+            return
+
+        recipe_ids = [recipe.recipe_id for recipe in recipes]
+        embeddings = await self.embeddings_repo.get_embeddings(
+            [recipe_embedding_text(recipe.title, recipe.tags) for recipe in recipes]
+        )
+        await self.recipe_repo.add_recipes(
+            [
+                {"id": recipe.recipe_id, "author_id": recipe.author_id, "title": recipe.title, "tags": recipe.tags}
+                for recipe in recipes
+            ]
+        )
+        await self.qdrant_repo.add_recipes(recipe_ids, embeddings)
+
+        rebuild = await self.rebuild_repo.get_active()
+        if rebuild is not None:
+            try:
+                await self.qdrant_repo.add_recipes(recipe_ids, embeddings, collection_name=rebuild.collection_name)
+            except Exception:
+                logger.exception("Failed to dual-write recipes to %s", rebuild.collection_name)
+
+    async def sync_local_recipe_vectors(self, recipe_ids: list[int], *, deleted: bool) -> None:
+        if isinstance(self.qdrant_repo, LocalVectorRepository):
+            await self.qdrant_repo.sync_recipes(recipe_ids, deleted=deleted)
+        # Cached results of every user may contain a deleted recipe
+        if deleted and self.result_cache is not None:
+            self.result_cache.clear()
+
+    async def reload_recipe_collection(self) -> None:
+        """Drop everything this process derived from the vectors of the collection the recipes alias pointed to."""
+        if isinstance(self.qdrant_repo, LocalVectorRepository):
+            await self.qdrant_repo.reload(settings.vector_engine.bootstrap_batch_size)
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        await self.refresh_cold_start_pool()
 
     async def get_recommendations(
         self,
@@ -64,12 +201,25 @@ class RecommendationService:
     ) -> Any:
         return await self.qdrant_repo.get_recommendations(query_vector, limit, exclude_ids)
 
+    def _get_algorithm(self) -> RecommendationAlgorithm:
+        return RecommendationAlgorithm(
+            interaction_repo=self.interaction_repo,
+            preference_state=self.preference_state,
+            qdrant_repo=self.qdrant_repo,
+            embeddings_repo=self.embeddings_repo,
+            cold_start_pool=self.cold_start_pool,
+        )
+
     async def get_vector_based_recommendations(
         self, user_id: int, limit: int = 10, fetch_k: int = 20, lambda_mult: float = 0.5, *, exclude_viewed: bool = True
     ) -> list[dict[str, Any]]:
         """
         Get recommendations with usage of embedding algorithm
 
+        Requests with the materialized feed parameters are served from the stored feed, a missing or outdated feed is
+        computed live and stored. Results are cached in the process for a few seconds, concurrent identical requests
+        share one computation.
+
         Args:
             user_id: user id to get recommendations for
             limit: Number of recommendations to return
@@ -78,18 +228,125 @@ class RecommendationService:
             exclude_viewed: Exclude viewed recipes from the recommendations
 
         """
-        from src.algorithms.recommendation_algorithm import RecommendationAlgorithm
+        if self.result_cache is None:
+            return await self._get_vector_based_recommendations(
+                user_id, limit, fetch_k, lambda_mult, exclude_viewed=exclude_viewed
+            )
+        # The result is shared between the callers and must not be modified
+        return await self.result_cache.get_or_compute(
+            user_id,
+            (limit, fetch_k, lambda_mult, exclude_viewed),
+            lambda: self._get_vector_based_recommendations(
+                user_id, limit, fetch_k, lambda_mult, exclude_viewed=exclude_viewed
+            ),
+        )
 
-        algorithm = RecommendationAlgorithm(
-            feedback_repo=self.feedback_repo,
-            impression_repo=self.impression_repo,
-            qdrant_repo=self.qdrant_repo,
-            embeddings_repo=self.embeddings_repo,
-            recipe_repo=self.recipe_repo,
+    async def _get_vector_based_recommendations(
+        self, user_id: int, limit: int, fetch_k: int, lambda_mult: float, *, exclude_viewed: bool
+    ) -> list[dict[str, Any]]:
+        feed_config = settings.feed
+        if not (
+            exclude_viewed
+            and limit <= feed_config.size
+            and fetch_k == feed_config.fetch_k
+            and lambda_mult == feed_config.lambda_mult
+        ):
+            return await self._get_algorithm().get_recommendations(
+                user_id=user_id, limit=limit, fetch_k=fetch_k, lambda_mult=lambda_mult, exclude_viewed=exclude_viewed
+            )
+
+        computed_after = datetime.now(UTC) - timedelta(seconds=feed_config.max_age_seconds)
+        feed = await self.feed_repo.get_feed(user_id)
+        if (
+            feed is not None
+            and feed.computed_at is not None
+            and feed.computed_at >= computed_after
+            and feed.fetch_k == fetch_k
+            and feed.lambda_mult == lambda_mult
+        ):
+            # MMR is greedy, so the first ``limit`` items of a longer selection are exactly the live result
+            return [
+                {"recipe_id": recipe_id, "score": score}
+                for recipe_id, score in zip(feed.recipe_ids[:limit], feed.scores[:limit], strict=True)
+            ]
+
+        # Read before the computation, an event arriving during it invalidates the feed and it is not stored
+        version = feed.version if feed is not None else 0
+        recommendations = await self._get_algorithm().get_recommendations(
+            user_id=user_id, limit=feed_config.size, fetch_k=fetch_k, lambda_mult=lambda_mult
+        )
+        await self.feed_repo.upsert_feeds(
+            {user_id: recommendations}, fetch_k=fetch_k, lambda_mult=lambda_mult, versions={user_id: version}
+        )
+        return recommendations[:limit]
+
+    async def refresh_feeds(self) -> int:
+        """
+        Materialize feeds of recently active users that have no fresh feed
+
+        Returns:
+            Number of stored feeds, feeds invalidated during the computation and empty ones are not stored
+
+        """
+        feed_config = settings.feed
+        now = datetime.now(UTC)
+        # Claimed, so that worker replicas refresh different users
+        versions = await self.feed_repo.claim_users_to_refresh(
+            active_after=now - timedelta(seconds=feed_config.active_window_seconds),
+            computed_after=now - timedelta(seconds=feed_config.max_age_seconds),
+            fetch_k=feed_config.fetch_k,
+            lambda_mult=feed_config.lambda_mult,
+            limit=feed_config.refresh_batch_size,
+            claim_seconds=feed_config.refresh_claim_seconds,
         )
+        if not versions:
+            return 0
 
-        return await algorithm.get_recommendations(
-            user_id=user_id, limit=limit, fetch_k=fetch_k, lambda_mult=lambda_mult, exclude_viewed=exclude_viewed
+        recommendations = await self.get_vector_based_recommendations_batch(
+            user_ids=sorted(versions),
+            limit=feed_config.size,
+            fetch_k=feed_config.fetch_k,
+            lambda_mult=feed_config.lambda_mult,
+        )
+        return await self.feed_repo.upsert_feeds(
+            recommendations, fetch_k=feed_config.fetch_k, lambda_mult=feed_config.lambda_mult, versions=versions
+        )
+
+    async def refresh_cold_start_pool(self) -> int:
+        """
+        Rebuild the cold start pool of this process
+
+        Returns:
+            Number of recipes in the pool
+
+        """
+        if self.cold_start_pool is None:
+            return 0
+        await self.cold_start_pool.refresh(self.recipe_repo, self.qdrant_repo, settings.cold_start)
+        return len(self.cold_start_pool)
+
+    async def get_vector_based_recommendations_batch(
+        self,
+        user_ids: list[int],
+        limit: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        *,
+        exclude_viewed: bool = True,
+    ) -> dict[int, list[dict[str, Any]]]:
+        """
+        Get recommendations for several users with one batched vector search
+
+        Args:
+            user_ids: user ids to get recommendations for
+            limit: Number of recommendations to return for each user
+            fetch_k: Number of candidates to fetch from the vector database for each user
+            lambda_mult: Lambda multiplier for balancing relevance and diversity
+            exclude_viewed: Exclude viewed recipes from the recommendations
+
+        """
+        return await self._get_algorithm().get_recommendations_batch(
+            user_ids=user_ids, limit=limit, fetch_k=fetch_k, lambda_mult=lambda_mult, exclude_viewed=exclude_viewed
         )
 
     async def get_all_recipe_ids(self) -> list[int]:
@@ -1,34 +1,67 @@
+from itertools import groupby
+from typing import Annotated
+
 from dishka.integrations.faststream import inject
-from faststream.nats import NatsRouter
+from faststream import Context
+from faststream.nats import ConsumerConfig, DeliverPolicy, NatsRouter, PullSub
+from faststream.nats.message import NatsBatchMessage
 
+from src.core.config import settings
 from src.core.stream import recommendations_stream
-from src.schemas.tasks import AddFeedbackRequest
+from src.schemas.tasks import AddFeedbackRequest, UserInteractionsSyncMessage
 from src.services.recs_service import RecommendationServiceDependency
+from src.tasks.recommendations import USER_INTERACTIONS_SYNC_SUBJECT
 
 router = NatsRouter()
 
+ADD_FEEDBACK_SUBJECT = "recsys_events.add_feedback"
+DELETE_FEEDBACK_SUBJECT = "recsys_events.delete_feedback"
 
-@router.subscriber("recsys_events.add_feedback", stream=recommendations_stream, queue="recsys-events-feedback-queue")
-@inject
-async def add_feedback_task(
-    request: AddFeedbackRequest,
-    service: RecommendationServiceDependency,
-) -> None:
-    await service.add_feedback(
-        user_id=request.user_id,
-        recipe_id=request.recipe_id,
-        feedback_type=request.feedback_type,
+
+def _feedbacks_batch() -> PullSub:
+    # The whole batch is acked after the handler returns, i.e. after the commit
+    return PullSub(
+        batch_size=settings.interaction_ingestion.batch_size,
+        timeout=settings.interaction_ingestion.batch_timeout_ms / 1000,
+        batch=True,
     )
 
 
-@router.subscriber("recsys_events.delete_feedback", stream=recommendations_stream, queue="recsys-events-feedback-queue")
+def feedback_consumer_config() -> ConsumerConfig:
+    # Adds and deletes share one consumer, so a like followed by an unlike is applied in stream order. At most one
+    # batch is pending acknowledgement, so replicas never apply batches concurrently or out of order
+    return ConsumerConfig(
+        filter_subjects=[ADD_FEEDBACK_SUBJECT, DELETE_FEEDBACK_SUBJECT],
+        max_ack_pending=settings.interaction_ingestion.batch_size,
+    )
+
+
+@router.subscriber(
+    stream=recommendations_stream,
+    durable="recsys-events-feedback-batch",
+    config=feedback_consumer_config(),
+    pull_sub=_feedbacks_batch(),
+    # The stream keeps every event, a new consumer must not replay them (see src/migrate_event_consumers.py)
+    deliver_policy=DeliverPolicy.NEW,
+)
+@router.publisher(USER_INTERACTIONS_SYNC_SUBJECT)
 @inject
-async def delete_feedback_task(
-    request: AddFeedbackRequest,
+async def feedback_task(
+    requests: list[AddFeedbackRequest],
+    message: Annotated[NatsBatchMessage, Context("message")],
     service: RecommendationServiceDependency,
-) -> None:
-    await service.delete_feedback(
-        user_id=request.user_id,
-        recipe_id=request.recipe_id,
-        feedback_type=request.feedback_type,
-    )
+) -> UserInteractionsSyncMessage:
+    subjects = [raw_message.subject for raw_message in message.raw_message]
+    # Consecutive events of the same kind are applied together, the runs themselves in stream order
+    for subject, run in groupby(zip(subjects, requests, strict=True), key=lambda event: event[0]):
+        run_requests = [request for _, request in run]
+        if subject == DELETE_FEEDBACK_SUBJECT:
+            for request in run_requests:
+                await service.delete_feedback(
+                    user_id=request.user_id,
+                    recipe_id=request.recipe_id,
+                    feedback_type=request.feedback_type,
+                )
+        else:
+            await service.add_feedbacks_bulk(feedbacks=run_requests)
+    return UserInteractionsSyncMessage(user_ids=sorted({request.user_id for request in requests}))
@@ -1,34 +1,54 @@
 from dishka.integrations.faststream import inject
-from faststream.nats import NatsRouter
+from faststream.nats import DeliverPolicy, NatsRouter, PullSub
 
+from src.core.config import settings
 from src.core.stream import recommendations_stream
-from src.schemas.tasks import AddImpressionRequest
+from src.schemas.tasks import AddImpressionRequest, UserInteractionsSyncMessage
 from src.services.recs_service import RecommendationServiceDependency
+from src.tasks.recommendations import USER_INTERACTIONS_SYNC_SUBJECT
 
 router = NatsRouter()
 
 
+def _impressions_batch() -> PullSub:
+    # Events are coalesced into one insert of up to ``batch_size`` rows waiting at most ``batch_timeout_ms``, the
+    # whole batch is acked after the handler returns, i.e. after the commit
+    return PullSub(
+        batch_size=settings.interaction_ingestion.batch_size,
+        timeout=settings.interaction_ingestion.batch_timeout_ms / 1000,
+        batch=True,
+    )
+
+
 @router.subscriber(
-    "recsys_events.add_impression", stream=recommendations_stream, queue="recsys-events-impressions-queue"
+    "recsys_events.add_impression",
+    stream=recommendations_stream,
+    durable="recsys-events-add-impression-batch",
+    pull_sub=_impressions_batch(),
+    # The stream keeps every event, a new consumer must not replay them (see src/migrate_event_consumers.py)
+    deliver_policy=DeliverPolicy.NEW,
 )
+@router.publisher(USER_INTERACTIONS_SYNC_SUBJECT)
 @inject
 async def add_impression_task(
-    request: AddImpressionRequest,
+    requests: list[AddImpressionRequest],
     service: RecommendationServiceDependency,
-) -> None:
-    await service.add_impression(
-        user_id=request.user_id,
-        recipe_id=request.recipe_id,
-        source=request.source,
-    )
+) -> UserInteractionsSyncMessage:
+    await service.add_impressions_bulk(impressions=requests)
+    return UserInteractionsSyncMessage(user_ids=sorted({request.user_id for request in requests}))
 
 
 @router.subscriber(
-    "recsys_events.add_impressions_bulk", stream=recommendations_stream, queue="recsys-events-impressions-queue"
+    "recsys_events.add_impressions_bulk",
+    stream=recommendations_stream,
+    queue="recsys-events-add-impressions-bulk-queue",
+    deliver_policy=DeliverPolicy.NEW,
 )
+@router.publisher(USER_INTERACTIONS_SYNC_SUBJECT)
 @inject
 async def add_impressions_bulk_task(
     request: list[AddImpressionRequest],
     service: RecommendationServiceDependency,
-) -> None:
+) -> UserInteractionsSyncMessage:
     await service.add_impressions_bulk(impressions=request)
+    return UserInteractionsSyncMessage(user_ids=sorted({impression.user_id for impression in request}))
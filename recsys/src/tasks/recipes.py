@@ -1,49 +1,105 @@
+import logging
+
 from dishka.integrations.faststream import inject
-from faststream.nats import NatsRouter
+from faststream.nats import DeliverPolicy, NatsRouter, PullSub
 
+from src.core.config import settings
 from src.core.stream import recommendations_stream
 from src.schemas.tasks import (
     AddRecipeRequest,
     DeleteRecipeRequest,
+    RecipeCollectionSyncMessage,
+    RecipeVectorSyncMessage,
     UpdateRecipeRequest,
 )
 from src.services.recs_service import RecommendationServiceDependency
 
+logger = logging.getLogger(__name__)
+
 router = NatsRouter()
 
+# Core NATS subject without a queue group: every worker replica receives the message to sync its local vector index
+RECIPE_VECTORS_SYNC_SUBJECT = "recsys_sync.recipe_vectors"
+# Core NATS subject without a queue group, published by src/reembed_recipes.py after the recipes alias is switched
+RECIPE_COLLECTION_SYNC_SUBJECT = "recsys_sync.recipe_collection"
+
+
+def _recipes_batch() -> PullSub:
+    # Pull up to ``batch_size`` messages waiting at most ``batch_timeout_ms``, the whole batch is acked after the
+    # handler returns, i.e. after the Postgres commit and the Qdrant upsert
+    return PullSub(
+        batch_size=settings.recipe_ingestion.batch_size,
+        timeout=settings.recipe_ingestion.batch_timeout_ms / 1000,
+        batch=True,
+    )
+
 
-@router.subscriber("recsys_events.add_recipe", stream=recommendations_stream, queue="recsys-events-recipes-queue")
+@router.subscriber(
+    "recsys_events.add_recipe",
+    stream=recommendations_stream,
+    durable="recsys-events-add-recipe-batch",
+    pull_sub=_recipes_batch(),
+    # The stream keeps every event, a new consumer must not replay them (see src/migrate_event_consumers.py)
+    deliver_policy=DeliverPolicy.NEW,
+)
+@router.publisher(RECIPE_VECTORS_SYNC_SUBJECT)
 @inject
-async def add_recipe_task(
-    request: AddRecipeRequest,
+async def add_recipes_task(
+    requests: list[AddRecipeRequest],
     service: RecommendationServiceDependency,
-) -> None:
-    await service.add_recipe_with_embedding(
-        author_id=request.author_id,
-        recipe_id=request.recipe_id,
-        title=request.title,
-        tags=request.tags,
-    )
+) -> RecipeVectorSyncMessage:
+    await service.add_recipes_with_embeddings(requests)
+    return RecipeVectorSyncMessage(recipe_ids=[request.recipe_id for request in requests])
 
 
-@router.subscriber("recsys_events.update_recipe", stream=recommendations_stream, queue="recsys-events-recipes-queue")
+@router.subscriber(
+    "recsys_events.update_recipe",
+    stream=recommendations_stream,
+    durable="recsys-events-update-recipe-batch",
+    pull_sub=_recipes_batch(),
+    # The stream keeps every event, a new consumer must not replay them (see src/migrate_event_consumers.py)
+    deliver_policy=DeliverPolicy.NEW,
+)
+@router.publisher(RECIPE_VECTORS_SYNC_SUBJECT)
 @inject
-async def update_recipe_task(
-    request: UpdateRecipeRequest,
+async def update_recipes_task(
+    requests: list[UpdateRecipeRequest],
     service: RecommendationServiceDependency,
-) -> None:
-    await service.add_recipe_with_embedding(
-        author_id=request.author_id,
-        recipe_id=request.recipe_id,
-        title=request.title,
-        tags=request.tags,
-    )
+) -> RecipeVectorSyncMessage:
+    await service.add_recipes_with_embeddings(requests)
+    return RecipeVectorSyncMessage(recipe_ids=[request.recipe_id for request in requests])
 
 
-@router.subscriber("recsys_events.delete_recipe", stream=recommendations_stream, queue="recsys-events-recipes-queue")
+@router.subscriber(
+    "recsys_events.delete_recipe",
+    stream=recommendations_stream,
+    queue="recsys-events-delete-recipe-queue",
+    deliver_policy=DeliverPolicy.NEW,
+)
+@router.publisher(RECIPE_VECTORS_SYNC_SUBJECT)
 @inject
 async def delete_recipe_task(
     request: DeleteRecipeRequest,
     service: RecommendationServiceDependency,
-) -> None:
+) -> RecipeVectorSyncMessage:
     await service.delete_recipe(request.recipe_id)
+    return RecipeVectorSyncMessage(recipe_ids=[request.recipe_id], deleted=True)
+
+
+@router.subscriber(RECIPE_VECTORS_SYNC_SUBJECT)
+@inject
+async def sync_recipe_vectors_task(
+    message: RecipeVectorSyncMessage,
+    service: RecommendationServiceDependency,
+) -> None:
+    await service.sync_local_recipe_vectors(message.recipe_ids, deleted=message.deleted)
+
+
+@router.subscriber(RECIPE_COLLECTION_SYNC_SUBJECT)
+@inject
+async def sync_recipe_collection_task(
+    message: RecipeCollectionSyncMessage,
+    service: RecommendationServiceDependency,
+) -> None:
+    logger.info("Recipes alias points to %s, reloading", message.collection_name)
+    await service.reload_recipe_collection()
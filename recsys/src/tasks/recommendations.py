@@ -1,35 +1,110 @@
 import logging
 
 from dishka.integrations.faststream import inject
-from faststream.nats import NatsRouter
+from faststream.nats import NatsResponse, NatsRouter
 
-from src.schemas.recommendations import RecommendationItem
-from src.schemas.tasks import GetRecommendationsRequest
+from src.core.config import settings
+from src.core.metrics import RECOMMENDATION_STAGE_SECONDS
+from src.schemas.recommendations import RecommendationItem, UserRecommendations
+from src.schemas.tasks import GetRecommendationsBatchRequest, GetRecommendationsRequest, UserInteractionsSyncMessage
 from src.services.recs_service import RecommendationServiceDependency
+from src.utils.in_flight import InFlightLimiter
+from src.utils.timing import StageTimings
 
 logger = logging.getLogger(__name__)
 
 router = NatsRouter()
 
+# Core NATS subject without a queue group: every worker replica receives the message to drop its cached results, the
+# interaction events themselves are consumed by one replica only
+USER_INTERACTIONS_SYNC_SUBJECT = "recsys_sync.user_interactions"
 
-@router.subscriber("recsys_rpc.get_recommendations")
+# Every request is answered by one replica of the group
+RPC_QUEUE = "recsys-rpc-recommendations-queue"
+# Shared by the recommendation RPCs of the process
+rpc_limiter = InFlightLimiter(limit=settings.rpc.max_in_flight)
+
+
+def _rpc_max_workers() -> int:
+    # Handlers above ``max_in_flight`` only answer busy, the extra workers keep rejections from waiting in the queue
+    return settings.rpc.max_in_flight * 2
+
+
+def _busy_response() -> NatsResponse:
+    # Error headers of the NATS services API, clients retry on another replica or give up without waiting the timeout
+    return NatsResponse(body=[], headers={"Nats-Service-Error": "busy", "Nats-Service-Error-Code": "503"})
+
+
+@router.subscriber("recsys_rpc.get_recommendations", queue=RPC_QUEUE, max_workers=_rpc_max_workers())
 @inject
 async def get_user_recommendations_rpc(
     message: GetRecommendationsRequest,
     service: RecommendationServiceDependency,
-) -> list[RecommendationItem]:
+) -> list[RecommendationItem] | NatsResponse:
     try:
         request = GetRecommendationsRequest.model_validate(message)
     except Exception:
         logger.exception("Invalid request format")
         raise
 
-    recommendations = await service.get_vector_based_recommendations(
-        user_id=request.user_id,
-        limit=request.limit,
-        fetch_k=request.fetch_k,
-        lambda_mult=request.lambda_mult,
-        exclude_viewed=request.exclude_viewed,
-    )
+    if not rpc_limiter.try_acquire():
+        return _busy_response()
+    try:
+        recommendations = await service.get_vector_based_recommendations(
+            user_id=request.user_id,
+            limit=request.limit,
+            fetch_k=request.fetch_k,
+            lambda_mult=request.lambda_mult,
+            exclude_viewed=request.exclude_viewed,
+        )
+    finally:
+        rpc_limiter.release()
+
+    with StageTimings(histogram=RECOMMENDATION_STAGE_SECONDS).stage("serialization"):
+        return [RecommendationItem(recipe_id=item["recipe_id"], score=item["score"]) for item in recommendations]
+
+
+@router.subscriber("recsys_rpc.get_recommendations_batch", queue=RPC_QUEUE, max_workers=_rpc_max_workers())
+@inject
+async def get_users_recommendations_batch_rpc(
+    message: GetRecommendationsBatchRequest,
+    service: RecommendationServiceDependency,
+) -> list[UserRecommendations] | NatsResponse:
+    try:
+        request = GetRecommendationsBatchRequest.model_validate(message)
+    except Exception:
+        logger.exception("Invalid request format")
+        raise
+
+    if not rpc_limiter.try_acquire():
+        return _busy_response()
+    try:
+        recommendations = await service.get_vector_based_recommendations_batch(
+            user_ids=request.user_ids,
+            limit=request.limit,
+            fetch_k=request.fetch_k,
+            lambda_mult=request.lambda_mult,
+            exclude_viewed=request.exclude_viewed,
+        )
+    finally:
+        rpc_limiter.release()
+
+    with StageTimings(histogram=RECOMMENDATION_STAGE_SECONDS).stage("serialization"):
+        return [
+            UserRecommendations(
+                user_id=user_id,
+                recommendations=[
+                    RecommendationItem(recipe_id=item["recipe_id"], score=item["score"]) for item in items
+                ],
+            )
+            for user_id, items in recommendations.items()
+        ]
+
 
-    return [RecommendationItem(recipe_id=item["recipe_id"], score=item["score"]) for item in recommendations]
+@router.subscriber(USER_INTERACTIONS_SYNC_SUBJECT)
+@inject
+async def sync_user_interactions_task(
+    message: UserInteractionsSyncMessage,
+    service: RecommendationServiceDependency,
+) -> None:
+    service.invalidate_cached_recommendations(message.user_ids)
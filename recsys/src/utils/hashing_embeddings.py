@@ -0,0 +1,74 @@
+import functools
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=100_000)
+def _word_features(word: str, min_n: int, max_n: int, dimension: int) -> tuple[np.ndarray, np.ndarray]:
+    """Buckets and signs of the word itself and of the character n-grams of ``<word>``."""
+    padded = f"<{word}>"
+    features = [word] + [
+        padded[i : i + n] for n in range(min_n, min(max_n, len(padded)) + 1) for i in range(len(padded) - n + 1)
+    ]
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    return (hashes % dimension).astype(np.intp), signs
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local CPU embeddings: signed feature hashing of word and character n-grams.
+
+    Every word and every character n-gram of the padded word is hashed with CRC32 into one of ``dimension`` buckets
+    with a sign taken from the hash, word features are weighted with ``1 + log(tf)`` and the vector is L2-normalized.
+    Texts that share words and word parts get a high cosine similarity, vectors are deterministic across processes
+    and need no fitting or network. Hashed features of frequent words are memoized.
+    """
+
+    def __init__(self, dimension: int = 1024, ngram_range: tuple[int, int] = (3, 5)) -> None:
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+
+    @property
+    def model(self) -> str:
+        min_n, max_n = self.ngram_range
+        return f"hashing-char{min_n}-{max_n}-{self.dimension}"
+
+    def _embed(self, text: str) -> list[float]:
+        text = unicodedata.normalize("NFKC", text).lower()
+        # Texts without words are hashed as a whole, a zero vector has no cosine similarity
+        words = Counter(_WORD_PATTERN.findall(text)) or Counter([text])
+
+        buckets, weights = [], []
+        for word, count in words.items():
+            word_buckets, word_signs = _word_features(word, *self.ngram_range, self.dimension)
+            buckets.append(word_buckets)
+            weights.append(word_signs * (1 + math.log(count)))
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        np.add.at(vector, np.concatenate(buckets), np.concatenate(weights))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        # Cheaper than a thread pool hop for the ingestion batch sizes
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
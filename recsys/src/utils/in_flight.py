@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class InFlightLimiter:
+    """
+    Process-wide count of the requests being served, requests above ``limit`` are rejected instead of queued.
+
+    Rejecting right away lets the caller retry on another replica of the queue group while the request has not yet
+    spent its timeout waiting in the local queue.
+    """
+
+    limit: int
+    in_flight: int = 0
+    rejected: int = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
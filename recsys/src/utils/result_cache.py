@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class ResultCacheStats:
+    """Process-wide counters of the recommendation result cache."""
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    invalidations: int = 0
+
+
+class RecommendationResultCache:
+    """
+    Process-wide short-lived cache of per-user results with coalescing of concurrent identical requests.
+
+    Entries are keyed by the user id and the request parameters and live for ``ttl`` seconds, the least recently used
+    ones are evicted above ``max_entries``. Concurrent misses of the same key await the computation of the first one.
+    Invalidation of a user drops their entries, a computation that was running meanwhile is returned to its waiters
+    but not stored, since it may have read the interactions from before the invalidating event.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = ResultCacheStats()
+        self._entries: OrderedDict[tuple[int, Hashable], tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[tuple[int, Hashable], asyncio.Future] = {}
+        self._user_params: dict[int, set[Hashable]] = {}
+        self._generations: dict[int, int] = {}
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_fresh(self, key: tuple[int, Hashable]) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._discard(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _discard(self, key: tuple[int, Hashable]) -> None:
+        del self._entries[key]
+        user_id, params = key
+        user_params = self._user_params[user_id]
+        user_params.discard(params)
+        if not user_params:
+            del self._user_params[user_id]
+
+    def _store(self, key: tuple[int, Hashable], value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        user_id, params = key
+        self._user_params.setdefault(user_id, set()).add(params)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def _generation(self, user_id: int) -> tuple[int, int]:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    async def get_or_compute(self, user_id: int, params: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result or the result of ``compute``, shared with all concurrent callers of the key."""
+        key = (user_id, params)
+        while True:
+            found, value = self._get_fresh(key)
+            if found:
+                self.stats.hits += 1
+                return value
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            self.stats.coalesced += 1
+            try:
+                # Cancellation of a waiter must not cancel the computation of the other callers
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # The caller that computed the result was cancelled, the next one computes it again
+
+        self.stats.misses += 1
+        generation = self._generation(user_id)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Waiters get the exception raised, the future itself is not awaited when there are none
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+        future.set_result(value)
+        if self._generation(user_id) == generation:
+            self._store(key, value)
+        return value
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in [key for key in self._in_flight if key[0] in user_ids]:
+            # Later callers compute anew instead of joining a computation that started before the event
+            del self._in_flight[key]
+        for user_id in user_ids:
+            for params in list(self._user_params.get(user_id, ())):
+                self._discard((user_id, params))
+        self.stats.invalidations += len(user_ids)
+        if len(self._generations) > self.max_entries:
+            # Forgetting the generations is safe together with a new epoch, running computations are just not stored
+            self._generations.clear()
+            self._epoch += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._in_flight.clear()
+        self._entries.clear()
+        self._user_params.clear()
@@ -0,0 +1,30 @@
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SeenSet:
+    """Recipe ids that must not be recommended to the user, stored as a sorted unique int64 array."""
+
+    ids: np.ndarray
+
+    @classmethod
+    def from_ids(cls, recipe_ids: Iterable[int]) -> "SeenSet":
+        return cls(ids=np.unique(np.fromiter(recipe_ids, dtype=np.int64)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def contains(self, recipe_ids: Sequence[int] | np.ndarray) -> np.ndarray:
+        """Return the membership mask of ``recipe_ids`` with one binary search per id."""
+        recipe_ids_array = np.asarray(recipe_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(recipe_ids_array), dtype=bool)
+
+        positions = np.minimum(np.searchsorted(self.ids, recipe_ids_array), len(self.ids) - 1)
+        return self.ids[positions] == recipe_ids_array
+
+    def tolist(self) -> list[int]:
+        return self.ids.tolist()
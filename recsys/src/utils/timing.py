@@ -0,0 +1,28 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from src.utils.metrics import Histogram
+
+
+@dataclass
+class StageTimings:
+    """Wall time spent in named stages, accumulated over the lifetime of the owner and observed in ``histogram``."""
+
+    seconds: dict[str, float] = field(default_factory=dict)
+    histogram: Histogram | None = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+            if self.histogram is not None:
+                self.histogram.observe(elapsed, name)
+
+    def reset(self) -> None:
+        self.seconds.clear()
@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+@dataclass(frozen=True)
+class EmbeddingMatrix:
+    """Recipe ids with their L2-normalized embeddings stored as one contiguous float32 matrix."""
+
+    ids: np.ndarray
+    vectors: np.ndarray
+
+    @cached_property
+    def _rows(self) -> dict[int, int]:
+        return {recipe_id: row for row, recipe_id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def empty(cls) -> "EmbeddingMatrix":
+        return cls(ids=np.empty(0, dtype=np.int64), vectors=np.empty((0, 0), dtype=np.float32))
+
+    def positions(self, recipe_ids: list[int]) -> np.ndarray:
+        """Return row index for every recipe id, ``-1`` for ids without embedding."""
+        return np.fromiter(
+            (self._rows.get(recipe_id, -1) for recipe_id in recipe_ids), dtype=np.int64, count=len(recipe_ids)
+        )
+
+    def aligned(self, recipe_ids: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        """Return embeddings in the order of ``recipe_ids`` (zero rows for missing ones) and the availability mask."""
+        positions = self.positions(recipe_ids)
+        available = positions >= 0
+        vectors = np.zeros((len(recipe_ids), self.vectors.shape[1]), dtype=np.float32)
+        vectors[available] = self.vectors[positions[available]]
+        return vectors, available
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster L2-normalized rows by cosine similarity.
+
+    Centroids start from distinct random rows and are re-normalized after every update, a cluster that loses all
+    its rows keeps the previous centroid. Returns the normalized centroids, shape ``(clusters, dim)``, and the
+    cluster of every row. ``clusters`` is capped by the number of rows.
+    """
+    clusters = min(clusters, len(vectors))
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=clusters, replace=False)]
+    labels = np.full(len(vectors), -1, dtype=np.intp)
+    for _ in range(iterations):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        centroids = np.where(np.linalg.norm(sums, axis=1, keepdims=True) > 0, normalize_rows(sums), centroids)
+    return centroids, labels
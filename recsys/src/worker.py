@@ -1,14 +1,25 @@
+import asyncio
+
 from dishka.integrations.faststream import setup_dishka
 from faststream.asgi import AsgiFastStream, make_ping_asgi
 from faststream.nats import NatsBroker
 
 from src.core.config import settings
 from src.core.di import container
+from src.core.metrics import MetricsMiddleware, metrics_asgi
+from src.repositories.local_vectors import LocalVectorIndex
+from src.repositories.qdrant import QdrantRepository
+from src.scheduler import (
+    maintain_impression_partitions_periodically,
+    refresh_cold_start_pool_periodically,
+    refresh_feeds_periodically,
+)
 from src.tasks import router
 
 broker = NatsBroker(
     servers=[f"{settings.nats.host}:{settings.nats.port}"],
     apply_types=True,
+    middlewares=[MetricsMiddleware],
 )
 broker.include_router(router)
 setup_dishka(container, broker=broker)
@@ -18,5 +29,37 @@ app = AsgiFastStream(
     asyncapi_path="/docs/asyncapi" if settings.mode == "dev" else None,
     asgi_routes=[
         ("/health", make_ping_asgi(broker, timeout=5.0)),
+        ("/metrics", metrics_asgi),
     ],
 )
+
+
+@app.after_startup
+async def bootstrap_local_vector_index() -> None:
+    if settings.vector_engine.mode != "local":
+        return
+
+    async with container() as request_container:
+        qdrant_repository = await request_container.get(QdrantRepository)
+        local_vector_index = await request_container.get(LocalVectorIndex)
+        await local_vector_index.bootstrap(qdrant_repository, settings.vector_engine.bootstrap_batch_size)
+
+
+scheduler_tasks: list[asyncio.Task] = []
+
+
+@app.after_startup
+async def start_schedulers() -> None:
+    if settings.feed.scheduler_enabled:
+        scheduler_tasks.append(asyncio.create_task(refresh_feeds_periodically()))
+    # The pool lives in the process memory, so every worker replica refreshes its own
+    if settings.cold_start.enabled:
+        scheduler_tasks.append(asyncio.create_task(refresh_cold_start_pool_periodically()))
+    if settings.impression_partitions.maintenance_enabled:
+        scheduler_tasks.append(asyncio.create_task(maintain_impression_partitions_periodically()))
+
+
+@app.on_shutdown
+async def stop_schedulers() -> None:
+    for task in scheduler_tasks:
+        task.cancel()